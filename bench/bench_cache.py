@@ -0,0 +1,125 @@
+"""
+Shared-cache backends side by side: correctness checks (round trip, per-key
+TTL, visibility across instances, Redis outage = miss) and get/set latency
+for memory://, sqlite:// and redis:// (against bench/fake_redis.py unless
+--redis-url points at a real server).
+
+    python bench/bench_cache.py --ops 2000
+    python bench/bench_cache.py --redis-url redis://127.0.0.1:6379/15
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("BOT_DATA_DIR", tempfile.mkdtemp(prefix="bench-cache-"))
+
+import cache_backend  # noqa: E402
+from corpus import make_tracks  # noqa: E402
+from fake_redis import FakeRedis  # noqa: E402
+from stats import format_row, summarize  # noqa: E402
+
+
+def info_payload(n: int) -> list[dict]:
+    """Shaped like get_audio_info's cached entries, with realistic stream URL lengths."""
+    out = make_tracks(n)
+    for i, t in enumerate(out):
+        t["stream_url"] = (f"https://rr3---sn-fake.googlevideo.com/videoplayback?expire=1700000000"
+                           f"&ei=abc&ip=203.0.113.7&id=o-{i:040d}&itag=251&source=youtube&mime=audio%2Fwebm")
+        t["url_fetched_at"] = time.time()
+    return out
+
+
+async def check(name: str, a: cache_backend.CacheBackend, b: cache_backend.CacheBackend) -> list[str]:
+    """`a` and `b` are two instances of one backend; shared ones must see each other."""
+    failures = []
+    value = info_payload(10)
+    await a.set("info", "roundtrip", value, 60)
+    if await a.get("info", "roundtrip") != value:
+        failures.append("round trip")
+    if await a.get("info", "never-set") is not None:
+        failures.append("miss")
+    await a.set("info", "short", value, 0.2)
+    await asyncio.sleep(0.3)
+    if await a.get("info", "short") is not None:
+        failures.append("ttl expiry")
+    if name != "memory" and await b.get("info", "roundtrip") != value:
+        failures.append("shared between instances")
+    return failures
+
+
+async def timings(cache: cache_backend.CacheBackend, ops: int) -> dict:
+    value = info_payload(1)
+    sets, gets = [], []
+    for i in range(ops):
+        start = time.perf_counter()
+        await cache.set("info", f"k{i}", value, 60)
+        sets.append(time.perf_counter() - start)
+    for i in range(ops):
+        start = time.perf_counter()
+        await cache.get("info", f"k{i}")
+        gets.append(time.perf_counter() - start)
+    return {"set": summarize(sets), "get": summarize(gets)}
+
+
+async def run(args):
+    fake = None
+    redis_url = args.redis_url
+    if not redis_url:
+        fake = await FakeRedis(latency=args.redis_latency).start()
+        redis_url = fake.url
+
+    backends = {
+        "memory": (cache_backend.MemoryCache(), cache_backend.MemoryCache()),
+        "sqlite": (cache_backend.SQLiteCache(), cache_backend.SQLiteCache()),
+        "redis": (cache_backend.RedisCache(redis_url), cache_backend.RedisCache(redis_url)),
+    }
+    ok = True
+    for name, (a, b) in backends.items():
+        failures = await check(name, a, b)
+        ok &= not failures
+        print(f"\n── {name}: {'ok' if not failures else 'FAILED ' + ', '.join(failures)}")
+        result = await timings(a, args.ops)
+        print(format_row("set", result["set"]))
+        print(format_row("get", result["get"]))
+        await a.close()
+        await b.close()
+
+    # an unreachable server must cost a miss, not an error or a long wait
+    dead = cache_backend.RedisCache("redis://127.0.0.1:1/0")
+    start = time.perf_counter()
+    miss = await dead.get("info", "x")
+    first = time.perf_counter() - start
+    start = time.perf_counter()
+    await dead.get("info", "x")
+    second = time.perf_counter() - start
+    print(f"\n── redis down: miss={miss is None}, first {first * 1000:.1f} ms, "
+          f"then {second * 1000:.2f} ms while marked down")
+
+    payload = info_payload(10)
+    raw = len(json.dumps(payload).encode())
+    packed = len(cache_backend.dumps(payload))
+    print(f"── 10-entry info payload: {raw} B JSON → {packed} B "
+          f"({'msgpack' if cache_backend.msgpack else 'zlib JSON'})")
+
+    if fake:
+        await fake.stop()
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared cache backend checks and latency")
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--redis-url", help="real Redis to test instead of the in-process stand-in")
+    parser.add_argument("--redis-latency", type=float, default=0.0, help="added per command by the stand-in")
+    args = parser.parse_args()
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Dead-stream failover, fully offline: how long from a track's stream failing
+to audio from one of its alternates, at each stage play_next can notice it,
+next to what a fresh search for the same song would have cost instead.
+
+- refresh     the stale URL's re-extraction fails (video gone)
+- probe       ffprobe refuses the stream (403)
+- playback    the stream dies once the player reads it
+- stall       the stream hangs mid-track; the watchdog restarts it in place
+
+    python bench/bench_failover.py [--iterations 10] [--extract-delay 0.3]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("BOT_DATA_DIR", tempfile.mkdtemp(prefix="bench-failover-"))
+os.environ.setdefault("CACHE_URL", "memory://")
+# refreshes happen after the stream cache has long expired; don't let it answer them
+os.environ.setdefault("CACHE_STREAM_TTL", "0")
+# the production threshold (10 s) would dominate the stall numbers
+os.environ.setdefault("PLAYBACK_STALL_SECONDS", "0.5")
+os.environ.setdefault("WATCHDOG_INTERVAL", "0.05")
+
+import bot  # noqa: E402
+from bench_ttfa import first_frame_waiter  # noqa: E402
+from fakes import (  # noqa: E402
+    ExtractorConfig, FakeChannel, FakeGuild, FakeInteraction, StreamServer, install,
+)
+from stats import format_row, summarize  # noqa: E402
+
+
+async def resolved_track(term: str) -> dict:
+    info = await bot.get_audio_info(term)
+    info["search_query"] = term
+    return info
+
+
+async def measure(stage: str, guild_id: int, config: ExtractorConfig, args) -> float | None:
+    """Failure → first frame of the alternate (or restart), or None if the song was lost."""
+    channel = FakeChannel(guild_id, latency=args.discord_latency)
+    guild = FakeGuild(guild_id, channel, args.frame_interval)
+    vc = guild.voice_client
+    interaction = FakeInteraction(guild, channel)
+    state = bot.get_state(guild_id)
+
+    term = f"failover song {guild_id}"
+    song = await resolved_track(term)
+    if not song.get("alternates"):
+        return None
+    dead_id = song["stream_url"].rsplit("/", 1)[-1]
+    if stage == "stall":
+        config.stream.hung.add(dead_id)
+        failures = config.stream.failures
+    elif stage == "refresh":
+        # stale URL, and the search that would refresh it now fails
+        song["url_fetched_at"] = 0
+        config.unavailable.add(term)
+        failures = config.failures
+    else:
+        config.stream.dead.add(dead_id)
+        failures = config.stream.failures
+    state.queue.append(song)
+
+    first = first_frame_waiter(vc)
+    await bot.play_next(interaction)
+    try:
+        played = await asyncio.wait_for(first, timeout=10)
+        if stage == "stall":
+            # that was the stream starting; the watchdog's restart comes next
+            played = await asyncio.wait_for(first_frame_waiter(vc), timeout=10)
+    except asyncio.TimeoutError:
+        return None
+    finally:
+        vc.stop()
+        config.unavailable.discard(term)
+    return played - failures[-1] if failures else None
+
+
+async def research_cost(config: ExtractorConfig, args) -> list[float]:
+    """Without alternates the best case is searching again and probing the result."""
+    out = []
+    for i in range(args.iterations):
+        start = time.perf_counter()
+        info = await bot.get_audio_info(f"research song {i}")
+        await asyncio.sleep(args.probe_delay)
+        assert info["stream_url"]
+        out.append(time.perf_counter() - start)
+    return out
+
+
+async def run(args) -> dict:
+    stream = StreamServer(first_byte_delay=args.first_byte_delay).start()
+    config = ExtractorConfig(stream, delay=args.extract_delay, jitter=args.jitter,
+                             flat_delay=args.flat_delay)
+    results = {}
+    try:
+        for n, stage in enumerate(("refresh", "probe", "playback", "stall")):
+            undo = install(bot, config, probe_delay=args.probe_delay,
+                           track_frames=args.track_frames, probe_checks=stage != "playback")
+            times, lost = [], 0
+            for i in range(args.iterations):
+                took = await measure(stage, 30_000 + n * 1000 + i, config, args)
+                if took is None:
+                    lost += 1
+                else:
+                    times.append(took)
+            results[stage] = (summarize(times), lost)
+            await asyncio.sleep(0.2)
+            undo()
+        undo = install(bot, config, probe_delay=args.probe_delay)
+        results["re-search"] = (summarize(await research_cost(config, args)), 0)
+        undo()
+    finally:
+        await asyncio.sleep(0.3)
+        stream.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Dead-stream failover to ranked alternates")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--extract-delay", type=float, default=0.3, help="full yt-dlp extraction (s)")
+    parser.add_argument("--flat-delay", type=float, default=0.1, help="flat yt-dlp listing (s)")
+    parser.add_argument("--jitter", type=float, default=0.05, help="uniform extra extractor delay (s)")
+    parser.add_argument("--probe-delay", type=float, default=0.05, help="ffprobe stand-in (s)")
+    parser.add_argument("--first-byte-delay", type=float, default=0.02, help="stream server TTFB (s)")
+    parser.add_argument("--discord-latency", type=float, default=0.03, help="per REST call (s)")
+    parser.add_argument("--frame-interval", type=float, default=0.002, help="seconds per fake frame")
+    parser.add_argument("--track-frames", type=int, default=50)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    results = asyncio.run(run(args))
+    for name, (summary, lost) in results.items():
+        print(format_row(name, summary) + (f"  lost {lost}" if lost else ""))
+    sys.exit(1 if any(lost for _, lost in results.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Per-track loudness gain: how fast the background analysis gets through
+tracks, and how quickly a realistic (skewed) play history ends up covered.
+
+- analysis    real ffmpeg EBU R128 runs over synthetic tones at assorted
+              levels: seconds per track, audio seconds per wall second, and
+              how far off the target each one would play after its gain
+              (skipped when ffmpeg isn't installed)
+- coverage    play_next driven through the fakes over a catalog with
+              repeats: share of plays that started with a measurement, per
+              quarter of the run, and whether those carried the volume filter
+
+    python bench/bench_loudness.py [--plays 200] [--catalog 60] [--analysis-delay 0.2]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("BOT_DATA_DIR", tempfile.mkdtemp(prefix="bench-loudness-"))
+os.environ.setdefault("CACHE_URL", "memory://")
+
+import bot  # noqa: E402
+import loudness  # noqa: E402
+from fakes import ExtractorConfig, FakeChannel, FakeGuild, FakeInteraction, StreamServer, install  # noqa: E402
+from stats import format_row, summarize  # noqa: E402
+
+
+def synth_tracks(directory: str, count: int, seconds: int) -> list[tuple[str, float]]:
+    """Sine tones from -30 to 0 dB below full scale; (path, volume dB)."""
+    tracks = []
+    for i in range(count):
+        volume = -30 + 30 * i / max(1, count - 1)
+        path = os.path.join(directory, f"tone{i}.opus")
+        subprocess.run(
+            [loudness.FFMPEG, "-v", "error", "-y", "-f", "lavfi", "-i", f"sine=f={220 + 40 * i}:d={seconds}",
+             "-af", f"volume={volume:.1f}dB", "-ac", "2", "-c:a", "libopus", "-b:a", "128k", path],
+            check=True,
+        )
+        tracks.append((path, volume))
+    return tracks
+
+
+async def bench_analysis(args) -> dict | None:
+    if loudness.FFMPEG is None:
+        return None
+    with tempfile.TemporaryDirectory(prefix="bench-loudness-tones-") as directory:
+        tracks = synth_tracks(directory, args.tones, args.tone_seconds)
+        times, residuals = [], []
+        for path, _ in tracks:
+            start = time.perf_counter()
+            lufs, peak = await loudness.measure(path)
+            times.append(time.perf_counter() - start)
+            gain = loudness.gain_db(lufs, peak)
+            # a gain the peak ceiling or the clamp held back shows up here as residual
+            residuals.append(abs(lufs + gain - loudness.LOUDNESS_TARGET))
+    return {
+        "per_track": summarize(times),
+        "realtime_factor": round(args.tone_seconds * len(times) / sum(times), 1),
+        "max_residual_lu": round(max(residuals), 2),
+    }
+
+
+async def bench_coverage(args) -> dict:
+    stream = StreamServer().start()
+    config = ExtractorConfig(stream, delay=0.0, jitter=0.0, flat_delay=0.0)
+    undo = install(bot, config, probe_delay=0.0, track_frames=args.track_frames,
+                   analysis_delay=args.analysis_delay)
+    channel = FakeChannel(40_000)
+    guild = FakeGuild(40_000, channel, args.frame_interval)
+    vc = guild.voice_client
+    interaction = FakeInteraction(guild, channel)
+    state = bot.get_state(40_000)
+
+    rng = random.Random(args.seed)
+    catalog = [f"L{n:010d}" for n in range(args.catalog)]
+    # a few favourites come round far more often than the long tail
+    weights = [1 / (rank + 1) for rank in range(len(catalog))]
+    covered, filtered, missing_filter = [], 0, 0
+    try:
+        for _ in range(args.plays):
+            vid = rng.choices(catalog, weights)[0]
+            measured = await loudness.analyzer.lookup(vid)
+            state.queue.append({
+                "title": vid,
+                "url": bot.YOUTUBE_WATCH_URL.format(vid),
+                "stream_url": stream.url(vid),
+                "url_fetched_at": time.time(),
+                "kbps": 160,
+            })
+            played = len(vc.last_frames)
+            await bot.play_next(interaction)
+            while len(vc.last_frames) == played:
+                await asyncio.sleep(0.005)
+            covered.append(measured is not None)
+            if measured is not None and abs(measured) >= loudness.LOUDNESS_MIN_GAIN:
+                if "volume=" in (vc.sources[-1].source.options or ""):
+                    filtered += 1
+                else:
+                    missing_filter += 1
+        vc.stop()
+        await asyncio.sleep(0.2)
+    finally:
+        loudness.analyzer.stop()
+        undo()
+        stream.stop()
+
+    quarter = max(1, len(covered) // 4)
+    stats = loudness.analyzer.stats()
+    return {
+        "coverage_by_quarter": [
+            round(sum(covered[i:i + quarter]) / len(covered[i:i + quarter]), 2)
+            for i in range(0, quarter * 4, quarter)
+        ],
+        "coverage": round(sum(covered) / len(covered), 2),
+        "with_gain_filter": filtered,
+        "missing_filter": missing_filter,
+        "analysed": stats["analysed"],
+        "distinct_measured": len({vid for vid in catalog if await loudness.analyzer.lookup(vid) is not None}),
+        "throughput_per_s": stats["throughput"],
+    }
+
+
+async def run(args) -> dict:
+    return {"analysis": await bench_analysis(args), "coverage": await bench_coverage(args)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Background loudness analysis and gain coverage")
+    parser.add_argument("--plays", type=int, default=200)
+    parser.add_argument("--catalog", type=int, default=60, help="distinct tracks the plays draw from")
+    parser.add_argument("--analysis-delay", type=float, default=0.2, help="fake ffmpeg measurement (s)")
+    parser.add_argument("--track-frames", type=int, default=25)
+    parser.add_argument("--frame-interval", type=float, default=0.002, help="seconds per fake frame")
+    parser.add_argument("--tones", type=int, default=6, help="synthetic tracks for the real ffmpeg run")
+    parser.add_argument("--tone-seconds", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    results = asyncio.run(run(args))
+
+    analysis = results["analysis"]
+    if analysis is None:
+        print("analysis                 (ffmpeg not found; skipped)")
+    else:
+        print(format_row("analysis per track", analysis["per_track"]))
+        print(f"{'':<24} {analysis['realtime_factor']}x realtime, "
+              f"max residual {analysis['max_residual_lu']} LU")
+    coverage = results["coverage"]
+    print(f"{'coverage':<24} {coverage['coverage']:.0%} of plays measured "
+          f"(by quarter: {', '.join(f'{c:.0%}' for c in coverage['coverage_by_quarter'])})")
+    print(f"{'':<24} {coverage['analysed']} analysed, {coverage['with_gain_filter']} plays with a gain filter, "
+          f"{coverage['throughput_per_s']} tracks/s of worker time")
+    sys.exit(1 if coverage["missing_filter"] else 0)
+
+
+if __name__ == "__main__":
+    main()
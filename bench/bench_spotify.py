@@ -0,0 +1,78 @@
+"""
+Spotify pagination benchmark against the local fake API: how soon the first
+page of a large playlist is available versus the whole list, how many token
+requests the pooled client needs, and how fast a known playlist re-queues
+from the snapshot cache.
+
+    python bench/bench_spotify.py [--tracks 1000] [--cached 500] [--latency 0.05]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# keep the bench's cache out of the real data dir
+os.environ.setdefault("BOT_DATA_DIR", tempfile.mkdtemp(prefix="bench-spotify-"))
+
+from fake_spotify import FakeSpotify  # noqa: E402
+from spotify import SpotifyClient  # noqa: E402
+
+
+async def time_queue(client: SpotifyClient, kind: str, item_id: str) -> tuple[float, int]:
+    start = time.perf_counter()
+    total = 0
+    async for page in client.iter_cached_tracks(kind, item_id):
+        total += len(page)
+    return time.perf_counter() - start, total
+
+
+async def run(tracks: int, cached: int, latency: float):
+    fake = FakeSpotify(latency=latency)
+    base = await fake.start()
+    client = SpotifyClient("id", "secret", api_base=f"{base}/v1", token_url=f"{base}/api/token")
+    try:
+        for kind, item_id, it in (
+            ("playlist", f"pl{tracks}", client.iter_playlist_tracks),
+            ("album", f"al{tracks}", client.iter_album_tracks),
+        ):
+            start = time.perf_counter()
+            first_page = None
+            total = pages = 0
+            async for page in it(item_id):
+                if first_page is None:
+                    first_page = time.perf_counter() - start
+                pages += 1
+                total += len(page)
+            elapsed = time.perf_counter() - start
+            assert total == tracks, (kind, total)
+            print(f"{kind:<9} {total:>6} tracks in {pages:>3} pages: "
+                  f"first page {first_page * 1000:7.1f} ms, all {elapsed * 1000:8.1f} ms")
+
+        # snapshot cache: cold, known, then edited playlist
+        playlist_id = f"pl{cached}"
+        print()
+        for label in ("cold", "known", "edited"):
+            if label == "edited":
+                fake.snapshot_versions[playlist_id] = 1
+            before = dict(fake.requests)
+            elapsed, total = await time_queue(client, "playlist", playlist_id)
+            calls = {k: v - before.get(k, 0) for k, v in fake.requests.items() if v != before.get(k, 0)}
+            print(f"queue {label:<6} playlist ({total} tracks): {elapsed * 1000:8.1f} ms  requests {calls}")
+
+        print(f"\nrequests: {fake.requests}")
+        print(f"tokens issued: {fake.tokens_issued}")
+    finally:
+        await client.close()
+        await fake.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tracks", type=int, default=1000)
+    parser.add_argument("--cached", type=int, default=500)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+    asyncio.run(run(args.tracks, args.cached, args.latency))
@@ -0,0 +1,57 @@
+"""
+Cold-start benchmark: imports bot.py in fresh interpreters and reports how
+long the import takes and how many modules it pulls in, plus the time to
+first use of yt-dlp (which is lazy, so it is paid there or by preload()).
+
+    python bench/bench_startup.py --runs 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from stats import format_row, summarize  # noqa: E402
+
+PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import bot
+imported = time.perf_counter()
+modules = len(sys.modules)
+bot.yt_dlp.YoutubeDL
+print(json.dumps({{
+    "import": imported - start,
+    "first_ytdl": time.perf_counter() - imported,
+    "modules": modules,
+}}))
+"""
+
+
+def run_once(env: dict) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE.format(root=ROOT)],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="bot.py cold-start benchmark")
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    env = dict(os.environ, BOT_DATA_DIR=tempfile.mkdtemp(prefix="bench-startup-"), LOG_LEVEL="WARNING")
+    runs = [run_once(env) for _ in range(args.runs)]
+    print(format_row("import bot", summarize([r["import"] for r in runs])))
+    print(format_row("first yt-dlp use", summarize([r["first_ytdl"] for r in runs])))
+    print(f"modules loaded by import: {runs[-1]['modules']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+End-to-end time-to-first-audio benchmark, fully offline.
+
+Drives the real /play command, ConfirmView.confirm and play_next from bot.py
+against the fakes in bench/fakes.py (delayed yt-dlp, local stream server,
+ffmpeg stand-in, threaded voice client) and reports p50/p95/p99 for:
+
+- prompt      /play invoked → confirm embed sent
+- ttfa        "Yes" clicked → first Opus frame read by the voice client
+              (--think-time between the two lets the speculative resolution finish)
+- gap_lazy    end of one track → first frame of the next (lazy queue entry)
+- gap_ready   same, for entries whose stream URL is still fresh
+
+    python bench/bench_ttfa.py [--iterations 30] [--extract-delay 0.3] [--json out.json]
+    python bench/bench_ttfa.py --budget-ms 900     # exit 1 if ttfa p95 exceeds it
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("BOT_DATA_DIR", tempfile.mkdtemp(prefix="bench-ttfa-"))
+
+import bot  # noqa: E402
+from fakes import (  # noqa: E402
+    ExtractorConfig, FakeChannel, FakeGuild, FakeInteraction, StreamServer, install,
+)
+from stats import format_row, summarize  # noqa: E402
+
+
+def first_frame_waiter(vc) -> asyncio.Future:
+    """Future resolved (on the loop) with the perf_counter of the next first frame."""
+    loop = asyncio.get_running_loop()
+    fut = loop.create_future()
+
+    def _hit(ts):
+        loop.call_soon_threadsafe(lambda: fut.done() or fut.set_result(ts))
+
+    vc.on_first_frame = _hit
+    return fut
+
+
+async def measure_play(guild_id: int, args) -> tuple[float, float]:
+    channel = FakeChannel(guild_id, latency=args.discord_latency)
+    guild = FakeGuild(guild_id, channel, args.frame_interval)
+    vc = guild.voice_client
+
+    interaction = FakeInteraction(guild, channel)
+    start = time.perf_counter()
+    await bot.play.callback(interaction, f"benchmark song {guild_id}")
+    prompt = interaction.marks["followup"] - start
+
+    view = interaction.views[-1]
+    # reading the prompt; the stream is being resolved meanwhile
+    await asyncio.sleep(args.think_time)
+    click = FakeInteraction(guild, channel)
+    first = first_frame_waiter(vc)
+    clicked = time.perf_counter()
+    await view.confirm.callback(click)
+    ttfa = await asyncio.wait_for(first, timeout=30) - clicked
+
+    vc.stop()
+    return prompt, ttfa
+
+
+async def measure_gaps(guild_id: int, tracks: int, fresh: bool, args) -> list[float]:
+    channel = FakeChannel(guild_id, latency=args.discord_latency)
+    guild = FakeGuild(guild_id, channel, args.frame_interval)
+    vc = guild.voice_client
+    interaction = FakeInteraction(guild, channel)
+
+    state = bot.get_state(guild_id)
+    for i in range(tracks):
+        term = f"gap song {guild_id} {i}"
+        if fresh:
+            info = await bot.get_audio_info(term)
+            info["search_query"] = term
+            info["url_fetched_at"] = time.time()
+            state.queue.append(info)
+        else:
+            state.queue.append(bot.lazy_track(term, term))
+
+    await bot.play_next(interaction)
+    deadline = time.monotonic() + 30 + tracks * 5
+    while len(vc.last_frames) < tracks and time.monotonic() < deadline:
+        await asyncio.sleep(0.01)
+
+    return [
+        vc.first_frames[i + 1] - vc.last_frames[i]
+        for i in range(min(len(vc.first_frames), len(vc.last_frames)) - 1)
+    ]
+
+
+async def run(args) -> dict:
+    stream = StreamServer(first_byte_delay=args.first_byte_delay).start()
+    config = ExtractorConfig(stream, delay=args.extract_delay, jitter=args.jitter,
+                             flat_delay=args.flat_delay)
+    undo = install(bot, config, probe_delay=args.probe_delay, track_frames=args.track_frames)
+    try:
+        prompts, ttfas = [], []
+        for i in range(args.iterations):
+            prompt, ttfa = await measure_play(10_000 + i, args)
+            prompts.append(prompt)
+            ttfas.append(ttfa)
+
+        gaps_lazy = await measure_gaps(20_000, args.gap_tracks, fresh=False, args=args)
+        gaps_ready = await measure_gaps(20_001, args.gap_tracks, fresh=True, args=args)
+    finally:
+        # let the last `after` callbacks (stop → play_next → "Queue is empty.") settle
+        await asyncio.sleep(0.5)
+        undo()
+        stream.stop()
+
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("json", "budget_ms")},
+        "extractor_calls": config.calls,
+        "prompt": summarize(prompts),
+        "ttfa": summarize(ttfas),
+        "gap_lazy": summarize(gaps_lazy),
+        "gap_ready": summarize(gaps_ready),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline time-to-first-audio benchmark")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--gap-tracks", type=int, default=10)
+    parser.add_argument("--extract-delay", type=float, default=0.3, help="full yt-dlp extraction (s)")
+    parser.add_argument("--flat-delay", type=float, default=0.1, help="flat yt-dlp listing (s)")
+    parser.add_argument("--jitter", type=float, default=0.1, help="uniform extra extractor delay (s)")
+    parser.add_argument("--probe-delay", type=float, default=0.05, help="ffprobe stand-in (s)")
+    parser.add_argument("--first-byte-delay", type=float, default=0.02, help="stream server TTFB (s)")
+    parser.add_argument("--discord-latency", type=float, default=0.03, help="per REST call (s)")
+    parser.add_argument("--frame-interval", type=float, default=0.002, help="seconds per fake frame")
+    parser.add_argument("--track-frames", type=int, default=50)
+    parser.add_argument("--think-time", type=float, default=0.0, help="prompt shown → Yes clicked (s)")
+    parser.add_argument("--json", help="write the summary here as JSON")
+    parser.add_argument("--budget-ms", type=float, help="fail if ttfa p95 exceeds this")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    result = asyncio.run(run(args))
+
+    print(f"extractor calls: {result['extractor_calls']}")
+    for name in ("prompt", "ttfa", "gap_lazy", "gap_ready"):
+        print(format_row(name, result[name]))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.budget_ms and result["ttfa"]["p95_ms"] > args.budget_ms:
+        print(f"\nFAIL: ttfa p95 {result['ttfa']['p95_ms']} ms > budget {args.budget_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Deterministic generators for realistic-looking track titles and dicts,
+shared by the benchmark scripts in this folder.
+"""
+import random
+
+ARTISTS = [
+    "Don Toliver", "Young Thug", "Drake", "Arctic Monkeys", "Metro Boomin",
+    "SZA", "Kendrick Lamar", "Playboi Carti", "PinkPantheress", "Aphex Twin",
+    "Travis Scott", "Frank Ocean", "Tame Impala", "Daft Punk", "Bad Bunny",
+    "The Weeknd", "Billie Eilish", "Rosalía", "Fred again..", "Burial",
+]
+WORDS = [
+    "night", "lights", "money", "trees", "love", "gone", "back", "city",
+    "drive", "slow", "heaven", "fire", "dreams", "summer", "ghost", "gold",
+    "pink", "rain", "after", "hours", "window", "sky", "paper", "moon",
+]
+TAGS = [
+    "(Official Video)", "(Official Audio)", "[HD]", "(Lyrics)", "[Official Music Video]",
+    "(Visualizer)", "(feat. Future)", "[MV]", "(Remastered 2011)", "(Sped Up)", "",
+]
+CHANNELS = ["VEVO", "Official", "- Topic", "Records", "Music", "TV"]
+
+
+def make_titles(n: int, seed: int = 26, unique_ratio: float = 0.6) -> list[str]:
+    """
+    n titles in "Artist - Song (Tag)" shapes; about (1 - unique_ratio) of them
+    are repeats, like a real history where the same songs come round again.
+    """
+    rng = random.Random(seed)
+    pool_size = max(1, int(n * unique_ratio))
+    pool = []
+    for _ in range(pool_size):
+        artist = rng.choice(ARTISTS)
+        song = " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 4))).title()
+        tag = rng.choice(TAGS)
+        sep = rng.choice([" - ", " – ", ": ", " | "])
+        pool.append(f"{artist}{sep}{song} {tag}".strip())
+    return [rng.choice(pool) for _ in range(n)]
+
+
+def make_tracks(n: int, seed: int = 26) -> list[dict]:
+    """Track dicts shaped like get_audio_info() output."""
+    rng = random.Random(seed)
+    tracks = []
+    for i, title in enumerate(make_titles(n, seed)):
+        artist = title.split(" ")[0]
+        tracks.append({
+            "title": title,
+            "url": f"https://www.youtube.com/watch?v={i:011d}",
+            "stream_url": f"https://rr1.example.invalid/videoplayback?id={i}",
+            "duration": rng.randint(90, 420),
+            "thumbnail": None,
+            "view_count": rng.randint(1_000, 500_000_000),
+            "channel": f"{artist} {rng.choice(CHANNELS)}",
+            "artist": artist,
+            "url_fetched_at": 0.0,
+        })
+    return tracks
@@ -0,0 +1,113 @@
+"""
+Local Redis stand-in: speaks the RESP2 subset cache_backend.RedisCache uses
+(PING, AUTH, SELECT, GET, SET [EX|PX], DEL, DBSIZE, FLUSHALL) with per-key
+expiry, in-process, so the shared cache can be exercised without a server.
+
+    python bench/fake_redis.py --port 6390          # standalone
+    server = await FakeRedis().start()              # from a bench script
+"""
+import argparse
+import asyncio
+import time
+
+
+class FakeRedis:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.dbs: dict[int, dict[bytes, tuple[float | None, bytes]]] = {}
+        self.commands = 0
+        self._server: asyncio.AbstractServer | None = None
+
+    async def start(self) -> "FakeRedis":
+        self._server = await asyncio.start_server(self._client, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    @property
+    def url(self) -> str:
+        return f"redis://{self.host}:{self.port}/0"
+
+    async def stop(self):
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+
+    @staticmethod
+    async def _read_command(reader: asyncio.StreamReader) -> list[bytes]:
+        header = await reader.readuntil(b"\r\n")
+        if not header.startswith(b"*"):
+            return header.strip().split()  # inline command (e.g. from nc)
+        args = []
+        for _ in range(int(header[1:-2])):
+            size = int((await reader.readuntil(b"\r\n"))[1:-2])
+            args.append((await reader.readexactly(size + 2))[:-2])
+        return args
+
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        db = 0
+        try:
+            while True:
+                args = await self._read_command(reader)
+                if not args:
+                    continue
+                self.commands += 1
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                name = args[0].upper()
+                if name == b"SELECT":
+                    db = int(args[1])
+                writer.write(self._execute(self.dbs.setdefault(db, {}), name, args[1:]))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def _execute(self, data: dict, name: bytes, args: list[bytes]) -> bytes:
+        now = time.time()
+        if name in (b"PING", b"AUTH", b"SELECT"):
+            return b"+PONG\r\n" if name == b"PING" else b"+OK\r\n"
+        if name == b"GET":
+            item = data.get(args[0])
+            if item is None or (item[0] is not None and item[0] <= now):
+                data.pop(args[0], None)
+                return b"$-1\r\n"
+            return b"$%d\r\n%s\r\n" % (len(item[1]), item[1])
+        if name == b"SET":
+            expires = None
+            opts = [a.upper() for a in args[2:]]
+            if b"PX" in opts:
+                expires = now + int(args[2 + opts.index(b"PX") + 1]) / 1000
+            elif b"EX" in opts:
+                expires = now + int(args[2 + opts.index(b"EX") + 1])
+            data[args[0]] = (expires, args[1])
+            return b"+OK\r\n"
+        if name == b"DEL":
+            return b":%d\r\n" % sum(data.pop(k, None) is not None for k in args)
+        if name == b"DBSIZE":
+            return b":%d\r\n" % len(data)
+        if name == b"FLUSHALL":
+            data.clear()
+            return b"+OK\r\n"
+        return b"-ERR unknown command '%s'\r\n" % name
+
+
+async def _serve(args):
+    server = await FakeRedis(args.host, args.port, args.latency).start()
+    print(f"fake redis on {server.url}")
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-process Redis stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every command")
+    args = parser.parse_args()
+    asyncio.run(_serve(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Gateway stand-in for supervisor.py: behaves like one bot.py shard worker
+without Discord. It reads SHARD_COUNT / SHARD_IDS / WORKER_ID / METRICS_PORT,
+"identifies" each shard after a delay, serves /metrics and /health like the
+real worker, and can crash on purpose to exercise restarts.
+
+    python supervisor.py --workers 3 --shards 8 --stagger 0.5 \\
+        --worker-cmd "python bench/fake_shard_worker.py --crash-after 5"
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+
+os.environ.setdefault("METRICS_PORT", "9101")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import metrics  # noqa: E402
+from logsetup import setup_logging  # noqa: E402
+
+EVENTS = metrics.Counter("bot_fake_gateway_events_total", "Dispatch events the fake gateway delivered")
+
+
+async def run(args):
+    shard_ids = [int(i) for i in os.getenv("SHARD_IDS", "0").split(",")]
+    worker = os.getenv("WORKER_ID", "0")
+    ready: dict[int, bool] = {sid: False for sid in shard_ids}
+    rng = random.Random()
+
+    metrics.QUEUE_DEPTH.set_function(lambda: {(("guild", sid * 1000 + g),): g % 3
+                                               for sid in shard_ids for g in range(args.guilds)})
+    metrics.set_health(lambda: {
+        "worker": worker,
+        "ready": all(ready.values()),
+        "shards": {str(sid): round(rng.uniform(20, 80), 1) if ok else None for sid, ok in ready.items()},
+        "guilds": args.guilds * len(shard_ids),
+    })
+    await metrics.start_server()
+
+    for sid in shard_ids:
+        await asyncio.sleep(args.identify_delay)
+        ready[sid] = True
+
+    elapsed = 0.0
+    while not args.crash_after or elapsed < args.crash_after:
+        await asyncio.sleep(0.1)
+        elapsed += 0.1
+        for sid in shard_ids:
+            EVENTS.inc(shard=sid)
+    sys.exit(3)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake shard worker for supervisor.py")
+    parser.add_argument("--guilds", type=int, default=5, help="guilds per shard")
+    parser.add_argument("--identify-delay", type=float, default=0.2)
+    parser.add_argument("--crash-after", type=float, default=0.0, help="exit(3) after this many seconds (0 = never)")
+    args = parser.parse_args()
+    setup_logging()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
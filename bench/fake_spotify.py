@@ -0,0 +1,154 @@
+"""
+Local stand-in for the Spotify accounts + Web API endpoints the bot uses.
+
+Serves deterministic playlists/albums of any size with optional per-request
+latency, so SpotifyClient can be exercised offline:
+
+    python bench/fake_spotify.py --port 8765 --latency 0.05
+    SPOTIFY_API_BASE=http://127.0.0.1:8765/v1 \\
+    SPOTIFY_TOKEN_URL=http://127.0.0.1:8765/api/token python bot.py
+
+Playlist/album IDs encode their size: "pl500" has 500 tracks, "al12" has 12.
+"""
+import argparse
+import asyncio
+import re
+
+from aiohttp import web
+
+
+class FakeSpotify:
+    def __init__(self, latency: float = 0.0, token_ttl: int = 3600):
+        self.latency = latency
+        self.token_ttl = token_ttl
+        self.requests: dict[str, int] = {}
+        self.tokens_issued = 0
+        # bump to simulate someone editing a playlist
+        self.snapshot_versions: dict[str, int] = {}
+        # access tokens answered with 401 (as if expired or revoked early)
+        self.revoked: set[str] = set()
+        # route name → statuses (400, 429, 5xx) served before that route answers normally
+        self.faults: dict[str, list[int]] = {}
+        self.retry_after = 0
+        self.app = web.Application()
+        self.app.add_routes([
+            web.post("/api/token", self.token),
+            web.get("/v1/tracks/{id}", self.track),
+            web.get("/v1/albums/{id}/tracks", self.album_tracks),
+            web.get("/v1/playlists/{id}", self.playlist),
+            web.get("/v1/playlists/{id}/tracks", self.playlist_tracks),
+        ])
+        self.runner: web.AppRunner | None = None
+        self.port: int | None = None
+
+    # ─── Lifecycle ────────────────────────────────────────────────────────────
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{self.port}"
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+    # ─── Helpers ──────────────────────────────────────────────────────────────
+    async def _hit(self, request: web.Request, name: str):
+        self.requests[name] = self.requests.get(name, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if name != "token":
+            auth = request.headers.get("Authorization", "")
+            if not auth.startswith("Bearer ") or auth[7:] in self.revoked:
+                raise web.HTTPUnauthorized()
+        if self.faults.get(name):
+            status = self.faults[name].pop(0)
+            if status == 429:
+                raise web.HTTPTooManyRequests(headers={"Retry-After": str(self.retry_after)})
+            if status == 400:
+                raise web.HTTPBadRequest()
+            raise web.HTTPServiceUnavailable() if status == 503 else web.HTTPInternalServerError()
+
+    @staticmethod
+    def _size(item_id: str) -> int:
+        m = re.search(r"(\d+)$", item_id)
+        return int(m.group(1)) if m else 20
+
+    @staticmethod
+    def _track(prefix: str, i: int) -> dict:
+        return {
+            "id": f"{prefix}t{i:06d}",
+            "name": f"Fake Song {i}",
+            "duration_ms": 150_000 + (i * 7919) % 120_000,
+            "external_ids": {"isrc": f"QZFAKE{i:06d}"},
+            "artists": [{"name": f"Fake Artist {i % 37}"}],
+        }
+
+    def _page(self, request: web.Request, item_id: str, path: str, default_limit: int, wrap):
+        total = self._size(item_id)
+        offset = int(request.query.get("offset", 0))
+        limit = int(request.query.get("limit", default_limit))
+        items = [wrap(self._track(item_id, i)) for i in range(offset, min(offset + limit, total))]
+        nxt = None
+        if offset + limit < total:
+            base = f"{request.scheme}://{request.host}{path}"
+            nxt = f"{base}?offset={offset + limit}&limit={limit}"
+        return {"items": items, "next": nxt, "total": total, "offset": offset, "limit": limit}
+
+    # ─── Routes ───────────────────────────────────────────────────────────────
+    async def token(self, request: web.Request):
+        await self._hit(request, "token")
+        self.tokens_issued += 1
+        return web.json_response({
+            "access_token": f"fake-token-{self.tokens_issued}",
+            "token_type": "Bearer",
+            "expires_in": self.token_ttl,
+        })
+
+    async def track(self, request: web.Request):
+        await self._hit(request, "track")
+        return web.json_response(self._track("tr", self._size(request.match_info["id"])))
+
+    async def album_tracks(self, request: web.Request):
+        await self._hit(request, "album_tracks")
+        album_id = request.match_info["id"]
+        return web.json_response(
+            self._page(request, album_id, f"/v1/albums/{album_id}/tracks", 20, lambda t: t)
+        )
+
+    async def playlist(self, request: web.Request):
+        await self._hit(request, "playlist")
+        playlist_id = request.match_info["id"]
+        version = self.snapshot_versions.get(playlist_id, 0)
+        return web.json_response({
+            "id": playlist_id,
+            "snapshot_id": f"{playlist_id}-v{version}",
+            "tracks": {"total": self._size(playlist_id)},
+        })
+
+    async def playlist_tracks(self, request: web.Request):
+        await self._hit(request, "playlist_tracks")
+        playlist_id = request.match_info["id"]
+        return web.json_response(
+            self._page(
+                request, playlist_id, f"/v1/playlists/{playlist_id}/tracks", 100,
+                lambda t: {"track": t},
+            )
+        )
+
+
+async def _serve(port: int, latency: float):
+    fake = FakeSpotify(latency=latency)
+    url = await fake.start(port=port)
+    print(f"fake Spotify API on {url} (API base {url}/v1, token {url}/api/token)")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local fake Spotify Web API")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+    asyncio.run(_serve(args.port, args.latency))
@@ -0,0 +1,469 @@
+"""
+Offline stand-ins for everything bot.py talks to, so the command handlers
+and play_next can be driven end to end without Discord, YouTube or ffmpeg:
+
+- FakeYoutubeDL        yt_dlp.YoutubeDL with configurable (blocking) delays
+- StreamServer         local HTTP server that stream URLs point at
+- FakeOpusSource       ffmpeg stand-in: reads the first bytes of the stream
+- FakeVoiceClient      plays a source on its own thread, like discord.py's
+- fake_measure         loudness analysis stand-in (fixed delay, stable per URL)
+- FakeInteraction      guild / channel / response / followup recorder
+
+install(bot_module, ...) patches them into an imported bot module.
+"""
+import asyncio
+import itertools
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import discord
+
+_ids = itertools.count(1)
+
+
+# ─── Stream URLs ──────────────────────────────────────────────────────────────
+class StreamServer:
+    """
+    Serves /stream/<id> as an endless-ish byte stream after `first_byte_delay`;
+    ids in `dead` get a 403, like an expired or revoked googlevideo URL, and
+    ids in `hung` stop delivering partway through (once each).
+    """
+
+    def __init__(self, first_byte_delay: float = 0.0, chunk: int = 4096):
+        delay, size = first_byte_delay, chunk
+        self.dead: set[str] = set()
+        self.hung: set[str] = set()
+        self.failures: list[float] = []  # perf_counter of each 403 or hang
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(delay)
+                if server.is_dead(self.path):
+                    server.failures.append(time.perf_counter())
+                    self.send_response(403)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "audio/webm")
+                self.send_header("Content-Length", str(size * 16))
+                self.end_headers()
+                try:
+                    for _ in range(16):
+                        self.wfile.write(b"\0" * size)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.base = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self) -> "StreamServer":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+
+    def url(self, video_id: str) -> str:
+        return f"{self.base}/stream/{video_id}"
+
+    def is_dead(self, url: str) -> bool:
+        return url.rsplit("/", 1)[-1] in self.dead
+
+    def take_hung(self, url: str) -> bool:
+        video_id = url.rsplit("/", 1)[-1]
+        if video_id in self.hung:
+            self.hung.discard(video_id)
+            return True
+        return False
+
+
+# ─── yt-dlp ───────────────────────────────────────────────────────────────────
+class ExtractorConfig:
+    def __init__(self, stream: StreamServer, delay: float = 0.3, jitter: float = 0.1,
+                 flat_delay: float = 0.1, fail_rate: float = 0.0, seed: int = 31):
+        self.stream = stream
+        self.delay = delay
+        self.jitter = jitter
+        self.flat_delay = flat_delay
+        self.fail_rate = fail_rate
+        # extractions whose argument contains one of these fail as unavailable
+        self.unavailable: set[str] = set()
+        self.failures: list[float] = []
+        self.rng = random.Random(seed)
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def sleep(self, base: float):
+        with self.lock:
+            self.calls += 1
+            extra = self.rng.uniform(0, self.jitter) if self.jitter else 0.0
+            fail = self.rng.random() < self.fail_rate
+        time.sleep(base + extra)
+        if fail:
+            from yt_dlp.utils import DownloadError
+            raise DownloadError("fake extractor: simulated failure")
+
+
+def make_fake_youtubedl(config: ExtractorConfig):
+    def entry(query: str, i: int = 0, video_id: str | None = None) -> dict:
+        n = next(_ids)
+        video_id = video_id or f"v{n:010d}"
+        return {
+            "id": video_id,
+            "title": f"{query[:40]} #{i}",
+            "webpage_url": f"https://www.youtube.com/watch?v={video_id}",
+            "url": config.stream.url(video_id),
+            # spread out: bot.is_duplicate treats near-equal durations as repeats
+            "duration": 120 + (n * 7919) % 240,
+            "thumbnail": None,
+            "view_count": 1_000_000 - i,
+            "channel": f"Channel {i % 4}",
+        }
+
+    class FakeYoutubeDL:
+        def __init__(self, opts: dict | None = None):
+            self.opts = opts or {}
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def extract_info(self, arg: str, download: bool = False, process: bool = True):
+            flat = bool(self.opts.get("extract_flat")) or not process
+            if flat:
+                config.sleep(config.flat_delay)
+            elif arg.startswith("http"):
+                # a known video: no search request in front of the extraction
+                config.sleep(max(0.0, config.delay - config.flat_delay))
+            else:
+                config.sleep(config.delay)
+            if any(u in arg for u in config.unavailable):
+                from yt_dlp.utils import DownloadError
+                config.failures.append(time.perf_counter())
+                raise DownloadError(f"ERROR: [youtube] {arg}: Video unavailable")
+
+            if arg.startswith("ytsearch"):
+                head, _, query = arg.partition(":")
+                n = int(head[len("ytsearch"):] or 1)
+                entries = [entry(query, i) for i in range(n)]
+                if flat:
+                    for e in entries:
+                        e["url"] = e["webpage_url"]
+                return {"_type": "playlist", "entries": entries}
+            if "list=" in arg:
+                def lazy():
+                    for i in range(200):
+                        e = entry(arg, i)
+                        e["url"] = e["webpage_url"]
+                        yield e
+                return {"_type": "playlist", "entries": lazy()}
+            # default_search / direct URL → single video (the same one, for a watch URL)
+            watched = re.search(r"[?&]v=([\w-]+)", arg)
+            return entry(arg, video_id=watched.group(1) if watched else None)
+
+        def process_ie_result(self, ie_result: dict, download: bool = False):
+            # the rest of one extraction whose search listing was already paid
+            # for (and counted, jitter included) in extract_info
+            time.sleep(max(0.0, config.delay - config.flat_delay))
+            return {**ie_result, "url": config.stream.url(ie_result["id"])}
+
+    return FakeYoutubeDL
+
+
+# ─── ffmpeg ───────────────────────────────────────────────────────────────────
+class FakeOpusSource(discord.AudioSource):
+    """
+    Stands in for FFmpegOpusAudio: the first read() opens the stream URL and
+    pulls the first chunk (what ffmpeg does before its first packet), then
+    each read() is one 20 ms Opus frame until `frames` run out. With
+    `hang_after`, read() blocks after that many frames until cleanup() (the
+    way a stalled ffmpeg pipe blocks until the process is killed).
+    """
+
+    def __init__(self, url: str, frames: int, hang_after: int | None = None, on_hang=None,
+                 options: str | None = None):
+        self.url = url
+        self.options = options
+        self.frames_left = frames
+        self.opened = False
+        self.hang_after = hang_after
+        self.on_hang = on_hang
+        self.killed = threading.Event()
+
+    def is_opus(self) -> bool:
+        return True
+
+    def read(self) -> bytes:
+        if not self.opened:
+            self.opened = True
+            try:
+                with urllib.request.urlopen(self.url, timeout=10) as resp:
+                    resp.read(4096)
+            except urllib.error.URLError:
+                # ffmpeg exits on a 403; its pipe just closes, which the player takes for EOF
+                self.frames_left = 0
+        if self.frames_left <= 0:
+            return b""
+        if self.hang_after is not None:
+            if self.hang_after <= 0:
+                if self.on_hang:
+                    self.on_hang(time.perf_counter())
+                self.killed.wait()
+                return b""
+            self.hang_after -= 1
+        self.frames_left -= 1
+        return b"\xf8\xff\xfe"
+
+    def cleanup(self):
+        self.killed.set()
+
+
+def fake_measure(delay: float):
+    """loudness.measure stand-in: (LUFS, true peak) after `delay`, the same every time for a URL."""
+    async def measure(source: str) -> tuple[float, float]:
+        await asyncio.sleep(delay)
+        lufs = -6.0 - zlib.crc32(source.encode()) % 200 / 10  # -6 … -26 LUFS
+        return lufs, min(0.0, lufs + 12)
+    return measure
+
+
+# ─── Discord ──────────────────────────────────────────────────────────────────
+class FakeVoiceClient:
+    """
+    Mimics discord.VoiceClient.play(): a player thread reads the source every
+    20 ms (or `frame_interval`) and calls `after` when it ends or is stopped.
+    Timestamps of each track's first and last frame are recorded.
+    """
+
+    def __init__(self, channel, frame_interval: float = 0.02):
+        self.channel = channel
+        self.frame_interval = frame_interval
+        self._connected = True
+        self._player: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._paused = threading.Event()
+        self.first_frames: list[float] = []
+        self.last_frames: list[float] = []
+        self.sources: list = []  # everything handed to play(), in order
+        self.on_first_frame = None
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    def is_playing(self) -> bool:
+        return self._player is not None and not self._stop.is_set() and not self._paused.is_set()
+
+    def is_paused(self) -> bool:
+        return self._player is not None and not self._stop.is_set() and self._paused.is_set()
+
+    def pause(self):
+        self._paused.set()
+
+    def resume(self):
+        self._paused.clear()
+
+    def stop(self):
+        # like discord.py: the player is detached at once, `after` fires from its thread
+        self._stop.set()
+        self._paused.clear()
+        self._player = None
+
+    async def disconnect(self, force: bool = False):
+        self.stop()
+        self._connected = False
+
+    def play(self, source, *, after=None, **kwargs):
+        if self.is_playing():
+            raise discord.ClientException("Already playing audio.")
+        self._stop = threading.Event()
+        stop = self._stop
+        self.sources.append(source)
+
+        def run():
+            err = None
+            first = True
+            try:
+                while not stop.is_set():
+                    if self._paused.is_set():
+                        time.sleep(self.frame_interval)
+                        continue
+                    data = source.read()
+                    if not data:
+                        break
+                    if first:
+                        now = time.perf_counter()
+                        self.first_frames.append(now)
+                        if self.on_first_frame:
+                            self.on_first_frame(now)
+                        first = False
+                    time.sleep(self.frame_interval)
+            except Exception as e:
+                err = e
+            self.last_frames.append(time.perf_counter())
+            # ended before `after` runs, so play_next sees an idle client
+            stop.set()
+            source.cleanup()
+            if after:
+                after(err)
+
+        self._player = threading.Thread(target=run, daemon=True, name="fake-voice-player")
+        self._player.start()
+
+
+class FakeMessage:
+    def __init__(self, channel, content=None, embed=None, view=None):
+        self.channel = channel
+        self.content = content
+        self.embed = embed
+        self.view = view
+        self.edits = 0
+
+    async def edit(self, **kwargs):
+        await asyncio.sleep(self.channel.latency)
+        self.edits += 1
+        for k, v in kwargs.items():
+            setattr(self, k, v)
+        return self
+
+    async def delete(self):
+        pass
+
+
+class FakeChannel:
+    def __init__(self, channel_id: int, latency: float = 0.0, bitrate: int = 64000):
+        self.id = channel_id
+        self.name = f"channel-{channel_id}"
+        self.bitrate = bitrate
+        self.latency = latency
+        self.sent: list[FakeMessage] = []
+
+    async def send(self, content=None, *, embed=None, view=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        msg = FakeMessage(self, content, embed, view)
+        self.sent.append(msg)
+        return msg
+
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self.done = False
+
+    def is_done(self) -> bool:
+        return self.done
+
+    async def defer(self, **kwargs):
+        self.done = True
+        self.interaction.mark("defer")
+
+    async def send_message(self, content=None, **kwargs):
+        self.done = True
+        self.interaction.mark("response")
+        self.interaction.messages.append(content)
+
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def send(self, content=None, *, embed=None, view=None, **kwargs):
+        await asyncio.sleep(self.interaction.channel.latency)
+        self.interaction.mark("followup")
+        self.interaction.messages.append(content if content is not None else embed)
+        if view is not None:
+            self.interaction.views.append(view)
+        return FakeMessage(self.interaction.channel, content, embed, view)
+
+
+class FakeGuild:
+    def __init__(self, guild_id: int, channel: FakeChannel, frame_interval: float = 0.02):
+        self.id = guild_id
+        self.voice_client = FakeVoiceClient(channel, frame_interval)
+
+
+class FakeInteraction:
+    """Just enough of discord.Interaction for the slash commands and views."""
+
+    def __init__(self, guild: FakeGuild, channel: FakeChannel, user_id: int = 1):
+        self.guild = guild
+        self.channel = channel
+        self.user = SimpleNamespace(id=user_id, voice=SimpleNamespace(channel=guild.voice_client.channel))
+        self.client = SimpleNamespace(loop=asyncio.get_running_loop())
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        self.messages: list = []
+        self.views: list = []
+        self.extras: dict = {}
+        self.marks: dict[str, float] = {"created": time.perf_counter()}
+
+    def mark(self, name: str):
+        self.marks.setdefault(name, time.perf_counter())
+
+    async def edit_original_response(self, **kwargs):
+        await asyncio.sleep(self.channel.latency)
+        self.mark("edit_original")
+
+
+# ─── Patching ─────────────────────────────────────────────────────────────────
+def install(bot_module, config: ExtractorConfig, probe_delay: float = 0.05, track_frames: int = 25,
+            probe_checks: bool = True, analysis_delay: float = 0.2):
+    """
+    Point an imported bot module at the fakes; returns an undo callable.
+    With `probe_checks`, probing a dead stream finds no codec, the way
+    discord.py's probe reports a failed ffprobe; without, the failure only
+    surfaces once playback reads it (as an early end, not an error).
+    """
+    original_ydl = bot_module.yt_dlp
+    original_from_probe = discord.FFmpegOpusAudio.__dict__["from_probe"]
+    original_probe = discord.FFmpegOpusAudio.__dict__["probe"]
+    original_measure = bot_module.loudness.analyzer.runner
+
+    async def fake_probe(cls, source, *, method=None, executable=None):
+        if callable(method):
+            # like discord.py: a callable method replaces ffprobe entirely
+            return method(source, executable or "ffmpeg")
+        await asyncio.sleep(probe_delay)
+        if probe_checks and config.stream.is_dead(source):
+            # discord.py logs the failed ffprobe and hands back nothing; it never raises
+            config.stream.failures.append(time.perf_counter())
+            return None, None
+        return "opus", 160
+
+    async def fake_from_probe(cls, source, *, method=None, **kwargs):
+        await cls.probe(source, method=method)
+        options = kwargs.get("options")
+        if config.stream.take_hung(source):
+            return FakeOpusSource(source, track_frames, hang_after=track_frames // 2,
+                                  on_hang=config.stream.failures.append, options=options)
+        return FakeOpusSource(source, track_frames, options=options)
+
+    bot_module.yt_dlp = SimpleNamespace(
+        YoutubeDL=make_fake_youtubedl(config),
+        utils=original_ydl.utils,  # real DownloadError, raised by simulated failures
+    )
+    discord.FFmpegOpusAudio.from_probe = classmethod(fake_from_probe)
+    discord.FFmpegOpusAudio.probe = classmethod(fake_probe)
+    bot_module.loudness.analyzer.runner = fake_measure(analysis_delay)
+
+    def undo():
+        bot_module.yt_dlp = original_ydl
+        discord.FFmpegOpusAudio.from_probe = original_from_probe
+        discord.FFmpegOpusAudio.probe = original_probe
+        bot_module.loudness.analyzer.runner = original_measure
+
+    return undo
@@ -0,0 +1,208 @@
+"""
+Multi-guild load simulator: N fake guilds issue a weighted mix of /play
+(+ confirm), /skip and /status against bot.py's real handlers, with a share
+of guilds running autoqueue, while the event loop's responsiveness is
+sampled. Discord, yt-dlp, ffmpeg and voice are the fakes from bench/fakes.py.
+
+For each guild count it reports event-loop lag, per-command latency,
+peak thread count, RSS and the call sites the stall detector blamed, for
+capacity planning:
+
+    python bench/load_sim.py --guilds 50,200,500 --duration 20
+    python bench/load_sim.py --guilds 1000 --mix play=2,skip=1,status=6 --json load.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("BOT_DATA_DIR", tempfile.mkdtemp(prefix="bench-load-"))
+
+import bot  # noqa: E402
+from fakes import (  # noqa: E402
+    ExtractorConfig, FakeChannel, FakeGuild, FakeInteraction, StreamServer, install,
+)
+from stats import format_row, summarize  # noqa: E402
+
+
+def rss_mb() -> float:
+    """Current resident set size (Linux), else the peak from getrusage."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def parse_mix(text: str) -> dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight or 1)
+    unknown = set(mix) - {"play", "skip", "status"}
+    if unknown:
+        raise SystemExit(f"unknown commands in --mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+class Step:
+    """Samples for one guild count."""
+
+    def __init__(self):
+        self.loop_lag: list[float] = []
+        self.latency: dict[str, list[float]] = {"play": [], "confirm": [], "skip": [], "status": []}
+        self.errors = 0
+        self.peak_threads = 0
+        self.peak_rss = 0.0
+
+
+async def monitor(step: Step, stop: asyncio.Event, interval: float):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        step.loop_lag.append(max(0.0, time.perf_counter() - start - interval))
+        step.peak_threads = max(step.peak_threads, threading.active_count())
+        step.peak_rss = max(step.peak_rss, rss_mb())
+
+
+async def guild_worker(guild_id: int, step: Step, stop: asyncio.Event, args, rng: random.Random):
+    channel = FakeChannel(guild_id, latency=args.discord_latency)
+    guild = FakeGuild(guild_id, channel, frame_interval=0.02)
+    state = bot.get_state(guild_id)
+    state.autoqueue_enabled = rng.random() < args.autoqueue_fraction
+    names, weights = zip(*args.mix.items())
+
+    # stagger start so the first second isn't one synchronized burst
+    await asyncio.sleep(rng.uniform(0, args.think))
+    while not stop.is_set():
+        command = rng.choices(names, weights)[0]
+        interaction = FakeInteraction(guild, channel, user_id=guild_id)
+        start = time.perf_counter()
+        try:
+            if command == "play":
+                await bot.play.callback(interaction, f"load song {guild_id} {rng.randint(0, 10**6)}")
+                step.latency["play"].append(time.perf_counter() - start)
+                if interaction.views:
+                    click = FakeInteraction(guild, channel, user_id=guild_id)
+                    start = time.perf_counter()
+                    await interaction.views[-1].confirm.callback(click)
+                    step.latency["confirm"].append(time.perf_counter() - start)
+            elif command == "skip":
+                await bot.skip.callback(interaction)
+                step.latency["skip"].append(time.perf_counter() - start)
+            else:
+                await bot.status.callback(interaction)
+                step.latency["status"].append(time.perf_counter() - start)
+        except Exception as e:
+            step.errors += 1
+            logging.debug(f"[load_sim] {command} failed in guild {guild_id}: {e}")
+        await asyncio.sleep(rng.expovariate(1 / args.think))
+
+    guild.voice_client.stop()
+
+
+async def run_step(guilds: int, first_id: int, args) -> dict:
+    step = Step()
+    stop = asyncio.Event()
+    rng = random.Random(guilds)
+
+    bot.stalls.detector.sites.clear()
+    mon = asyncio.create_task(monitor(step, stop, args.lag_interval))
+    workers = [
+        asyncio.create_task(guild_worker(first_id + i, step, stop, args, random.Random(rng.random())))
+        for i in range(guilds)
+    ]
+    await asyncio.sleep(args.duration)
+    stop.set()
+    # in-flight commands are allowed to finish; they still count
+    await asyncio.wait(workers, timeout=30)
+    await mon
+    await asyncio.sleep(0.5)  # let after-callbacks from the final stop() drain
+
+    for gid in range(first_id, first_id + guilds):
+        bot.guild_states.pop(gid, None)
+
+    return {
+        "guilds": guilds,
+        "loop_lag": summarize(step.loop_lag),
+        **{f"cmd_{name}": summarize(samples) for name, samples in step.latency.items()},
+        "errors": step.errors,
+        "peak_threads": step.peak_threads,
+        "peak_rss_mb": round(step.peak_rss, 1),
+        "stall_sites": bot.stalls.detector.top(5),
+    }
+
+
+async def run(args) -> list[dict]:
+    stream = StreamServer(first_byte_delay=args.first_byte_delay).start()
+    config = ExtractorConfig(stream, delay=args.extract_delay, jitter=args.jitter,
+                             flat_delay=args.flat_delay)
+    undo = install(bot, config, probe_delay=args.probe_delay, track_frames=args.track_frames)
+    bot.stalls.detector.start()
+    results = []
+    try:
+        for n, guilds in enumerate(args.guilds):
+            result = await run_step(guilds, 100_000 * (n + 1), args)
+            result["extractor_calls"] = config.calls
+            results.append(result)
+            print_step(result)
+    finally:
+        await asyncio.sleep(1)  # pending after-callbacks from the last stop()
+        undo()
+        stream.stop()
+    return results
+
+
+def print_step(result: dict):
+    print(f"\n── {result['guilds']} guilds ─ threads {result['peak_threads']}, "
+          f"RSS {result['peak_rss_mb']} MB, errors {result['errors']}, "
+          f"extractor calls so far {result['extractor_calls']}")
+    print(format_row("event-loop lag", result["loop_lag"]))
+    for key in ("cmd_play", "cmd_confirm", "cmd_skip", "cmd_status"):
+        print(format_row(key[4:], result[key]))
+    for site, count in result["stall_sites"]:
+        print(f"  stalled {count}x at {site}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-guild load simulator")
+    parser.add_argument("--guilds", default="50,200,500",
+                        type=lambda s: [int(x) for x in s.split(",")], help="comma-separated guild counts")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per guild count")
+    parser.add_argument("--think", type=float, default=3.0, help="mean seconds between a guild's commands")
+    parser.add_argument("--mix", default="play=3,skip=2,status=5", type=parse_mix)
+    parser.add_argument("--autoqueue-fraction", type=float, default=0.3)
+    parser.add_argument("--extract-delay", type=float, default=0.3)
+    parser.add_argument("--flat-delay", type=float, default=0.1)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--probe-delay", type=float, default=0.05)
+    parser.add_argument("--first-byte-delay", type=float, default=0.02)
+    parser.add_argument("--discord-latency", type=float, default=0.05)
+    parser.add_argument("--track-frames", type=int, default=500, help="20 ms frames per track")
+    parser.add_argument("--lag-interval", type=float, default=0.01)
+    parser.add_argument("--json", help="write all steps here as JSON")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    results = asyncio.run(run(args))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
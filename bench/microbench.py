@@ -0,0 +1,190 @@
+"""
+Microbenchmarks for the pure helpers on bot.py's hot paths, over generated
+corpora (long histories, 10–200 candidate pools, thousand-entry queues).
+
+Each benchmark is calibrated to run for about --min-time per round and
+repeated for --rounds; the per-call median is what gets compared.
+
+    python bench/microbench.py                          # run and print
+    python bench/microbench.py --save bench/baseline.json
+    python bench/microbench.py --compare bench/baseline.json --threshold 15
+    python bench/microbench.py -k duplicate             # name filter
+
+--compare exits 1 when any benchmark's median is more than --threshold
+percent slower than the baseline.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("BOT_DATA_DIR", tempfile.mkdtemp(prefix="bench-micro-"))
+
+import bot  # noqa: E402
+from corpus import make_titles, make_tracks  # noqa: E402
+from normalize import is_duplicate, normalise_title  # noqa: E402
+
+BENCHMARKS: dict[str, callable] = {}
+
+
+def benchmark(name: str):
+    """Register a setup function that returns the zero-argument callable to time."""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+# ─── Benchmarks ───────────────────────────────────────────────────────────────
+@benchmark("normalise_title[10k, warm memo]")
+def _normalise_warm():
+    titles = make_titles(10_000)
+    for t in titles:
+        normalise_title(t)
+    return lambda: [normalise_title(t) for t in titles]
+
+
+@benchmark("normalise_title[10k, cold]")
+def _normalise_cold():
+    titles = make_titles(10_000)
+
+    def run():
+        normalise_title.cache_clear()
+        return [normalise_title(t) for t in titles]
+    return run
+
+
+for _history, _pool in ((200, 10), (1000, 50), (5000, 200)):
+    @benchmark(f"is_duplicate[history={_history}, pool={_pool}]")
+    def _duplicate(history=_history, pool=_pool):
+        tracks = make_tracks(history + pool)
+        past, candidates = tracks[:history], tracks[history:]
+        for t in tracks:
+            t["duration"] = None  # worst case: every pair compared by title
+        return lambda: [is_duplicate(c, past) for c in candidates]
+
+
+@benchmark("infer_genre[1k infos]")
+def _infer_genre():
+    infos = make_tracks(1000)
+    return lambda: [bot.infer_genre(i) for i in infos]
+
+
+@benchmark("generate_feed_query[1k infos]")
+def _feed_query():
+    infos = make_tracks(1000)
+    return lambda: [bot.generate_feed_query(i) for i in infos]
+
+
+for _pool in (10, 50, 200):
+    @benchmark(f"candidate sort[pool={_pool}]")
+    def _candidate_sort(pool=_pool):
+        entries = make_tracks(pool)
+        return lambda: sorted(entries, key=bot.candidate_rank, reverse=True)
+
+
+for _queue in (100, 1000):
+    @benchmark(f"render_queue[{_queue} entries]")
+    def _render(queue=_queue):
+        songs = make_tracks(queue)
+        for i, s in enumerate(songs):
+            s["url_fetched_at"] = 1_700_000_000 + i if i % 3 else None
+        return lambda: bot.render_queue(songs, 1_700_001_000)
+
+
+# ─── Runner ───────────────────────────────────────────────────────────────────
+def calibrate(fn, min_time: float) -> int:
+    """Smallest power-of-two loop count whose run takes at least min_time."""
+    loops = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        if time.perf_counter() - start >= min_time or loops >= 1 << 20:
+            return loops
+        loops *= 2
+
+
+def measure(fn, rounds: int, min_time: float) -> dict:
+    loops = calibrate(fn, min_time)
+    per_call = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        per_call.append((time.perf_counter() - start) / loops)
+    return {
+        "loops": loops,
+        "rounds": rounds,
+        "min_us": round(min(per_call) * 1e6, 3),
+        "median_us": round(statistics.median(per_call) * 1e6, 3),
+        "mean_us": round(statistics.fmean(per_call) * 1e6, 3),
+        "stddev_us": round(statistics.stdev(per_call) * 1e6, 3) if rounds > 1 else 0.0,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    regressions = []
+    print(f"\n{'benchmark':<42} {'baseline':>12} {'now':>12} {'change':>9}")
+    for name, now in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            print(f"{name:<42} {'-':>12} {now['median_us']:>10.1f}us {'new':>9}")
+            continue
+        change = (now["median_us"] - base["median_us"]) / base["median_us"] * 100
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<42} {base['median_us']:>10.1f}us {now['median_us']:>10.1f}us "
+              f"{change:>+8.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hot-helper microbenchmarks")
+    parser.add_argument("-k", dest="filter", help="only run benchmarks whose name contains this")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.05, help="seconds per round")
+    parser.add_argument("--save", help="write results as a JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold, percent")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = stats = measure(setup(), args.rounds, args.min_time)
+        print(f"{name:<42} median {stats['median_us']:>12.1f} us  "
+              f"min {stats['min_us']:>12.1f} us  ±{stats['stddev_us']:.1f}")
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "results": results,
+            }, f, indent=2)
+        print(f"\nbaseline saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold}%")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
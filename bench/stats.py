@@ -0,0 +1,35 @@
+"""Small statistics helpers shared by the bench scripts."""
+import math
+
+
+def percentile(values: list[float], pct: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(values: list[float]) -> dict:
+    """p50/p95/p99/max/mean of a list of seconds, reported in milliseconds."""
+    if not values:
+        return {"n": 0}
+    return {
+        "n": len(values),
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round(max(values) * 1000, 2),
+        "mean_ms": round(sum(values) / len(values) * 1000, 2),
+    }
+
+
+def format_row(name: str, summary: dict) -> str:
+    if not summary.get("n"):
+        return f"{name:<24} (no samples)"
+    return (
+        f"{name:<24} n={summary['n']:<5} p50 {summary['p50_ms']:8.1f} ms  "
+        f"p95 {summary['p95_ms']:8.1f} ms  p99 {summary['p99_ms']:8.1f} ms  "
+        f"max {summary['max_ms']:8.1f} ms"
+    )
@@ -3,17 +3,40 @@ import sys
 import logging
 import asyncio
 import time
+import math
+import functools
 import re
+import threading
+from itertools import islice
+from typing import AsyncIterator
+import startup  # first: starts the startup clock
 import discord
 from discord import app_commands
 from discord.app_commands import Choice
 from discord.ext import commands
 from discord.ui import View, Button
 from dotenv import load_dotenv
-import yt_dlp
-import spotipy
-from spotipy.oauth2 import SpotifyClientCredentials
-from yt_dlp.utils import DownloadError
+
+import extraction
+import health
+import loudness
+import metrics
+import profiler
+import snapshots
+import stalls
+from logsetup import dropped_records, setup_logging
+import tracing
+from matching import rank_matches
+from normalize import clean_feed_title, is_duplicate, normalise_title
+from outbox import discard_outbox, get_outbox
+from watchdog import FrameCounter, PlaybackWatchdog
+from cache_backend import get_cache
+from extraction import CancelToken, ExtractionCancelled, run_extraction, watch
+from spotify import SpotifyClient, SpotifyError
+from storage import get_spotify_match, save_spotify_match
+
+# yt-dlp is the slowest import by far; load it while logging in, not before
+yt_dlp = startup.LazyModule("yt_dlp")
 
 load_dotenv()
 SPOTIPY_ID = os.getenv("SPOTIPY_CLIENT_ID")
@@ -33,14 +56,14 @@ SPOTIFY_ALBUM_RE = re.compile(
     r"https://open\.spotify\.com/album/([A-Za-z0-9]+)"
 )
 
-# app‐only Spotify client
-_sp = spotipy.Spotify(
-    client_credentials_manager=SpotifyClientCredentials(
-        client_id=SPOTIPY_ID,
-        client_secret=SPOTIPY_SECRET,
-    )
+# match youtube.com/playlist?list=… and watch?v=…&list=… (mixes included)
+YOUTUBE_PLAYLIST_RE = re.compile(
+    r"https://(?:www\.|m\.|music\.)?youtube\.com/\S*[?&]list=([A-Za-z0-9_-]+)"
 )
 
+# app‐only Spotify client (async, pooled; no session opened until first use)
+spotify = SpotifyClient(SPOTIPY_ID, SPOTIPY_SECRET)
+
 async def one_ephemeral_ack(interaction: discord.Interaction, content: str):
     """
     Deletes the previous ephemeral ack in this guild (if any),
@@ -56,56 +79,165 @@ async def one_ephemeral_ack(interaction: discord.Interaction, content: str):
             pass
 
     # defer ephemerally and send new ack
-    await interaction.response.defer(ephemeral=True)
-    msg = await interaction.followup.send(content, ephemeral=True)
+    await defer(interaction, ephemeral=True)
+    msg = await followup(interaction, "ack", content, ephemeral=True)
 
     # store for next time
     state.last_ack = msg
     return msg
 
-# ─── Logging Configuration ─────────────────────────────────────────────────────
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(name)s | %(message)s",
-    datefmt="%Y-%m-%d %H:%M:%S"
-)
+async def defer(interaction: discord.Interaction, **kwargs):
+    """Defer the response and note when, for the follow-up latency metric."""
+    await interaction.response.defer(**kwargs)
+    interaction.extras["deferred_at"] = time.perf_counter()
 
-# ─── Environment & Token ───────────────────────────────────────────────────────
-masked = TOKEN[:6] + "…" + TOKEN[-6:] if TOKEN else "None"
-logging.info(f"TOKEN loaded: {masked}")
-if not TOKEN:
-    logging.critical("DISCORD_TOKEN missing in .env")
-    sys.exit(1)
+def observe_followup(interaction: discord.Interaction, command: str):
+    # only the first follow-up after a defer is what the user waited for
+    deferred_at = interaction.extras.pop("deferred_at", None)
+    if deferred_at is not None:
+        metrics.FOLLOWUP_SECONDS.observe(time.perf_counter() - deferred_at, command=command)
+
+async def followup(interaction: discord.Interaction, command: str, *args, **kwargs):
+    observe_followup(interaction, command)
+    return await interaction.followup.send(*args, **kwargs)
+
+# ─── Logging Configuration ─────────────────────────────────────────────────────
+# queue-backed: handlers run on a writer thread, never on the event loop
+setup_logging()
+log = logging.getLogger("bot")
+log_playback = logging.getLogger("bot.playback")
+log_feed = logging.getLogger("bot.autoqueue")
+log_spotify = logging.getLogger("bot.spotify")
+log_commands = logging.getLogger("bot.commands")
 
 # ─── Bot & Intents ─────────────────────────────────────────────────────────────
 intents = discord.Intents.default()
 intents.message_content = True
 intents.voice_states = True
 
-bot = commands.Bot(command_prefix="!", intents=intents)
+# set by supervisor.py when running as one of several shard workers
+SHARD_COUNT = int(os.getenv("SHARD_COUNT", "0") or 0)
+SHARD_IDS = [int(i) for i in os.getenv("SHARD_IDS", "").split(",") if i.strip()]
+WORKER_ID = os.getenv("WORKER_ID")
+
+if SHARD_COUNT:
+    bot = commands.AutoShardedBot(
+        command_prefix="!", intents=intents,
+        shard_count=SHARD_COUNT, shard_ids=SHARD_IDS or None,
+    )
+else:
+    bot = commands.Bot(command_prefix="!", intents=intents)
 
 FFMPEG_OPTIONS = {"options": "-vn"}
 class GuildState:
-    def __init__(self):
+    def __init__(self, guild_id: int | None = None):
+        self.guild_id = guild_id
+        # bumped by every change a warm-restart snapshot would see
+        self.version = 0
         self.queue = []
         self.history = []
         self.loop_mode = "off"
         self.bitrate_mode = "default"
+        # cap of the voice channel we're in (kbps), for the "auto" bitrate mode
+        self.channel_kbps: int | None = None
         self.autoqueue_enabled = False
-        self.now_playing_message = None
-        self.autoqueue_message = None
         self.paused = False
 
         # add this:
         self.last_ack: discord.Message | None = None
 
+        # where and how far along playback is, for warm-restart snapshots
+        self.voice_channel_id: int | None = None
+        self.text_channel_id: int | None = None
+        self.track_started_at: float | None = None
+        self.paused_at: float | None = None
+
+        # parent of every extraction started for this guild; /stop and /leave cancel it
+        self.jobs = CancelToken()
+        # play_next waiting out an upstream's backoff
+        self.retry_task: asyncio.Task | None = None
+
+        # hung-pipeline recovery: where to resume, and how often this song has stalled
+        self.watchdog = PlaybackWatchdog()
+        self.pending_restart: float | None = None
+        self.stalled_song: dict | None = None
+        self.stalls = 0
+
+    def __setattr__(self, name, value):
+        if name in snapshots.TRACKED_FIELDS:
+            if name in ("queue", "history"):
+                value = snapshots.TrackedList(value, self.touch)
+            self.touch()
+        object.__setattr__(self, name, value)
+
+    def touch(self):
+        self.__dict__["version"] = self.__dict__.get("version", 0) + 1
+
+    def cancel_jobs(self, reason: str):
+        """Abandon this guild's in-flight extractions and imports; later work gets a fresh token."""
+        self.jobs.cancel(reason)
+        self.jobs = CancelToken()
+
+    def requeue(self, song: dict):
+        """Undo play_next's pop of `song`, loop modes included, so it comes up next again."""
+        if self.history and self.history[-1] is song:
+            self.history.pop()
+        if self.loop_mode == "all" and self.queue and self.queue[-1] is song:
+            self.queue.pop()
+        if not (self.queue and self.queue[0] is song):
+            self.queue.insert(0, song)
+
+    def format_ceiling(self) -> int:
+        """kbps ceiling for stream formats: the /bitrate mode's, or what "auto" works out now."""
+        if self.bitrate_mode == "auto":
+            return auto_ceiling(self.channel_kbps, self.guild_id)
+        return BITRATE_MODES.get(self.bitrate_mode, BITRATE_MODES["default"])
+
+    def set_paused(self, paused: bool):
+        now = time.time()
+        if paused and self.paused_at is None:
+            self.paused_at = now
+        elif not paused and self.paused_at is not None:
+            # paused time doesn't count towards the position
+            if self.track_started_at is not None:
+                self.track_started_at += now - self.paused_at
+            self.paused_at = None
+        self.paused = paused
+
 guild_states: dict[int, GuildState] = {}
 
 def get_state(guild_id: int) -> GuildState:
     if guild_id not in guild_states:
-        guild_states[guild_id] = GuildState()
+        guild_states[guild_id] = GuildState(guild_id)
     return guild_states[guild_id]
 
+# evaluated only when /metrics is scraped
+metrics.QUEUE_DEPTH.set_function(
+    lambda: {(("guild", gid),): len(s.queue) for gid, s in guild_states.items()}
+)
+metrics.VOICE_CONNECTIONS.set_function(
+    lambda: {(): sum(1 for vc in bot.voice_clients if vc.is_connected())}
+)
+metrics.LOG_RECORDS_DROPPED.set_function(lambda: {(): dropped_records()})
+
+def worker_health() -> dict:
+    """What this process reports on /health (polled by supervisor.py)."""
+    latencies = getattr(bot, "latencies", None) or [(bot.shard_id, bot.latency)]
+    return {
+        "worker": WORKER_ID,
+        "ready": bot.is_ready(),
+        "shards": {str(sid): None if math.isnan(lat) else round(lat * 1000, 1) for sid, lat in latencies},
+        "guilds": len(bot.guilds),
+        "voice": sum(1 for vc in bot.voice_clients if vc.is_connected()),
+        "queued": sum(len(s.queue) for s in guild_states.values()),
+        "abandoned_extractions": extraction.zombies(),
+        "upstreams": health.states(),
+        "loudness": loudness.analyzer.stats(),
+        "log_records_dropped": dropped_records(),
+    }
+
+metrics.set_health(worker_health)
+
 GENRE_MAP = {
     "Don Toliver": "trap",
     "Young Thug": "trap",
@@ -148,35 +280,14 @@ def infer_genre(info: dict) -> list[str]:
             return [genre]
     return []
 
-def normalise_title(title: str) -> str:
-    title = title.lower()
-    title = re.sub(r'\[.*?\]|\(.*?\)', '', title)
-    title = re.sub(r'[^a-z0-9\s]', '', title)
-    title = re.sub(r'\s+', ' ', title)
-    return title.strip()
-
-def is_duplicate(candidate: dict, history: list) -> bool:
-    cand_title = normalise_title(candidate.get("title", ""))
-    cand_dur = candidate.get("duration")
-    for song in history:
-        hist_title = normalise_title(song.get("title", ""))
-        hist_dur = song.get("duration")
-        if cand_title == hist_title:
-            return True
-        if cand_dur and hist_dur and abs(cand_dur - hist_dur) <= 3:
-            return True
-    return False
-
 def generate_feed_query(info: dict) -> str:
-    title = info.get("title", "")
+    title = info.get("title") or ""
     artist = info.get("artist", "")
     genres = info.get("genre", []) or infer_genre(info)
     genre_str = " ".join(genres)
 
     # Remove bracketed tags and noise words
-    title = re.sub(r'\[.*?\]|\(.*?\)', '', title)
-    noise_words = ["official", "video", "lyrics", "audio", "hd", "hq", "mv"]
-    filtered_title = " ".join([w for w in title.split() if w.lower() not in noise_words])
+    filtered_title = clean_feed_title(title)
 
     # Build a broader discovery query
     query_parts = [
@@ -192,16 +303,22 @@ def generate_feed_query(info: dict) -> str:
 
 async def auto_feed(interaction: discord.Interaction, song_info: dict):
     state = get_state(interaction.guild.id)
+    # discovery is optional; leave YouTube's remaining capacity to requested songs
+    if health.youtube_stream.degraded:
+        log_feed.info("[auto_feed] YouTube degraded, discovery paused")
+        return
     query = generate_feed_query(song_info)
-    logging.info(f"[auto_feed] Discovery query: {query}")
+    log_feed.info("[auto_feed] Discovery query: %s", query)
 
     try:
         # Fetch a deeper pool of candidates
         candidates = await get_audio_info(
             query,
-            state.bitrate_mode,
+            state.format_ceiling(),
             exclude_url=song_info["url"],
-            max_results=10
+            max_results=10,
+            caller="auto_feed",
+            token=state.jobs,
         )
         if isinstance(candidates, dict):
             candidates = [candidates]
@@ -210,30 +327,35 @@ async def auto_feed(interaction: discord.Interaction, song_info: dict):
         for c in candidates:
             # skip anything already played or queued
             if is_duplicate(c, state.history + state.queue):
-                logging.info(f"[auto_feed] Skipped duplicate (played/queued): {c['title']}")
+                log_feed.debug("[auto_feed] Skipped duplicate (played/queued): %s", c["title"])
                 continue
 
             # skip same-channel repeats (optional)
             if state.history and c.get("channel") == state.history[-1].get("channel"):
-                logging.info(f"[auto_feed] Skipped same-channel: {c['channel']}")
+                log_feed.debug("[auto_feed] Skipped same-channel: %s", c["channel"])
                 continue
 
             rec = c
-            logging.info(
-                f"[auto_feed] Picked rec: {rec['title']} "
-                f"({rec.get('view_count', 'N/A')} views) "
-                f"from {rec.get('channel', 'unknown')}"
+            log_feed.info(
+                "[auto_feed] Picked rec: %s (%s views) from %s",
+                rec["title"], rec.get("view_count", "N/A"), rec.get("channel", "unknown"),
             )
             break
 
         if not rec:
-            logging.warning(f"[auto_feed] No suitable new track found for query: {query}")
+            log_feed.warning("[auto_feed] No suitable new track found for query: %s", query)
             return
 
         # Queue up the recommendation
         rec["search_query"] = query
-        rec["url_fetched_at"] = time.time()
+        # the rest of this pool stands in if its stream turns out dead
+        rec["alternates"] = [
+            alternate_entry(c) for c in candidates
+            if c is not rec and not is_duplicate(c, state.history + state.queue)
+        ][:ALTERNATES]
+        rec.setdefault("url_fetched_at", time.time())
         state.queue.append(rec)
+        analyse_loudness(rec)
 
         # Notify via embed
         embed = discord.Embed(
@@ -244,41 +366,139 @@ async def auto_feed(interaction: discord.Interaction, song_info: dict):
         if thumb := rec.get("thumbnail"):
             embed.set_thumbnail(url=thumb)
 
-        if state.autoqueue_message:
-            await state.autoqueue_message.edit(embed=embed)
-        else:
-            state.autoqueue_message = await interaction.channel.send(embed=embed)
+        # coalesced with other updates; never waits on Discord
+        get_outbox(interaction.channel).post("autoqueue", embed=embed)
 
+    except ExtractionCancelled as e:
+        log_feed.info("[auto_feed] Discovery abandoned (%s)", e.reason)
+    except health.UpstreamUnavailable as e:
+        log_feed.info("[auto_feed] Discovery skipped: %s", e)
     except Exception as e:
-        logging.error(f"[auto_feed] error: {e}")
+        log_feed.error("[auto_feed] error: %s", e)
         await interaction.channel.send(f"Feed error: {e}")
 
+# shared-cache lifetimes (seconds); see cache_backend.py for where entries live.
+# Entries with stream URLs must expire well inside play_next's 15-minute
+# refresh rule. googlevideo URLs are also tied to the extracting IP, so only
+# share them between instances behind one address (0 turns that off).
+CACHE_STREAM_TTL = int(os.getenv("CACHE_STREAM_TTL", "600"))
+CACHE_SEARCH_TTL = int(os.getenv("CACHE_SEARCH_TTL", str(24 * 3600)))
+CACHE_MATCH_TTL = int(os.getenv("CACHE_MATCH_TTL", str(30 * 24 * 3600)))
+
+# runners-up kept on each resolved track, tried in order if its stream dies
+ALTERNATES = int(os.getenv("ALTERNATES", "3"))
+ALTERNATE_KEYS = ("title", "url", "duration", "channel", "view_count", "stream_url", "url_fetched_at")
+
+def alternate_entry(e: dict) -> dict:
+    """A runner-up as stored on a track: enough to extract it by URL later (or play it, if fresh)."""
+    e = {**e, "url": e.get("webpage_url") or e.get("url") or YOUTUBE_WATCH_URL.format(e.get("id"))}
+    if not e.get("channel"):
+        e["channel"] = e.get("uploader")
+    return {k: e[k] for k in ALTERNATE_KEYS if e.get(k) is not None}
+
+def candidate_rank(e: dict) -> tuple[bool, int]:
+    """Sort key for search results: official/VEVO/Topic channels first, then views."""
+    channel = (e.get("channel") or "").lower()
+    return (
+        "official" in channel or "vevo" in channel or "topic" in channel,
+        e.get("view_count") or 0,
+    )
+
+# fixed /bitrate ceilings (kbps); "auto" follows the voice channel instead
+BITRATE_MODES = {"default": 160, "low": 96}
+# what this host may spend on streams in total (kbps, 0 = no limit), shared by the playing guilds
+NET_BUDGET_KBPS = int(os.getenv("NET_BUDGET_KBPS", "0"))
+# below this YouTube has nothing to offer anyway (its lowest Opus tier is ~50)
+AUTO_MIN_KBPS = 48
+
+def auto_ceiling(channel_kbps: int | None, guild_id: int | None = None) -> int:
+    """The channel's cap, further limited to guild `guild_id`'s share of NET_BUDGET_KBPS."""
+    ceiling = channel_kbps or BITRATE_MODES["default"]
+    if NET_BUDGET_KBPS:
+        # every other guild streaming now, plus this one: play_next asks before it starts
+        others = sum(1 for vc in bot.voice_clients if vc.is_playing() and vc.guild.id != guild_id)
+        ceiling = min(ceiling, NET_BUDGET_KBPS // (others + 1))
+    return max(AUTO_MIN_KBPS, ceiling)
+
 async def get_audio_info(
     query: str,
-    bitrate_mode: str = "default",
+    bitrate_mode: str | int = "default",
     exclude_url: str = None,
-    max_results: int = 1
+    max_results: int = 1,
+    caller: str = "play",
+    token: CancelToken | None = None,
 ) -> dict | list[dict]:
 
-    bitrate_map = {"default": 160, "low": 96}
-    kbps = bitrate_map.get(bitrate_mode, bitrate_map["default"])
+    # a /bitrate mode name, or a ceiling already worked out by GuildState.format_ceiling
+    if isinstance(bitrate_mode, int):
+        kbps = bitrate_mode
+    else:
+        kbps = BITRATE_MODES.get(bitrate_mode, BITRATE_MODES["default"])
 
     ydl_opts = {
-        "format": f"bestaudio[abr<={kbps}]/bestaudio",
+        # Opus under the ceiling first: from_probe passes it through without transcoding
+        "format": f"bestaudio[acodec=opus][abr<={kbps}]/bestaudio[abr<={kbps}]/bestaudio",
         "quiet": True,
         "noplaylist": True,
         "default_search": "ytsearch",
         "skip_download": True,
     }
 
-    search_term = f"ytsearch{max_results}:{query}" if max_results > 1 else query
+    # a plain-text single lookup lists a few runners-up from the same search request
+    with_alternates = max_results == 1 and ALTERNATES > 0 and not re.match(r"https?://", query)
+    if max_results > 1:
+        search_term = f"ytsearch{max_results}:{query}"
+    elif with_alternates:
+        search_term = f"ytsearch{ALTERNATES + 1}:{query}"
+    else:
+        search_term = query
+
+    # 3) Another instance (or an earlier call) may have just extracted this
+    cache = get_cache()
+    cache_key = f"{kbps}:{max_results}:{query}"
+    out = await cache.get("info", cache_key)
+    if out is None:
+        out = await _extract_audio_info(
+            search_term, ydl_opts, max_results, caller, query, token, with_alternates
+        )
+        for e in out:
+            # the format ceiling it was picked under; play_next re-fetches if that moves
+            e["kbps"] = kbps
+        await cache.set("info", cache_key, out, CACHE_STREAM_TTL)
 
-    def _extract(arg):
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            return ydl.extract_info(arg, download=False)
+    # 8) Exclude the previous track if requested
+    if exclude_url:
+        out = [e for e in out if e["url"] != exclude_url]
+    out = out[:max_results]
 
-    # 4) Run yt-dlp off the main thread
-    info = await asyncio.to_thread(_extract, search_term)
+    # 9) Return a single dict when max_results == 1
+    return out[0] if max_results == 1 else out
+
+async def _extract_audio_info(
+    search_term: str, ydl_opts: dict, max_results: int, caller: str, query: str,
+    token: CancelToken | None = None, with_alternates: bool = False,
+) -> list[dict]:
+    def _extract(arg, job):
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            watch(ydl, job)
+            if not with_alternates:
+                return ydl.extract_info(arg, download=False)
+            # list the search flat, then resolve formats for the top hit only
+            listing = ydl.extract_info(arg, download=False, process=False)
+            hits = [e for e in islice(listing.get("entries") or [], ALTERNATES + 1) if e]
+            if not hits:
+                raise yt_dlp.utils.DownloadError(f"No results for {query}")
+            info = ydl.process_ie_result(hits[0], download=False)
+            info["_alternates"] = hits[1:]
+            return info
+
+    # 4) Run yt-dlp off the main thread, under a deadline and the caller's token
+    with metrics.EXTRACTION_SECONDS.time(caller=caller), \
+            tracing.span("get_audio_info", caller=caller, query=query[:100]):
+        info = await run_extraction(
+            _extract, search_term, token=token, caller=caller, breaker=health.youtube_stream
+        )
+    fetched_at = time.time()
 
     # 5) Normalize into a flat list of entries
     if max_results > 1 and "entries" in info:
@@ -290,30 +510,20 @@ async def get_audio_info(
         else:
             entries = [info]
 
-    # 6) Exclude the previous track if requested
     def page_url(e):
         return e.get("webpage_url") or e.get("url")
-    if exclude_url:
-        entries = [e for e in entries if page_url(e) != exclude_url]
-
-    # 7) Sort by “official” channel boost then view_count descending
-    entries.sort(
-        key=lambda e: (
-            (
-                "official" in (e.get("channel") or "").lower()
-                or "vevo" in (e.get("channel") or "").lower()
-                or "topic" in (e.get("channel") or "").lower()
-            ),
-            e.get("view_count") or 0
-        ),
-        reverse=True
-    )
 
-    # 8) Build the final payload(s)
+    # 6) Sort by “official” channel boost then view_count descending
+    entries.sort(key=candidate_rank, reverse=True)
+
+    # 7) Build the payloads (cacheable: plain JSON types only)
     out = []
-    for e in entries[:max_results]:
+    for e in entries:
+        title = e.get("title")
         out.append({
-            "title": e.get("title"),
+            "title": title,
+            # normalized once here so duplicate checks never redo it
+            "norm_title": normalise_title(title or ""),
             "url": page_url(e),
             # Because we set format to bestaudio, info["url"] is the direct stream link
             "stream_url": e.get("url"),
@@ -321,20 +531,366 @@ async def get_audio_info(
             "thumbnail": e.get("thumbnail"),
             "view_count": e.get("view_count"),
             "channel": e.get("channel"),
+            # how old the stream URL really is, even when served from cache
+            "url_fetched_at": fetched_at,
         })
+    if with_alternates and out:
+        runners_up = sorted(info.get("_alternates") or [], key=candidate_rank, reverse=True)
+        out[0]["alternates"] = [alternate_entry(e) for e in runners_up]
+    return out
+
+YOUTUBE_WATCH_URL = "https://www.youtube.com/watch?v={}"
+# static, so a flat search result can have its thumbnail without another request
+YOUTUBE_THUMBNAIL_URL = "https://i.ytimg.com/vi/{}/hqdefault.jpg"
+
+# below this a stored match is re-searched next time instead of trusted
+MIN_MATCH_CONFIDENCE = 0.6
+MATCH_CANDIDATES = 5
+# runners-up scoring below this are different songs, not other uploads of this one
+ALTERNATE_MIN_CONFIDENCE = 0.4
+
+async def search_candidates(
+    query: str,
+    max_results: int = MATCH_CANDIDATES,
+    caller: str = "spotify",
+    token: CancelToken | None = None,
+) -> list[dict]:
+    """
+    Flat YouTube search: id/title/duration/channel per result, no format
+    resolution, so scoring several candidates costs one cheap request.
+    """
+    cache = get_cache()
+    cache_key = f"{max_results}:{query}"
+    cached = await cache.get("search", cache_key)
+    if cached is not None:
+        return cached
 
-    # 9) Return a single dict when max_results == 1
-    return out[0] if max_results == 1 else out
+    ydl_opts = {
+        "quiet": True,
+        "extract_flat": "in_playlist",
+        "skip_download": True,
+    }
+
+    def _extract(job):
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            return watch(ydl, job).extract_info(f"ytsearch{max_results}:{query}", download=False)
+
+    with metrics.EXTRACTION_SECONDS.time(caller=caller), \
+            tracing.span("search_candidates", caller=caller, query=query[:100]):
+        info = await run_extraction(_extract, token=token, caller=caller, breaker=health.youtube_search)
+    results = [
+        {
+            "id": e.get("id"),
+            "title": e.get("title"),
+            "url": e.get("url") or YOUTUBE_WATCH_URL.format(e.get("id")),
+            "duration": e.get("duration"),
+            "channel": e.get("channel") or e.get("uploader"),
+            "view_count": e.get("view_count"),
+            # label uploads often quote the ISRC here; matching checks it
+            "description": (e.get("description") or "")[:500] or None,
+        }
+        for e in info.get("entries") or [] if e and e.get("id")
+    ]
+    # flat results carry no stream URLs, so they can be kept much longer
+    await cache.set("search", cache_key, results, CACHE_SEARCH_TTL)
+    return results
+
+# bulk imports stop here; mixes in particular can run on for a long time
+MAX_IMPORT_ENTRIES = 5000
+# a playlist walk holds one extraction slot for as long as this at most
+IMPORT_TIMEOUT = float(os.getenv("IMPORT_TIMEOUT", "300"))
+IMPORT_BATCH_SIZE = 100
+UNAVAILABLE_TITLES = {"[Private video]", "[Deleted video]"}
+
+async def iter_flat_entries(
+    url: str, batch_size: int = IMPORT_BATCH_SIZE, token: CancelToken | None = None
+) -> AsyncIterator[list[dict]]:
+    """
+    List a YouTube playlist/mix without resolving any formats, yielding
+    batches of flat entries (id/title/duration/channel) in playlist order.
+
+    yt-dlp walks the playlist lazily in a worker thread (one extraction
+    slot, under IMPORT_TIMEOUT) and hands batches over a small bounded
+    queue, so memory stays flat however long it is. Cancelling `token`
+    raises ExtractionCancelled here at once; the walker stops at its next
+    entry or request.
+    """
+    loop = asyncio.get_running_loop()
+    batches: asyncio.Queue = asyncio.Queue(maxsize=4)
+    done = object()
+    stop = threading.Event()
+    ydl_opts = {
+        "quiet": True,
+        "extract_flat": "in_playlist",
+        "lazy_playlist": True,
+        "noplaylist": False,
+        "skip_download": True,
+    }
+
+    def _put(item):
+        # blocks the worker (not the loop) while the consumer catches up
+        asyncio.run_coroutine_threadsafe(batches.put(item), loop).result()
+
+    def _walk(job):
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = watch(ydl, job).extract_info(url, download=False, process=False)
+            entries = info.get("entries") if info.get("_type") in ("playlist", "multi_video") else [info]
+            batch = []
+            for e in islice(entries or [], MAX_IMPORT_ENTRIES):
+                if stop.is_set():
+                    return
+                job.check()
+                if not e or not e.get("id") or e.get("title") in UNAVAILABLE_TITLES:
+                    continue
+                batch.append(e)
+                if len(batch) >= batch_size:
+                    _put(batch)
+                    batch = []
+            if batch and not stop.is_set():
+                _put(batch)
+
+    async def _produce():
+        try:
+            await run_extraction(_walk, token=token, timeout=IMPORT_TIMEOUT,
+                                 caller="import", breaker=health.youtube_search)
+        except asyncio.CancelledError:
+            raise
+        except BaseException as e:
+            await batches.put(e)
+        else:
+            await batches.put(done)
+
+    producer = loop.create_task(_produce())
+    try:
+        while (item := await batches.get()) is not done:
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        # unblock a worker stuck on a full queue so it can see `stop`
+        while not batches.empty():
+            batches.get_nowait()
+        if not producer.done():
+            producer.cancel()
+
+def youtube_lazy_track(e: dict) -> dict:
+    url = YOUTUBE_WATCH_URL.format(e["id"])
+    return lazy_track(
+        e.get("title") or url,
+        url,
+        url=url,
+        duration=e.get("duration"),
+        channel=e.get("channel") or e.get("uploader"),
+    )
+
+async def lookup_spotify_match(sp_id: str) -> dict | None:
+    """Stored Spotify → YouTube match: shared cache first, then our own SQLite."""
+    cache = get_cache()
+    match = await cache.get("spmatch", sp_id)
+    if match is None:
+        match = await asyncio.to_thread(get_spotify_match, sp_id)
+        if match:
+            await cache.set("spmatch", sp_id, match, CACHE_MATCH_TTL)
+    return match
+
+async def store_spotify_match(sp_id: str, video_id: str, confidence: float, isrc: str | None):
+    await asyncio.to_thread(save_spotify_match, sp_id, video_id, confidence, isrc)
+    await get_cache().set("spmatch", sp_id, {
+        "video_id": video_id, "confidence": confidence, "isrc": isrc, "matched_at": time.time(),
+    }, CACHE_MATCH_TTL)
+
+async def resolve_spotify_track(
+    track: dict, bitrate_mode: str | int = "default", token: CancelToken | None = None
+) -> dict:
+    """
+    Resolve a lazy Spotify track to a playable YouTube entry.
+
+    A confident stored match is extracted directly by video ID; otherwise
+    the search results are scored by title/artist tokens and duration, and
+    the winner is stored with its confidence for every later play.
+    """
+    sp_id = track["spotify_id"]
+
+    # 1) Known match → no search at all
+    match = await lookup_spotify_match(sp_id)
+    if match and match["confidence"] >= MIN_MATCH_CONFIDENCE:
+        log_spotify.debug("[spotify-match] Cached %s → %s (confidence %s)",
+                          sp_id, match["video_id"], match["confidence"])
+        info = await get_audio_info(
+            YOUTUBE_WATCH_URL.format(match["video_id"]), bitrate_mode, caller="spotify", token=token
+        )
+        info["match_confidence"] = match["confidence"]
+        info["spotify_id"] = sp_id
+        # alternates only if the search is still cached; not worth a request of its own
+        cached = await get_cache().get("search", f"{MATCH_CANDIDATES}:{track['search_query']}")
+        if cached:
+            info["alternates"] = spotify_alternates(rank_matches(track, cached), match["video_id"])
+        return info
+
+    # 2) Score a handful of flat search results, extract only the winner
+    candidates = await search_candidates(track["search_query"], token=token)
+    ranked = rank_matches(track, candidates)
+    best, confidence = ranked[0] if ranked else (None, 0.0)
+    if not best:
+        # nothing scorable; keep the old top-hit behaviour
+        info = await get_audio_info(track["search_query"], bitrate_mode, caller="spotify", token=token)
+        info["spotify_id"] = sp_id
+        return info
+
+    log_spotify.info("[spotify-match] %s → %s (%s, confidence %s)",
+                     track["title"], best["title"], best["id"], confidence)
+    await store_spotify_match(sp_id, best["id"], confidence, track.get("isrc"))
+
+    info = await get_audio_info(best["url"], bitrate_mode, caller="spotify", token=token)
+    info["match_confidence"] = confidence
+    info["spotify_id"] = sp_id
+    info["alternates"] = spotify_alternates(ranked, best["id"])
+    return info
+
+def spotify_alternates(ranked: list[tuple[dict, float]], chosen_id: str) -> list[dict]:
+    return [
+        alternate_entry(c) for c, score in ranked
+        if c["id"] != chosen_id and score >= ALTERNATE_MIN_CONFIDENCE
+    ][:ALTERNATES]
+
+async def resolve_track(
+    song: dict, bitrate_mode: str | int = "default", caller: str = "play_next", token: CancelToken | None = None
+) -> dict:
+    """Fetch a fresh stream for a queued song, lazy or previously resolved."""
+    if song.get("spotify_id"):
+        return await resolve_spotify_track(song, bitrate_mode, token)
+    return await get_audio_info(
+        song.get("search_query", song["title"]), bitrate_mode, caller=caller, token=token
+    )
+
+def apply_resolved(song: dict, resolved: dict):
+    """Move a fresh resolution's stream onto a queued song."""
+    song["url"] = resolved["url"]
+    song["kbps"] = resolved.get("kbps")
+    song["stream_url"] = resolved.get("stream_url", resolved["url"])
+    song["url_fetched_at"] = resolved.get("url_fetched_at") or time.time()
+    # lazily-queued tracks only had a title until now
+    for key in ("duration", "thumbnail", "channel", "view_count"):
+        if not song.get(key):
+            song[key] = resolved.get(key)
+    if resolved.get("alternates"):
+        song["alternates"] = resolved["alternates"]
 
 # ─── Playback & Auto-Feed ─────────────────────────────────────────────────────
+def stream_valid_for(song: dict) -> float:
+    """Seconds left on a googlevideo stream URL (its `expire=` parameter), 0 if unknown."""
+    m = re.search(r"[?&]expire=(\d+)", song.get("stream_url") or "")
+    return float(m.group(1)) - time.time() if m else 0.0
+
+def analyse_loudness(song: dict):
+    """Hand a track to the background loudness analyser while its stream URL still works."""
+    if song.get("stream_url") and song.get("url_fetched_at"):
+        usable_for = stream_valid_for(song) or 900 - (time.time() - song["url_fetched_at"])
+        loudness.analyzer.submit(song["url"], song["stream_url"], usable_for)
+
+def schedule_retry(interaction: discord.Interaction, delay: float):
+    """Call play_next again after `delay`, unless /stop or /leave comes first."""
+    state = get_state(interaction.guild.id)
+    if state.retry_task and not state.retry_task.done():
+        return
+    token = state.jobs
+
+    async def _retry():
+        await asyncio.sleep(delay)
+        vc = interaction.guild.voice_client
+        if token.cancelled or not vc or not vc.is_connected() or vc.is_playing() or vc.is_paused():
+            return
+        await tracing.run_traced("play_next", interaction.guild.id, play_next(interaction))
+
+    state.retry_task = asyncio.create_task(_retry())
+
+
+async def forget_stream(song: dict):
+    """Drop the cached resolution that handed out `song`'s dead stream, so a replay doesn't get it again."""
+    cache = get_cache()
+    for query in {song.get("search_query"), song.get("url")} - {None}:
+        await cache.invalidate("info", f"{song.get('kbps')}:1:{query}")
 
-async def play_next(interaction: discord.Interaction):
+async def switch_to_alternate(song: dict, state: GuildState, stage: str) -> bool:
+    """
+    Point `song` at its next ranked alternate's stream, in place (the same
+    dict sits in history and, when looping, the queue). False once none work.
+    """
+    await forget_stream(song)
+    while song.get("alternates"):
+        alt = song["alternates"].pop(0)
+        try:
+            if alt.get("stream_url") and time.time() - alt.get("url_fetched_at", 0) < 900:
+                fresh = alt
+            else:
+                fresh = await get_audio_info(alt["url"], state.format_ceiling(), caller="failover", token=state.jobs)
+        except (ExtractionCancelled, health.UpstreamUnavailable) as e:
+            log_playback.warning("[failover] Giving up on alternates for %s: %s", song["title"], e)
+            break
+        except Exception as e:
+            log_playback.warning("[failover] Alternate %s failed: %s", alt["url"], e)
+            continue
+        # the title stays: it's still the song that was asked for
+        for key in ("url", "stream_url", "url_fetched_at", "kbps", "duration", "thumbnail", "channel", "view_count"):
+            if fresh.get(key) is not None:
+                song[key] = fresh[key]
+        song["stream_url"] = song.get("stream_url") or song["url"]
+        log_playback.info("[failover] %s failed at %s; switched to %s", song["title"], stage, alt["url"])
+        metrics.FAILOVERS.inc(stage=stage, result="switched")
+        return True
+    metrics.FAILOVERS.inc(stage=stage, result="exhausted")
+    return False
+
+async def replay_with_alternate(interaction: discord.Interaction, song: dict, failed_at: float):
+    """A stream that errored mid-play: its alternate takes its place, else move on."""
+    state = get_state(interaction.guild.id)
+    if song.get("alternates") and state.history and state.history[-1] is song:
+        if await switch_to_alternate(song, state, "playback"):
+            state.requeue(song)
+            return await play_next(interaction, failed_at=failed_at)
+    await play_next(interaction)
+
+async def recover_stall(interaction: discord.Interaction, song: dict, counter: FrameCounter, silent_for: float):
+    """
+    The watchdog found `song` silent while "playing". The first time, replay
+    the same stream from where the audio stopped; after that, its next
+    alternate from there; with none left, move on to the next song.
+    """
+    state = get_state(interaction.guild.id)
+    vc = interaction.guild.voice_client
+    if vc is None or not state.history or state.history[-1] is not song:
+        return
+    state.stalls = state.stalls + 1 if state.stalled_song is song else 1
+    state.stalled_song = song
+    position = counter.position
+
+    if state.stalls == 1:
+        action = "restart"
+    elif await switch_to_alternate(song, state, "stall"):
+        action = "failover"
+    else:
+        action = "skip"
+    if action != "skip":
+        state.requeue(song)
+        state.pending_restart = position
+    metrics.PLAYBACK_STALLS.inc(action=action)
+    log_playback.warning("[watchdog] %s silent for %.1fs at %.1fs → %s",
+                         song["title"], silent_for, position, action)
+
+    # killing ffmpeg unblocks the player's read; its `after` then runs play_next
+    counter.cleanup()
+    vc.stop()
+
+async def play_next(interaction: discord.Interaction, start_at: float = 0.0, failed_at: float | None = None):
     state = get_state(interaction.guild.id)
     vc = interaction.guild.voice_client
 
     # 1️⃣ Ensure we're connected
     if not vc or not vc.is_connected():
         return await interaction.channel.send("Not connected to a voice channel.")
+    if bitrate := getattr(vc.channel, "bitrate", None):
+        state.channel_kbps = bitrate // 1000
 
     # 2️⃣ Stop any current playback
     if vc.is_playing() or vc.is_paused():
@@ -363,46 +919,127 @@ async def play_next(interaction: discord.Interaction):
         or not song.get("url_fetched_at")
         or (time.time() - song["url_fetched_at"] > 900)
     )
+    # auto bitrate: the channel cap (or our share of the network) moved since it was fetched
+    ceiling = state.format_ceiling()
+    if state.bitrate_mode == "auto" and song.get("kbps") and abs(song["kbps"] - ceiling) > ceiling * 0.25:
+        log_playback.info("[play_next] Format ceiling %s → %s kbps for: %s", song["kbps"], ceiling, song["title"])
+        needs_refresh = True
+    if needs_refresh and health.youtube_stream.degraded and stream_valid_for(song) > 60:
+        # YouTube is pushing back; the old URL hasn't actually expired yet
+        log_playback.info("[play_next] YouTube degraded, reusing stream URL for: %s", song["title"])
+        needs_refresh = False
 
     if needs_refresh:
-        logging.info(f"[play_next] Refreshing URL for: {song['title']}")
+        log_playback.info("[play_next] Refreshing URL for: %s", song["title"])
+        metrics.URL_REFRESHES.inc()
         try:
-            search_term = song.get("search_query", song["title"])
-            refreshed = await get_audio_info(search_term, state.bitrate_mode)
-            song["url"] = refreshed["url"]
-            song["stream_url"] = refreshed.get("stream_url", refreshed["url"])
-            song["url_fetched_at"] = time.time()
+            apply_resolved(song, await resolve_track(song, ceiling, token=state.jobs))
+        except health.UpstreamUnavailable as e:
+            # put the song back exactly where it was and try again once YouTube may answer
+            state.requeue(song)
+            log_playback.warning("[play_next] %s; holding %s", e, song["title"])
+            get_outbox(interaction.channel).post(
+                "upstream", content=f"YouTube is rate-limiting the bot; trying again in {math.ceil(e.retry_in)}s."
+            )
+            schedule_retry(interaction, e.retry_in)
+            return
+        except ExtractionCancelled as e:
+            log_playback.info("[play_next] URL refresh abandoned (%s): %s", e.reason, song["title"])
+            if e.reason == "timeout":
+                return await interaction.channel.send(f"Timed out fetching {song['title']}.")
+            return
         except Exception as e:
-            logging.error(f"[play_next] URL refresh failed: {e}")
-            return await interaction.channel.send(f"Error refreshing stream for {song['title']}.")
+            log_playback.error("[play_next] URL refresh failed: %s", e)
+            failed_at = failed_at or time.perf_counter()
+            if not await switch_to_alternate(song, state, "refresh"):
+                return await interaction.channel.send(f"Error refreshing stream for {song['title']}.")
     else:
-        age = round(time.time() - song["url_fetched_at"], 1)
-        logging.info(f"[play_next] Using cached URL for: {song['title']} (age: {age}s)")
+        log_playback.debug("[play_next] Using cached URL for: %s (age: %.1fs)",
+                           song["title"], time.time() - song["url_fetched_at"])
 
     # ─── DEBUG: inspect what's in song before probing ───────────────────
-    logging.info(f"[play_next-debug] song keys: {list(song.keys())}")
-    logging.info(f"[play_next-debug] stream_url: {song.get('stream_url')}")
+    if log_playback.isEnabledFor(logging.DEBUG):
+        log_playback.debug("[play_next-debug] song keys: %s", list(song.keys()))
+        log_playback.debug("[play_next-debug] stream_url: %s", song.get("stream_url"))
 
     # 7️⃣ Build our audio source from the direct stream_url (or fallback to page URL)
     audio_source = song.get("stream_url") or song["url"]
-    source = await discord.FFmpegOpusAudio.from_probe(
-        audio_source,
-        before_options="-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5",
-        options="-vn"
-    )
+    before_options = "-reconnect 1 -reconnect_streamed 1 -reconnect_delay_max 5"
+    if start_at > 0:
+        # input-side seek: ffmpeg jumps straight there instead of decoding up to it
+        before_options += f" -ss {start_at:.1f}"
+    # looked up (and counted in the metrics) once per track, not once per probe attempt
+    gain_url, gain = None, None
+    while True:
+        try:
+            with metrics.FFMPEG_START_SECONDS.time(), tracing.span("from_probe"):
+                if song.get("probed_url") == audio_source:
+                    # /play already probed this exact stream while its prompt was open
+                    codec, bitrate = song["probe"]
+                else:
+                    codec, bitrate = await discord.FFmpegOpusAudio.probe(audio_source)
+                if codec is None:
+                    # discord.py logs a failed probe and carries on; a live stream always has a codec
+                    raise discord.ClientException(f"no audio stream found at {audio_source[:80]}")
+                # measured tracks get a fixed gain; the rest play untouched until analysed
+                options = "-vn"
+                if song["url"] != gain_url:
+                    gain_url, gain = song["url"], await loudness.analyzer.gain_for(song["url"])
+                if gain is not None:
+                    options += f" -af volume={gain:.1f}dB"
+                    # a filter rules out copying the Opus stream: re-encode, within the ceiling
+                    codec, bitrate = None, min(song.get("kbps") or ceiling, ceiling)
+                source = await discord.FFmpegOpusAudio.from_probe(
+                    audio_source,
+                    method=functools.partial(probed, (codec, bitrate)),
+                    before_options=before_options,
+                    options=options
+                )
+            break
+        except Exception as e:
+            # a dead stream fails right here; its runners-up need no new search
+            log_playback.error("[play_next] probe failed for %s: %s", song["title"], e)
+            failed_at = failed_at or time.perf_counter()
+            if not await switch_to_alternate(song, state, "probe"):
+                return await interaction.channel.send(f"Could not play {song['title']}.")
+            audio_source = song.get("stream_url") or song["url"]
 
     # 8️⃣ Schedule the next track when this one ends
     def _after_play(err):
-        if err:
-            logging.error(f"[play_next] playback error: {err}")
-        fut = asyncio.run_coroutine_threadsafe(play_next(interaction), interaction.client.loop)
+        restart_at, state.pending_restart = state.pending_restart, None
+        if restart_at is not None:
+            # the watchdog killed a hung pipeline and queued this song to resume
+            coro = play_next(interaction, start_at=restart_at)
+        elif err or counter.dead:
+            # discord.py reports a stream that died on open as a normal end
+            log_playback.error("[play_next] playback error: %s", err or "stream ended before its first frame")
+            metrics.PLAYBACK_ERRORS.inc()
+            coro = replay_with_alternate(interaction, song, time.perf_counter())
+        else:
+            coro = play_next(interaction)
+        fut = asyncio.run_coroutine_threadsafe(
+            tracing.run_traced("play_next", interaction.guild.id, coro),
+            interaction.client.loop,
+        )
         try:
             fut.result()
         except Exception as ex:
-            logging.error(f"[play_next] after_play callback error: {ex}")
-
-    vc.play(source, after=_after_play)
+            log_playback.error("[play_next] after_play callback error: %s", ex)
+
+    counter = FrameCounter(source, start_at)
+    with tracing.span("voice.play"):
+        vc.play(counter, after=_after_play)
+    state.watchdog.watch(vc, counter, functools.partial(recover_stall, interaction, song))
+    analyse_loudness(song)
+    if failed_at is not None:
+        metrics.FAILOVER_SECONDS.observe(time.perf_counter() - failed_at)
+        log_playback.info("[play_next] Failed over to an alternate in %.0f ms: %s",
+                          (time.perf_counter() - failed_at) * 1000, song["title"])
     state.paused = False
+    state.paused_at = None
+    state.track_started_at = time.time() - start_at
+    state.voice_channel_id = vc.channel.id
+    state.text_channel_id = interaction.channel.id
 
     # 9️⃣ Send or update the Now Playing embed with controls
     embed = discord.Embed(title="Now Playing", description=song["title"], color=0x1DB954)
@@ -410,21 +1047,93 @@ async def play_next(interaction: discord.Interaction):
         embed.set_thumbnail(url=thumb)
 
     controls = PlaybackControls(interaction.guild.id)
-    if state.now_playing_message:
-        await state.now_playing_message.edit(embed=embed, view=controls)
-    else:
-        state.now_playing_message = await interaction.channel.send(embed=embed, view=controls)
+    # fast skips only send the latest of these; playback doesn't wait for it
+    get_outbox(interaction.channel).post("now_playing", embed=embed, view=controls)
 
     # 🔟 Trigger auto-feed for the next recommendation
     if getattr(state, "autoqueue_enabled", False):
-        await auto_feed(interaction, song)
+        with tracing.span("auto_feed"):
+            await auto_feed(interaction, song)
 
 # ─── UI: Confirmation View ────────────────────────────────────────────────────
+async def prompt_info(query: str, kbps: int, token: CancelToken | None = None) -> tuple[dict, bool]:
+    """
+    What the /play prompt shows, as cheaply as it can be had: the resolved
+    entry if it's cached (or the query is a URL, which has no cheaper form),
+    else the top hit of a flat search with its runners-up as alternates.
+    Returns (info, resolved); unresolved entries have no stream URL yet.
+    """
+    if re.match(r"https?://", query) or await get_cache().get("info", f"{kbps}:1:{query}") is not None:
+        return await get_audio_info(query, kbps, token=token), True
+    hits = await search_candidates(query, ALTERNATES + 1, caller="play", token=token)
+    if not hits:
+        raise yt_dlp.utils.DownloadError(f"No results for {query}")
+    # search order, as get_audio_info would have picked it
+    info = youtube_lazy_track(hits[0])
+    info["thumbnail"] = YOUTUBE_THUMBNAIL_URL.format(hits[0]["id"])
+    runners_up = sorted(hits[1:], key=candidate_rank, reverse=True)
+    info["alternates"] = [alternate_entry(e) for e in runners_up]
+    return info, False
+
+def probed(result: tuple, source: str, executable: str) -> tuple:
+    """from_probe `method` handing back a probe (or an override) already in hand."""
+    return result
+
+async def probe_stream(song: dict):
+    """Probe the song's stream now, so play_next can start ffmpeg on it without probing."""
+    source = song.get("stream_url")
+    if not source or song.get("probed_url") == source:
+        return
+    codec, bitrate = await discord.FFmpegOpusAudio.probe(source)
+    if codec:
+        song["probe"] = (codec, bitrate)
+        song["probed_url"] = source
+
+async def prepare_track(info: dict, kbps: int, token: CancelToken, resolve: bool) -> bool:
+    """
+    The part of /play that runs while the user reads the prompt: resolve
+    the shown entry (exactly that video, by URL) and probe its stream.
+    Fills in `info` in place; False if play_next will have to do it.
+    """
+    try:
+        if resolve:
+            apply_resolved(info, await get_audio_info(info["url"], kbps, caller="play", token=token))
+        token.check()
+        with tracing.span("probe"):
+            await probe_stream(info)
+        return True
+    except ExtractionCancelled as e:
+        log_commands.debug("[/play] Speculative resolution abandoned (%s): %s", e.reason, info["title"])
+    except Exception as e:
+        log_commands.warning("[/play] Speculative resolution failed for %s: %s", info["title"], e)
+    return False
+
 class ConfirmView(View):
-    def __init__(self, info: dict, interaction: discord.Interaction):
+    def __init__(self, info: dict, interaction: discord.Interaction, resolved: bool = True):
         super().__init__(timeout=60)
         self.info = info
         self.interaction = interaction
+        self.resolved = resolved
+        # anything started on this prompt's behalf is abandoned on No or expiry
+        self.token = get_state(interaction.guild.id).jobs.child()
+        self.prepared: asyncio.Task | None = None
+
+    def speculate(self):
+        """Once the prompt is up, resolve and probe the stream while it waits; Yes picks it up from here."""
+        state = get_state(self.interaction.guild.id)
+        self.prepared = asyncio.create_task(tracing.run_traced(
+            "speculate", self.interaction.guild.id,
+            prepare_track(self.info, state.format_ceiling(), self.token, resolve=not self.resolved),
+        ))
+
+    def abandon(self, reason: str):
+        # an extraction in flight gives up at once; a probe can't be interrupted and is left to finish
+        self.token.cancel(reason)
+        metrics.SPECULATIONS.inc(result=reason)
+
+    async def on_timeout(self):
+        if not self.token.cancelled:
+            self.abandon("expired")
 
     @discord.ui.button(label="Yes", style=discord.ButtonStyle.green)
     async def confirm(self, interaction: discord.Interaction, button: Button):
@@ -434,24 +1143,36 @@ class ConfirmView(View):
                 ephemeral=True
             )
 
-        await interaction.response.defer(ephemeral=True)
-
-        state = get_state(self.interaction.guild.id)
-        state.queue.append(self.info)
-
-        # Debug log for when the song is officially queued
-        logging.info(f"[confirm] Added to queue: {self.info['title']} "
-                     f"(search_query='{self.info.get('search_query')}')")
-
-        vc = self.interaction.guild.voice_client
-        if vc and not vc.is_playing():
-            await play_next(self.interaction)
-
-        await interaction.edit_original_response(
-            embed=None,
-            content="Added to queue.",
-            view=None
-        )
+        with tracing.trace("confirm", interaction.guild.id):
+            await defer(interaction, ephemeral=True)
+
+            # whatever the speculative work got done; play_next resolves the rest
+            with tracing.span("speculation.wait", ready=self.prepared.done()):
+                ready = await self.prepared
+            self.token.release()
+            metrics.SPECULATIONS.inc(result="used" if ready else "failed")
+            self.stop()
+
+            state = get_state(self.interaction.guild.id)
+            state.queue.append(self.info)
+            analyse_loudness(self.info)
+
+            # Debug log for when the song is officially queued
+            log_playback.info("[confirm] Added to queue: %s (search_query='%s')",
+                              self.info["title"], self.info.get("search_query"))
+
+            vc = self.interaction.guild.voice_client
+            if vc and not vc.is_playing():
+                with tracing.span("play_next"):
+                    await play_next(self.interaction)
+
+            observe_followup(interaction, "confirm")
+            with tracing.span("embed.edit", message="confirm"):
+                await interaction.edit_original_response(
+                    embed=None,
+                    content="Added to queue.",
+                    view=None
+                )
 
     @discord.ui.button(label="No", style=discord.ButtonStyle.red)
     async def cancel(self, interaction: discord.Interaction, button: Button):
@@ -461,18 +1182,20 @@ class ConfirmView(View):
                 ephemeral=True
             )
 
-        await interaction.response.defer(ephemeral=True)
+        await defer(interaction, ephemeral=True)
+        self.abandon("declined")
+        self.stop()
 
         # Debug log for when playback is cancelled
-        logging.info(f"[confirm] Playback cancelled for: {self.info['title']} "
-                     f"(search_query='{self.info.get('search_query')}')")
+        log_playback.info("[confirm] Playback cancelled for: %s (search_query='%s')",
+                          self.info["title"], self.info.get("search_query"))
 
+        observe_followup(interaction, "cancel")
         await interaction.edit_original_response(
             embed=None,
             content="Playback cancelled.",
             view=None
         )
-        self.stop()
 
 class PlaybackControls(discord.ui.View):
     def __init__(self, interaction: discord.Interaction):
@@ -499,11 +1222,11 @@ class PlaybackControls(discord.ui.View):
             return await interaction.response.send_message("Not connected.", ephemeral=True)
         if vc.is_playing():
             vc.pause()
-            state.paused = True
+            state.set_paused(True)
             await interaction.response.send_message("Paused.", ephemeral=True)
         elif vc.is_paused():
             vc.resume()
-            state.paused = False
+            state.set_paused(False)
             await interaction.response.send_message("Resumed.", ephemeral=True)
 
     @discord.ui.button(emoji="⏭", style=discord.ButtonStyle.grey)
@@ -518,9 +1241,11 @@ class PlaybackControls(discord.ui.View):
     async def stop(self, interaction: discord.Interaction, button: discord.ui.Button):
         vc = interaction.guild.voice_client
         state = get_state(interaction.guild.id)
+        state.cancel_jobs("stopped")
+        state.watchdog.stop()
+        state.queue.clear()
         if vc:
             vc.stop()
-        state.queue.clear()
         await interaction.response.send_message("Stopped and cleared queue.", ephemeral=True)
 
     @discord.ui.button(emoji="🔁", style=discord.ButtonStyle.grey)
@@ -530,7 +1255,44 @@ class PlaybackControls(discord.ui.View):
         state.loop_mode = modes[(modes.index(state.loop_mode) + 1) % len(modes)]
         await interaction.response.send_message(f"Loop mode: `{state.loop_mode}`", ephemeral=True)
 
+# ─── Interaction Tracing ──────────────────────────────────────────────────────
+async def _trace_interaction(interaction: discord.Interaction) -> bool:
+    # runs in the command's own task, so spans opened by the handler nest under it
+    root, _ = tracing.start_trace(
+        f"/{getattr(interaction.command, 'name', 'command')}",
+        interaction.guild_id,
+        user=interaction.user.id,
+    )
+    interaction.extras["trace"] = root
+    return True
+
+bot.tree.interaction_check = _trace_interaction
+
+@bot.event
+async def on_app_command_completion(interaction: discord.Interaction, command):
+    if root := interaction.extras.get("trace"):
+        tracing.finish_trace(root)
+
+@bot.tree.error
+async def on_app_command_error(interaction: discord.Interaction, error: app_commands.AppCommandError):
+    if root := interaction.extras.get("trace"):
+        tracing.finish_trace(root, error=error)
+    name = getattr(interaction.command, "name", "?")
+    log_commands.error("[app_command] /%s failed: %s", name, error, exc_info=error)
+
 # ─── Slash Commands ──────────────────────────────────────────────────────────
+def render_queue(queue: list[dict], now: float) -> str:
+    """The /status queue listing, one line per song with its stream URL age."""
+    if not queue:
+        return "\n\nQueue is empty."
+
+    lines = ["\n\n**Queue:**"]
+    for idx, song in enumerate(queue, start=1):
+        fetched_at = song.get("url_fetched_at")
+        age_str = f"{round(now - fetched_at, 1)}s old" if fetched_at else "no timestamp"
+        lines.append(f"`{idx}.` {song['title']} — {age_str}")
+    return "\n".join(lines)
+
 @bot.tree.command(name="status", description="Check bot voice status and queue age")
 async def status(interaction: discord.Interaction):
     state = get_state(interaction.guild.id)
@@ -544,17 +1306,7 @@ async def status(interaction: discord.Interaction):
         msg = "Not connected to a voice channel."
 
     # Show queue with age info
-    if state.queue:
-        msg += "\n\n**Queue:**"
-        now = time.time()
-        for idx, song in enumerate(state.queue, start=1):
-            age = None
-            if song.get("url_fetched_at"):
-                age = round(now - song["url_fetched_at"], 1)
-            age_str = f"{age}s old" if age is not None else "no timestamp"
-            msg += f"\n`{idx}.` {song['title']} — {age_str}"
-    else:
-        msg += "\n\nQueue is empty."
+    msg += render_queue(state.queue, time.time())
 
     await interaction.response.send_message(msg, ephemeral=True)
 
@@ -584,6 +1336,8 @@ async def leave(interaction: discord.Interaction):
     await vc.disconnect()
     # optionally clear queue/history here:
     state = get_state(interaction.guild.id)
+    state.cancel_jobs("left")
+    state.watchdog.stop()
     state.queue.clear()
     state.history.clear()
 
@@ -592,46 +1346,55 @@ async def leave(interaction: discord.Interaction):
         ephemeral=True
     )
 
-async def resolve_spotify_to_search(query: str) -> list[str]:
+def lazy_track(title: str, search_query: str, **extra) -> dict:
+    """
+    A queue entry with no stream yet; play_next resolves it when it comes up.
+    """
+    return {
+        "title": title,
+        "norm_title": normalise_title(title),
+        "search_query": search_query,
+        **extra,
+    }
+
+def spotify_lazy_track(t: dict) -> dict:
+    term = f"{t['name']} {t['artist']}".strip()
+    return lazy_track(
+        term,
+        term,
+        spotify_id=t["id"],
+        isrc=t.get("isrc"),
+        duration=round(t["duration_ms"] / 1000) if t.get("duration_ms") else None,
+    )
+
+async def resolve_spotify_to_search(query: str, token: CancelToken | None = None) -> AsyncIterator[list[dict]]:
     """
-    If query is a Spotify track/album/playlist URL,
-    use the Web API to get title+artist and return search terms.
-    Otherwise fall back to yt-dlp for everything else.
+    If query is a Spotify track/album/playlist URL, page through the Web API
+    and yield lists of lazy tracks as each page arrives.
+    Otherwise list it flat with yt-dlp (YouTube playlists, mixes, videos).
     """
     # 1) Spotify track
     if (m := SPOTIFY_TRACK_RE.search(query)):
-        sp_id = m.group(1)
-        data = _sp.track(sp_id)
-        return [f"{data['name']} {data['artists'][0]['name']}"]
+        data = await spotify.track(m.group(1))
+        yield [spotify_lazy_track(data)]
+        return
 
-    # 2) Spotify album
+    # 2) Spotify album (cached track list, refetched only when stale)
     if (m := SPOTIFY_ALBUM_RE.search(query)):
-        sp_id = m.group(1)
-        items = _sp.album_tracks(sp_id)["items"]
-        return [f"{t['name']} {t['artists'][0]['name']}" for t in items]
+        async for page in spotify.iter_cached_tracks("album", m.group(1)):
+            yield [spotify_lazy_track(t) for t in page]
+        return
 
-    # 3) Spotify playlist
+    # 3) Spotify playlist (cached track list, refetched only on a new snapshot_id)
     if (m := SPOTIFY_PLAYLIST_RE.search(query)):
-        sp_id = m.group(1)
-        items = _sp.playlist_tracks(sp_id)["items"]
-        return [f"{i['track']['name']} {i['track']['artists'][0]['name']}" for i in items]
-
-    # 4) Everything else → yt-dlp  
-    def _extract():
-        with yt_dlp.YoutubeDL({"quiet": True}) as ydl:
-            return ydl.extract_info(query, download=False)
+        async for page in spotify.iter_cached_tracks("playlist", m.group(1)):
+            yield [spotify_lazy_track(t) for t in page]
+        return
 
-    info = await asyncio.to_thread(_extract)
-
-    # multi‐video case (YouTube playlist/multi search)
-    if info.get("_type") in ("playlist", "multi_video") and info.get("entries"):
-        return [
-            f"{e['title']} {e.get('uploader','')}".strip()
-            for e in info["entries"] if e
-        ]
-
-    # single‐track fallback
-    return [f"{info['title']} {info.get('uploader','')}".strip()]
+    # 4) Everything else → flat yt-dlp listing (playlists, mixes, single videos);
+    # streams are resolved later, one track at a time, by play_next
+    async for page in iter_flat_entries(query, token=token):
+        yield [youtube_lazy_track(e) for e in page]
 
 @bot.tree.command(name="play", description="Play a song by search, YouTube, or Spotify URL")
 @app_commands.describe(query="Search terms, YouTube URL, or Spotify URL")
@@ -644,53 +1407,132 @@ async def play(interaction: discord.Interaction, query: str):
             ephemeral=True
         )
 
-    await interaction.response.defer(ephemeral=True)
-
-    # Detect Spotify URL
-    if SPOTIFY_TRACK_RE.search(query) or SPOTIFY_PLAYLIST_RE.search(query) or SPOTIFY_ALBUM_RE.search(query):
-        search_terms = await resolve_spotify_to_search(query)
-        if not search_terms:
-            return await interaction.followup.send("Could not resolve Spotify link.", ephemeral=True)
-
-        # Playlist or album → queue all tracks
-        if len(search_terms) > 1:
-            for term in search_terms:
-                track_info = await get_audio_info(term, state.bitrate_mode)
-                track_info["search_query"] = term
-                track_info["url_fetched_at"] = time.time()
-                state.queue.append(track_info)
-            await interaction.followup.send(f"Queued {len(search_terms)} tracks from Spotify.", ephemeral=True)
-            if not vc.is_playing():
-                await play_next(interaction)
-            return
+    await defer(interaction, ephemeral=True)
 
-        # Single track → replace query with resolved search term
-        query = search_terms[0]
+    # Playlist, album or mix → stream lazy tracks into the queue page by page;
+    # streams are resolved by play_next only when each track comes up
+    is_spotify = bool(SPOTIFY_PLAYLIST_RE.search(query) or SPOTIFY_ALBUM_RE.search(query))
+    if is_spotify or YOUTUBE_PLAYLIST_RE.search(query):
+        source = "Spotify" if is_spotify else "YouTube"
+        queued = 0
+        token = state.jobs
+        try:
+            with tracing.span("import", source=source):
+                async for page in resolve_spotify_to_search(query, token):
+                    # /stop mid-import: Spotify pages arrive without a worker to cancel
+                    token.check()
+                    state.queue.extend(page)
+                    queued += len(page)
+                    # start playing as soon as the first page lands
+                    if page and not vc.is_playing() and not vc.is_paused():
+                        with tracing.span("play_next"):
+                            await play_next(interaction)
+        except (SpotifyError, yt_dlp.utils.DownloadError, health.UpstreamUnavailable) as e:
+            log_commands.error("[/play] %s import error: %s", source, e)
+        except ExtractionCancelled as e:
+            log_commands.info("[/play] %s import abandoned (%s) after %d tracks", source, e.reason, queued)
+            return await followup(interaction, "play", f"Import stopped after {queued} tracks.", ephemeral=True)
+
+        if not queued:
+            return await followup(interaction, "play", f"Could not resolve {source} link.", ephemeral=True)
+        log_commands.info("[/play] Imported %d tracks from %s: %s", queued, source, query)
+        return await followup(interaction, "play", f"Queued {queued} tracks from {source}.", ephemeral=True)
+
+    # Single track → replace query with resolved search term
+    spotify_track = None
+    if SPOTIFY_TRACK_RE.search(query):
+        try:
+            with tracing.span("spotify.resolve"):
+                async for page in resolve_spotify_to_search(query):
+                    spotify_track = page[0]
+                    query = spotify_track["search_query"]
+        except SpotifyError as e:
+            log_commands.error("[/play] Spotify error: %s", e)
+            return await followup(interaction, "play", "Could not resolve Spotify link.", ephemeral=True)
 
     try:
-        info = await get_audio_info(query, state.bitrate_mode)
+        if spotify_track:
+            with tracing.span("spotify.match"):
+                info = await resolve_spotify_track(spotify_track, state.format_ceiling(), state.jobs)
+            resolved = True
+        else:
+            with tracing.span("prompt_info"):
+                info, resolved = await prompt_info(query, state.format_ceiling(), token=state.jobs)
         info["search_query"] = query
-        info["url_fetched_at"] = time.time()
-
-        logging.info(f"[/play] URL fetched for: {info['title']} at {info['url_fetched_at']}")
+        if resolved:
+            info.setdefault("url_fetched_at", time.time())
+            log_commands.info("[/play] URL fetched for: %s at %s", info["title"], info["url_fetched_at"])
+        else:
+            log_commands.info("[/play] Prompting from search for: %s; resolving meanwhile", info["title"])
 
         embed = discord.Embed(
             title="Confirm Playback",
             description=info["title"],
             color=0x1DB954
         )
-        if info["thumbnail"]:
+        if info.get("thumbnail"):
             embed.set_thumbnail(url=info["thumbnail"])
         embed.set_footer(text="Click to confirm or cancel.")
 
-        await interaction.followup.send(
-            embed=embed,
-            view=ConfirmView(info, interaction),
-            ephemeral=True
-        )
+        view = ConfirmView(info, interaction, resolved)
+        with tracing.span("embed.send", message="confirm_prompt"):
+            try:
+                await followup(interaction, "play", embed=embed, view=view, ephemeral=True)
+            except BaseException:
+                # no prompt, nothing to speculate for
+                view.token.release()
+                raise
+        view.speculate()
+    except health.UpstreamUnavailable as e:
+        log_commands.warning("[/play] %s", e)
+        await followup(interaction, "play",
+                       f"YouTube is rate-limiting the bot; try again in {math.ceil(e.retry_in)}s.", ephemeral=True)
+    except ExtractionCancelled as e:
+        log_commands.info("[/play] Lookup abandoned (%s): %s", e.reason, query)
+        msg = "Timed out looking that up." if e.reason == "timeout" else "Lookup cancelled."
+        await followup(interaction, "play", msg, ephemeral=True)
     except Exception as e:
-        logging.error(f"Play command error: {e}")
-        await interaction.followup.send(f"Error: {e}", ephemeral=True)
+        log_commands.error("[/play] Play command error: %s", e)
+        await followup(interaction, "play", f"Error: {e}", ephemeral=True)
+
+@bot.tree.command(name="trace", description="Show where time went in this server's recent interactions")
+@app_commands.describe(count="How many recent interactions to show")
+async def trace(interaction: discord.Interaction, count: app_commands.Range[int, 1, 10] = 3):
+    traces = tracing.recent(interaction.guild.id, count)
+    if not traces:
+        return await interaction.response.send_message("No traced interactions yet.", ephemeral=True)
+
+    blocks = [f"```\n{tracing.format_breakdown(root)}\n```" for root in reversed(traces)]
+    msg = ""
+    for block in blocks:
+        # newest first; stop before Discord's 2000-char limit
+        if len(msg) + len(block) > 1950:
+            break
+        msg += block
+    await interaction.response.send_message(msg or blocks[0][:1990], ephemeral=True)
+
+@bot.tree.command(name="profile", description="Owner only: sample the bot's CPU use for a few seconds")
+@app_commands.describe(seconds="How long to sample (max 60)")
+async def profile(interaction: discord.Interaction, seconds: app_commands.Range[int, 1, 60] = 10):
+    if not await bot.is_owner(interaction.user):
+        return await interaction.response.send_message("Only the bot owner can profile.", ephemeral=True)
+    if profiler.busy():
+        return await interaction.response.send_message("A profile is already running.", ephemeral=True)
+
+    await defer(interaction, ephemeral=True, thinking=True)
+    try:
+        # the sampler sleeps between samples on its own thread; the loop keeps serving
+        result = await asyncio.to_thread(profiler.run, seconds)
+        path = await asyncio.to_thread(result.save)
+    except profiler.ProfilerBusy:
+        return await followup(interaction, "profile", "A profile is already running.", ephemeral=True)
+
+    log.info("[/profile] %d samples over %ss (%.0f ms sampling) → %s",
+             result.samples, seconds, result.overhead * 1000, path)
+    summary = (f"{result.samples} samples over {seconds}s at {result.hz} Hz "
+               f"(sampling took {result.overhead * 1000:.0f} ms)\n"
+               f"```\n{result.top(15)[:1700]}\n```")
+    await followup(interaction, "profile", summary, file=discord.File(path), ephemeral=True)
 
 @bot.tree.command(name="autoqueue", description="Toggle auto-queue of similar tracks")
 async def autoqueue(interaction: discord.Interaction):
@@ -703,7 +1545,8 @@ async def autoqueue(interaction: discord.Interaction):
 @app_commands.describe(mode="Which bitrate to use (leave empty to view all modes)")
 @app_commands.choices(mode=[
     Choice(name="default", value="default"),
-    Choice(name="low", value="low")
+    Choice(name="low", value="low"),
+    Choice(name="auto", value="auto"),
 ])
 async def bitrate(interaction: discord.Interaction, mode: str = None):
     # Map modes to approximate audio specs
@@ -714,21 +1557,25 @@ async def bitrate(interaction: discord.Interaction, mode: str = None):
 
     # Get actual Discord voice channel bitrate (bps → kbps)
     vc = interaction.guild.voice_client
+    state = get_state(interaction.guild.id)
     actual_bitrate_kbps = None
     if vc and vc.channel and hasattr(vc.channel, "bitrate"):
         actual_bitrate_kbps = round(vc.channel.bitrate / 1000, 1)
+        state.channel_kbps = vc.channel.bitrate // 1000
+    # auto: the channel's cap, within this host's network budget, re-read every track
+    bitrate_map["auto"] = {"kbps": auto_ceiling(state.channel_kbps, interaction.guild.id), "khz": 48, "bits": 16}
 
     # If no mode provided, list all available modes
     if mode is None:
         msg = "**Available bitrate modes:**\n"
         for m, specs in bitrate_map.items():
-            msg += f"• `{m}` → {specs['kbps']} kbps (~{specs['khz']} kHz / {specs['bits']}-bit PCM)\n"
+            msg += f"• `{m}` → {specs['kbps']} kbps (~{specs['khz']} kHz / {specs['bits']}-bit PCM)"
+            msg += " — follows the channel\n" if m == "auto" else "\n"
         if actual_bitrate_kbps:
             msg += f"\n**Channel bitrate limit:** {actual_bitrate_kbps} kbps"
         return await interaction.response.send_message(msg, ephemeral=True)
 
     # Set the mode
-    state = get_state(interaction.guild.id)
     state.bitrate_mode = mode
     specs = bitrate_map.get(mode, {"kbps": "?", "khz": "?", "bits": "?"})
     kbps = specs["kbps"]
@@ -768,7 +1615,7 @@ async def pause(interaction: discord.Interaction):
     if not vc or not vc.is_playing():
         return await interaction.response.send_message("Nothing is playing.", ephemeral=True)
     vc.pause()
-    get_state(interaction.guild.id).paused = True
+    get_state(interaction.guild.id).set_paused(True)
     await interaction.response.send_message("Paused.", ephemeral=True)
 
 
@@ -778,17 +1625,20 @@ async def resume(interaction: discord.Interaction):
     if not vc or not vc.is_paused():
         return await interaction.response.send_message("Nothing is paused.", ephemeral=True)
     vc.resume()
-    get_state(interaction.guild.id).paused = False
+    get_state(interaction.guild.id).set_paused(False)
     await interaction.response.send_message("▶Resumed.", ephemeral=True)
 
 
 @bot.tree.command(name="stop", description="Stop playback and clear the queue")
 async def stop(interaction: discord.Interaction):
     vc = interaction.guild.voice_client
-    if vc and (vc.is_playing() or vc.is_paused()):
-        vc.stop()
     state = get_state(interaction.guild.id)
+    # an import still filling the queue stops too
+    state.cancel_jobs("stopped")
+    state.watchdog.stop()
     state.queue.clear()
+    if vc and (vc.is_playing() or vc.is_paused()):
+        vc.stop()
     await interaction.response.send_message("Stopped and cleared the queue.", ephemeral=True)
 
 
@@ -826,11 +1676,161 @@ async def loop(interaction: discord.Interaction, mode: str):
     state.loop_mode = mode
     await interaction.response.send_message(f"Loop mode set to `{mode}`.", ephemeral=True)
 
+# ─── Warm Restart ──────────────────────────────────────────────────────────────
+# restored guilds rejoin a few at a time so a restart isn't one extraction burst
+RESTORE_CONCURRENCY = int(os.getenv("RESTORE_CONCURRENCY", "2"))
+# resume a little before where we were, so the listener hears the cut point
+RESUME_REWIND = 3.0
+
+class RestoredContext:
+    """Stands in for the interaction play_next/auto_feed normally get, after a restart."""
+    def __init__(self, guild: discord.Guild, channel: discord.abc.Messageable):
+        self.guild = guild
+        self.guild_id = guild.id
+        self.channel = channel
+        self.client = bot
+        self.extras: dict = {}
+
+def collect_snapshots() -> dict[int, tuple]:
+    return {
+        gid: (state, guild.voice_client if (guild := bot.get_guild(gid)) else None)
+        for gid, state in guild_states.items()
+    }
+
+async def restore_guild(snap: dict):
+    guild = bot.get_guild(snap["guild_id"])
+    if guild is None:
+        return  # left the guild, or it's on another shard worker
+    state = get_state(guild.id)
+    state.queue = snap["queue"]
+    state.history = snap["history"]
+    state.loop_mode = snap["loop_mode"]
+    state.bitrate_mode = snap["bitrate_mode"]
+    state.autoqueue_enabled = snap["autoqueue_enabled"]
+    state.text_channel_id = snap["text_channel_id"]
+
+    current = snap["current"]
+    voice = guild.get_channel(snap["voice_channel_id"] or 0)
+    text = guild.get_channel(snap["text_channel_id"] or 0)
+    if not (current and voice and text):
+        log.info("[restore] %s: queue restored (%d songs), not rejoining", guild.name, len(state.queue))
+        return
+    if not any(not m.bot for m in voice.members):
+        log.info("[restore] %s: #%s is empty, queue restored without rejoining", guild.name, voice.name)
+        return
+
+    # play_next re-applies the loop mode to `current`; drop the copy it made last time
+    def same(a, b):
+        return a.get("url") == b.get("url") and a.get("title") == b.get("title")
+    if state.loop_mode == "one" and state.queue and same(state.queue[0], current):
+        state.queue.pop(0)
+    elif state.loop_mode == "all" and state.queue and same(state.queue[-1], current):
+        state.queue.pop()
+    if state.history and same(state.history[-1], current):
+        state.history.pop()
+    state.queue.insert(0, current)
+
+    vc = guild.voice_client or await voice.connect()
+    # only this track is re-resolved now (its URL is stale); the rest of the
+    # queue is refreshed by play_next as each song comes up, as usual
+    start_at = max(0.0, snap["position"] - RESUME_REWIND)
+    await play_next(RestoredContext(guild, text), start_at=start_at)
+    if snap["paused"] and vc.is_playing():
+        vc.pause()
+        state.set_paused(True)
+    log.info("[restore] %s: resumed %s at %.0fs, %d queued (snapshot %.0fs old)",
+             guild.name, current["title"], start_at, len(state.queue), snap["age"])
+
+async def restore_snapshots():
+    """Bring back every guild's queue/playback from the last run, then keep snapshotting."""
+    try:
+        saved = await asyncio.to_thread(snapshots.load)
+        slots = asyncio.Semaphore(RESTORE_CONCURRENCY)
+
+        async def _one(snap):
+            async with slots:
+                try:
+                    await restore_guild(snap)
+                except Exception as e:
+                    log.error("[restore] guild %s failed: %s", snap["guild_id"], e)
+
+        await asyncio.gather(*(_one(snap) for snap in saved))
+    finally:
+        snapshots.writer.start(collect_snapshots)
+
 # ─── Startup & Command Sync ───────────────────────────────────────────────────
+startup.mark("import")
+_started = False
+
+@bot.event
+async def on_guild_channel_update(before, after):
+    # auto bitrate follows our voice channel's cap; play_next re-fetches the next track to match
+    if getattr(before, "bitrate", None) == getattr(after, "bitrate", None):
+        return
+    vc = after.guild.voice_client
+    if not vc or vc.channel.id != after.id:
+        return
+    state = get_state(after.guild.id)
+    state.channel_kbps = after.bitrate // 1000
+    if state.bitrate_mode == "auto":
+        log_playback.info("[bitrate] %s cap %d → %d kbps; format ceiling now %d kbps",
+                          after.name, before.bitrate // 1000, after.bitrate // 1000, state.format_ceiling())
+
+@bot.event
+async def on_voice_state_update(member, before, after):
+    # kicked, moved out by a channel delete, or /leave: nothing left to watch
+    if member.id == bot.user.id and before.channel is not None and after.channel is None:
+        get_state(member.guild.id).watchdog.stop()
+
+@bot.event
+async def on_guild_channel_delete(channel):
+    discard_outbox(channel.id)
+
+@bot.event
+async def on_guild_remove(guild):
+    for channel in guild.channels:
+        discard_outbox(channel.id)
+
+@bot.event
+async def setup_hook():
+    # runs once, after login and before the gateway connects
+    startup.mark("login")
+
 @bot.event
 async def on_ready():
-    logging.info(f"Logged in as {bot.user}")
-    await bot.tree.sync()
-    logging.info("Slash commands synced.")
+    global _started
+    log.info("Logged in as %s", bot.user)
+    # on_ready fires again after every reconnect; the rest is once per process
+    if _started:
+        return
+    _started = True
+    startup.mark("connect")
+
+    stalls.detector.start()
+    await loudness.analyzer.count_measured()
+    await metrics.start_server()
+    # commands are global: with several shard workers only shard 0's syncs them
+    if SHARD_IDS and 0 not in SHARD_IDS:
+        log.info("Slash command sync left to the worker with shard 0.")
+    elif await startup.sync_if_changed(bot.tree, bot.application_id):
+        log.info("Slash commands synced.")
+    else:
+        log.info("Slash commands unchanged; sync skipped.")
+    startup.mark("sync")
+    log.info("[startup] %s", startup.report())
+    asyncio.create_task(restore_snapshots())
 
-bot.run(TOKEN)
\ No newline at end of file
+# ─── Environment & Token ───────────────────────────────────────────────────────
+def main():
+    masked = TOKEN[:6] + "…" + TOKEN[-6:] if TOKEN else "None"
+    log.info("TOKEN loaded: %s", masked)
+    if not TOKEN:
+        log.critical("DISCORD_TOKEN missing in .env")
+        sys.exit(1)
+    startup.preload(yt_dlp)
+    # our queue handler is already on the root logger; don't let discord.py add its own
+    bot.run(TOKEN, log_handler=None)
+
+# importable without starting the bot (bench/ drives the commands directly)
+if __name__ == "__main__":
+    main()
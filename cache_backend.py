@@ -0,0 +1,301 @@
+import os
+import time
+import zlib
+import json
+import asyncio
+import logging
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+try:
+    import msgpack
+except ImportError:  # optional; zlib'd JSON is the fallback wire format
+    msgpack = None
+
+import metrics
+from storage import get_db
+
+log = logging.getLogger("bot.cache")
+
+# memory:// | sqlite:// (default, memory in front of the bot's SQLite file) | redis://host:6379/0
+CACHE_URL = os.getenv("CACHE_URL", "sqlite://")
+CACHE_MEMORY_ENTRIES = int(os.getenv("CACHE_MEMORY_ENTRIES", "5000"))
+# bump when a cached payload's shape changes; old entries are simply never read
+KEY_VERSION = "v1"
+
+
+# ─── Serialization ─────────────────────────────────────────────────────────────
+# one tag byte so instances with and without msgpack can share a cache
+def dumps(value) -> bytes:
+    if msgpack is not None:
+        return b"m" + msgpack.packb(value, use_bin_type=True)
+    return b"z" + zlib.compress(json.dumps(value, separators=(",", ":")).encode(), 6)
+
+
+def loads(blob: bytes):
+    tag, body = blob[:1], blob[1:]
+    if tag == b"z":
+        return json.loads(zlib.decompress(body))
+    if tag == b"m" and msgpack is not None:
+        return msgpack.unpackb(body, raw=False)
+    raise ValueError(f"unreadable cache entry (format {tag!r})")
+
+
+# ─── Backends ──────────────────────────────────────────────────────────────────
+class CacheUnavailable(Exception):
+    """Backend known to be down; a quiet miss (the failure was logged once)."""
+
+
+class CacheBackend:
+    """
+    Byte-level key/value store with per-key TTLs. Lookups that fail for any
+    reason (backend down, bad entry) are misses: the cache must never be
+    why a song doesn't play.
+    """
+    name = "none"
+
+    async def get_raw(self, key: str) -> bytes | None:
+        raise NotImplementedError
+
+    async def set_raw(self, key: str, blob: bytes, ttl: float):
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+    async def get(self, ns: str, key: str):
+        full = f"{KEY_VERSION}:{ns}:{key}"
+        try:
+            blob = await self.get_raw(full)
+            value = loads(blob) if blob is not None else None
+        except CacheUnavailable:
+            value = None
+        except Exception as e:
+            log.warning("[cache] %s get %s failed: %s", self.name, ns, e)
+            value = None
+        metrics.CACHE_REQUESTS.inc(ns=ns, result="miss" if value is None else "hit")
+        return value
+
+    async def set(self, ns: str, key: str, value, ttl: float):
+        if ttl <= 0:
+            return
+        try:
+            await self.set_raw(f"{KEY_VERSION}:{ns}:{key}", dumps(value), ttl)
+        except CacheUnavailable:
+            pass
+        except Exception as e:
+            log.warning("[cache] %s set %s failed: %s", self.name, ns, e)
+
+    async def invalidate(self, ns: str, key: str):
+        try:
+            await self.delete(f"{KEY_VERSION}:{ns}:{key}")
+        except CacheUnavailable:
+            pass
+        except Exception as e:
+            log.warning("[cache] %s delete %s failed: %s", self.name, ns, e)
+
+
+class MemoryCache(CacheBackend):
+    """Per-process LRU; also the hot layer in front of SQLiteCache."""
+    name = "memory"
+
+    def __init__(self, max_entries: int = CACHE_MEMORY_ENTRIES):
+        self.max_entries = max_entries
+        self._data: OrderedDict[str, tuple[float, bytes]] = OrderedDict()
+
+    async def get_raw(self, key):
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, blob = item
+        if expires_at <= time.time():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return blob
+
+    async def set_raw(self, key, blob, ttl):
+        self._data[key] = (time.time() + ttl, blob)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    async def delete(self, key):
+        self._data.pop(key, None)
+
+
+class SQLiteCache(CacheBackend):
+    """Survives restarts; shared only by processes on the same data dir."""
+    name = "sqlite"
+
+    def __init__(self):
+        self.memory = MemoryCache()
+        self._last_purge = 0.0
+
+    async def get_raw(self, key):
+        blob = await self.memory.get_raw(key)
+        if blob is not None:
+            return blob
+        row = await asyncio.to_thread(self._select, key)
+        if not row or row["expires_at"] <= time.time():
+            return None
+        await self.memory.set_raw(key, row["value"], row["expires_at"] - time.time())
+        return row["value"]
+
+    async def set_raw(self, key, blob, ttl):
+        now = time.time()
+        await self.memory.set_raw(key, blob, ttl)
+        purge = now - self._last_purge > 3600
+        if purge:
+            self._last_purge = now
+        await asyncio.to_thread(self._store, key, blob, now + ttl, purge)
+
+    async def delete(self, key):
+        await self.memory.delete(key)
+        await asyncio.to_thread(get_db().execute, "DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    # the SQLite side runs in a worker thread; the memory layer answers repeats on the loop
+    @staticmethod
+    def _select(key):
+        return get_db().execute(
+            "SELECT value, expires_at FROM cache_entries WHERE key = ?", (key,)
+        ).fetchone()
+
+    @staticmethod
+    def _store(key, blob, expires_at, purge):
+        db = get_db()
+        db.execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, blob, expires_at),
+        )
+        if purge:
+            db.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (time.time(),))
+
+
+class RespError(Exception):
+    pass
+
+
+class RedisCache(CacheBackend):
+    """
+    Shared by every instance pointed at the same server. Speaks just enough
+    RESP2 (GET, SET … PX, DEL, SELECT, AUTH) over a small connection pool.
+    """
+    name = "redis"
+    POOL_SIZE = 4
+    # after a connection failure, don't retry (and don't add latency) for this long
+    RETRY_AFTER = 5.0
+
+    def __init__(self, url: str):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self._idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+        self._slots = asyncio.Semaphore(self.POOL_SIZE)
+        self._down_until = 0.0
+
+    async def _connect(self):
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), timeout=2)
+        conn = (reader, writer)
+        if self.password:
+            await self._call(conn, "AUTH", self.password)
+        if self.db:
+            await self._call(conn, "SELECT", self.db)
+        return conn
+
+    @staticmethod
+    def _encode(*args) -> bytes:
+        out = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            out.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        return b"".join(out)
+
+    @classmethod
+    async def _read(cls, reader: asyncio.StreamReader):
+        line = await reader.readuntil(b"\r\n")
+        kind, body = line[:1], line[1:-2]
+        if kind == b"+":
+            return body.decode()
+        if kind == b"-":
+            raise RespError(body.decode())
+        if kind == b":":
+            return int(body)
+        if kind == b"$":
+            size = int(body)
+            if size < 0:
+                return None
+            data = await reader.readexactly(size + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(body)
+            return None if count < 0 else [await cls._read(reader) for _ in range(count)]
+        raise RespError(f"unexpected reply {line!r}")
+
+    async def _call(self, conn, *args):
+        reader, writer = conn
+        writer.write(self._encode(*args))
+        await writer.drain()
+        return await asyncio.wait_for(self._read(reader), timeout=2)
+
+    async def command(self, *args):
+        if time.monotonic() < self._down_until:
+            raise CacheUnavailable()
+        async with self._slots:
+            conn = self._idle.pop() if self._idle else None
+            try:
+                if conn is None:
+                    conn = await self._connect()
+                result = await self._call(conn, *args)
+            except RespError:
+                if conn:
+                    self._idle.append(conn)  # the connection itself is fine
+                raise
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+                if conn:
+                    conn[1].close()
+                self._down_until = time.monotonic() + self.RETRY_AFTER
+                raise ConnectionError(f"redis {self.host}:{self.port}: {e}") from e
+            self._idle.append(conn)
+            return result
+
+    async def get_raw(self, key):
+        return await self.command("GET", key)
+
+    async def set_raw(self, key, blob, ttl):
+        await self.command("SET", key, blob, "PX", max(1, int(ttl * 1000)))
+
+    async def delete(self, key):
+        await self.command("DEL", key)
+
+    async def close(self):
+        while self._idle:
+            self._idle.pop()[1].close()
+
+
+def open_cache(url: str = CACHE_URL) -> CacheBackend:
+    scheme = urlparse(url).scheme
+    if scheme == "memory":
+        return MemoryCache()
+    if scheme == "sqlite":
+        return SQLiteCache()
+    if scheme in ("redis", "tcp"):
+        return RedisCache(url)
+    log.error("[cache] Unknown CACHE_URL '%s', using memory", url)
+    return MemoryCache()
+
+
+_cache: CacheBackend | None = None
+
+
+def get_cache() -> CacheBackend:
+    global _cache
+    if _cache is None:
+        _cache = open_cache()
+    return _cache
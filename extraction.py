@@ -0,0 +1,215 @@
+import os
+import time
+import asyncio
+import logging
+import threading
+
+import metrics
+
+log = logging.getLogger("bot.extract")
+
+# no single yt-dlp call may keep a command (or a slot) longer than this
+EXTRACT_TIMEOUT = float(os.getenv("EXTRACT_TIMEOUT", "45"))
+# extractions allowed to run at once; the rest wait for a slot
+EXTRACT_CONCURRENCY = int(os.getenv("EXTRACT_CONCURRENCY", "8"))
+
+
+class ExtractionCancelled(Exception):
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CancelToken:
+    """
+    Shared between the coroutine that wants a result and the worker thread
+    producing it. cancel() (from the loop) makes waiters give up at once;
+    the thread notices at its next check() — every HTTP request yt-dlp
+    makes goes through one — and unwinds instead of finishing.
+    """
+
+    def __init__(self, timeout: float | None = None, parent: "CancelToken | None" = None):
+        self.deadline = time.monotonic() + timeout if timeout else None
+        if parent and parent.deadline and (self.deadline is None or parent.deadline < self.deadline):
+            self.deadline = parent.deadline
+        self.reason: str | None = None
+        self._event = threading.Event()
+        self._waiters: list[asyncio.Future] = []
+        self._children: set[CancelToken] = set()
+        self._parent: CancelToken | None = None
+        if parent:
+            if parent.cancelled:
+                self.cancel(parent.reason or "cancelled")
+            else:
+                parent._children.add(self)
+                self._parent = parent
+
+    def child(self, timeout: float | None = None) -> "CancelToken":
+        """Token cancelled with this one, optionally with a tighter deadline."""
+        return CancelToken(timeout, parent=self)
+
+    def cancel(self, reason: str = "cancelled"):
+        if self._event.is_set():
+            return
+        self.reason = reason
+        self._event.set()
+        for fut in self._waiters:
+            fut.get_loop().call_soon_threadsafe(_resolve, fut)
+        self._waiters.clear()
+        children, self._children = self._children, set()
+        for child in children:
+            child.cancel(reason)
+        self.release()
+
+    def release(self):
+        """
+        Finished with: unhook from the parent and drop waiters, so a
+        long-lived parent (a guild's jobs) doesn't collect every job it ran.
+        """
+        if self._parent is not None:
+            self._parent._children.discard(self)
+            self._parent = None
+        self._waiters.clear()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set() or self.remaining() == 0
+
+    def remaining(self) -> float | None:
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def check(self):
+        """Raise ExtractionCancelled if cancelled or past the deadline (any thread)."""
+        if self._event.is_set():
+            raise ExtractionCancelled(self.reason or "cancelled")
+        if self.remaining() == 0:
+            raise ExtractionCancelled("timeout")
+
+    def wait(self) -> asyncio.Future:
+        """Future resolved when the token is cancelled (not on deadline)."""
+        fut = asyncio.get_running_loop().create_future()
+        if self._event.is_set():
+            fut.set_result(None)
+        else:
+            self._waiters.append(fut)
+        return fut
+
+
+def _resolve(fut: asyncio.Future):
+    if not fut.done():
+        fut.set_result(None)
+
+
+def watch(ydl, token: CancelToken):
+    """Make a YoutubeDL instance check `token` before each of its HTTP requests."""
+    urlopen = getattr(ydl, "urlopen", None)
+    if urlopen is None:
+        return ydl
+
+    def _checked(*args, **kwargs):
+        token.check()
+        return urlopen(*args, **kwargs)
+
+    ydl.urlopen = _checked
+    return ydl
+
+
+# ─── Slots & Abandonment ───────────────────────────────────────────────────────
+_slots: asyncio.Semaphore | None = None
+_zombies = 0  # abandoned jobs whose thread hasn't unwound yet
+
+
+def _reap(fut: asyncio.Future):
+    global _zombies
+    _zombies -= 1
+    if not fut.cancelled():
+        fut.exception()  # retrieved, so it isn't logged as "never retrieved"
+
+
+def abandon(fut: asyncio.Future | None, caller: str, reason: str):
+    """Count a job given up on; its thread (if still running) is reaped when it unwinds."""
+    global _zombies
+    if fut is not None and not fut.done():
+        _zombies += 1
+        fut.add_done_callback(_reap)
+    metrics.EXTRACTIONS_ABANDONED.inc(caller=caller, reason=reason)
+    log.info("[extract] %s extraction abandoned (%s)", caller, reason)
+
+
+metrics.EXTRACTION_ZOMBIES.set_function(lambda: {(): _zombies})
+
+
+def zombies() -> int:
+    return _zombies
+
+
+def _release_if_acquired(slot: asyncio.Future):
+    if not slot.cancelled() and slot.exception() is None:
+        _slots.release()
+
+
+async def _acquire(job: CancelToken, cancelled: asyncio.Future):
+    """Take a slot; waiting for one counts against the job's deadline too."""
+    slot = asyncio.ensure_future(_slots.acquire())
+    try:
+        await asyncio.wait({slot, cancelled}, timeout=job.remaining(),
+                           return_when=asyncio.FIRST_COMPLETED)
+        if slot.done():
+            return
+        raise ExtractionCancelled(job.reason or "timeout")
+    except BaseException:
+        # a slot granted after we gave up goes straight back
+        if slot.done():
+            _release_if_acquired(slot)
+        else:
+            slot.cancel()
+            slot.add_done_callback(_release_if_acquired)
+        raise
+
+
+async def run_extraction(fn, *args, token: CancelToken | None = None,
+                         timeout: float | None = EXTRACT_TIMEOUT, caller: str = "play", breaker=None):
+    """
+    Run blocking `fn(*args, token)` on a worker thread under a deadline and
+    a cancellation token. Returns its result or raises ExtractionCancelled
+    as soon as the token is cancelled or the deadline passes; the slot is
+    released right then and the thread is left to unwind on its own.
+
+    With a `breaker` (health.CircuitBreaker), only the call itself is on
+    its books: waiting for one of our own slots says nothing about YouTube.
+    """
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(EXTRACT_CONCURRENCY)
+    if breaker is not None and breaker.retry_in() > 0:
+        breaker.check()  # refused: no point queueing for a slot
+    job = token.child(timeout) if token else CancelToken(timeout)
+    cancelled = job.wait()
+    fut = None
+
+    async def _execute():
+        nonlocal fut
+        job.check()
+        fut = asyncio.get_running_loop().run_in_executor(None, fn, *args, job)
+        done, _ = await asyncio.wait({fut, cancelled}, timeout=job.remaining(),
+                                     return_when=asyncio.FIRST_COMPLETED)
+        if fut in done:
+            return fut.result()
+        raise ExtractionCancelled(job.reason or "timeout")
+
+    try:
+        await _acquire(job, cancelled)
+        try:
+            return await (breaker.call(_execute) if breaker is not None else _execute())
+        finally:
+            _slots.release()
+    except (ExtractionCancelled, asyncio.CancelledError) as e:
+        reason = e.reason if isinstance(e, ExtractionCancelled) else "cancelled"
+        job.cancel(reason)
+        abandon(fut, caller, reason)
+        raise
+    finally:
+        cancelled.cancel()
+        job.release()
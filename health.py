@@ -0,0 +1,162 @@
+import os
+import math
+import time
+import random
+import logging
+from collections import deque
+
+import metrics
+from extraction import ExtractionCancelled
+
+log = logging.getLogger("bot.health")
+
+# error rate over the last BREAKER_WINDOW seconds that opens a breaker…
+BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+# …once at least this many calls have been seen in the window
+BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "8"))
+BREAKER_WINDOW = float(os.getenv("BREAKER_WINDOW", "60"))
+# first open period; doubles (with jitter) each time the half-open probe fails
+BREAKER_BACKOFF = float(os.getenv("BREAKER_BACKOFF", "5"))
+BREAKER_MAX_BACKOFF = float(os.getenv("BREAKER_MAX_BACKOFF", "300"))
+# a probe that never reports back (cancelled, lost) frees the slot after this
+PROBE_TIMEOUT = 60.0
+
+# what a throttled or unreachable upstream looks like in yt-dlp's error text
+_THROTTLE_MARKERS = (
+    "429", "too many requests", "not a bot", "rate-limit", "rate limit",
+    "http error 5", "timed out", "temporary failure", "connection reset",
+    "connection refused", "unable to download webpage", "unable to download api page",
+)
+
+
+class UpstreamUnavailable(Exception):
+    def __init__(self, upstream: str, retry_in: float):
+        super().__init__(f"{upstream} backing off, retry in {math.ceil(retry_in)}s")
+        self.upstream = upstream
+        self.retry_in = retry_in
+
+
+def classify(exc: BaseException) -> bool | None:
+    """
+    True if `exc` means the upstream itself is struggling, False if it
+    answered (a private video is still a healthy YouTube), None if the
+    call never really happened (cancelled by us).
+    """
+    if isinstance(exc, ExtractionCancelled):
+        return True if exc.reason == "timeout" else None
+    if isinstance(exc, UpstreamUnavailable) or not isinstance(exc, Exception):
+        return None  # refused by a breaker, or CancelledError
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    text = str(exc).lower()
+    return any(marker in text for marker in _THROTTLE_MARKERS)
+
+
+class CircuitBreaker:
+    """
+    Closed: calls go through and outcomes are tallied over a sliding
+    window. Too many failures open it: calls are refused (fast) for a
+    jittered, exponentially growing period. Then one half-open probe is let
+    through; success closes it again, failure re-opens it for longer.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = "closed"
+        self.trips = 0
+        self._outcomes: deque[tuple[float, bool]] = deque()
+        self._open_until = 0.0
+        self._probe_at: float | None = None
+
+    @property
+    def degraded(self) -> bool:
+        return self.state != "closed"
+
+    def retry_in(self) -> float:
+        """Seconds until a call may go ahead (0 = now)."""
+        now = time.monotonic()
+        if self.state == "open":
+            return max(0.0, self._open_until - now)
+        if self.state == "half_open" and self._probe_at is not None and now - self._probe_at < PROBE_TIMEOUT:
+            return PROBE_TIMEOUT - (now - self._probe_at)
+        return 0.0
+
+    def check(self):
+        """Raise UpstreamUnavailable unless a call may go ahead now."""
+        wait = self.retry_in()
+        if wait > 0:
+            metrics.UPSTREAM_REJECTED.inc(upstream=self.name)
+            raise UpstreamUnavailable(self.name, wait)
+        if self.state != "closed":
+            self.state = "half_open"
+            self._probe_at = time.monotonic()
+            log.info("[health] %s half-open, probing", self.name)
+
+    def record(self, ok: bool):
+        now = time.monotonic()
+        if self.state == "half_open":
+            self._probe_at = None
+            if ok:
+                self._close()
+            else:
+                self._open(now)
+            return
+        if self.state == "open":
+            return  # a straggler from before the trip
+        self._outcomes.append((now, ok))
+        while self._outcomes and now - self._outcomes[0][0] > BREAKER_WINDOW:
+            self._outcomes.popleft()
+        failures = sum(1 for _, good in self._outcomes if not good)
+        if len(self._outcomes) >= BREAKER_MIN_CALLS and failures / len(self._outcomes) >= BREAKER_ERROR_RATE:
+            self._open(now)
+
+    def release(self):
+        """The probe ended without a verdict (cancelled); let the next call probe."""
+        if self.state == "half_open":
+            self._probe_at = None
+
+    def _open(self, now: float):
+        backoff = min(BREAKER_MAX_BACKOFF, BREAKER_BACKOFF * 2 ** self.trips)
+        # jitter so separate processes don't all probe at the same moment
+        backoff *= random.uniform(0.5, 1.5)
+        self.trips += 1
+        self.state = "open"
+        self._open_until = now + backoff
+        self._outcomes.clear()
+        log.warning("[health] %s circuit open for %.1fs (trip %d)", self.name, backoff, self.trips)
+
+    def _close(self):
+        log.info("[health] %s recovered after %d trip(s)", self.name, self.trips)
+        self.state = "closed"
+        self.trips = 0
+        self._outcomes.clear()
+
+    async def call(self, fn, *args, **kwargs):
+        """Await `fn(*args, **kwargs)` through the breaker, recording the outcome."""
+        self.check()
+        try:
+            result = await fn(*args, **kwargs)
+        except BaseException as e:
+            failed = classify(e)
+            if failed is None:
+                self.release()
+            else:
+                self.record(not failed)
+            raise
+        self.record(True)
+        return result
+
+
+youtube_search = CircuitBreaker("youtube_search")
+youtube_stream = CircuitBreaker("youtube_stream")
+spotify = CircuitBreaker("spotify")
+breakers = {b.name: b for b in (youtube_search, youtube_stream, spotify)}
+
+_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+metrics.UPSTREAM_STATE.set_function(
+    lambda: {(("upstream", name),): _STATE_VALUES[b.state] for name, b in breakers.items()}
+)
+
+
+def states() -> dict[str, str]:
+    return {name: b.state for name, b in breakers.items()}
@@ -0,0 +1,88 @@
+import os
+import sys
+import queue
+import atexit
+import logging
+import logging.handlers
+
+# LOG_LEVEL sets the root level; LOG_LEVELS overrides per subsystem, e.g.
+#   LOG_LEVELS="bot.playback=DEBUG,discord.gateway=WARNING"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FILE = os.getenv("LOG_FILE", "")
+# records beyond this many waiting for the writer are dropped, not waited on
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s | %(message)s"
+LOG_DATEFMT = "%Y-%m-%d %H:%M:%S"
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that neither formats nor blocks on the calling thread.
+
+    The stock prepare() copies the record and renders it in full (time,
+    level, traceback) before enqueueing; here only the %-args are merged,
+    since they are often live song/queue dicts that may change before the
+    writer thread gets to them. The rest is formatted by the writer.
+    A full queue drops the record and counts it instead of waiting.
+    """
+
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_listener: logging.handlers.QueueListener | None = None
+_handler: LazyQueueHandler | None = None
+
+
+def setup_logging():
+    """
+    Route every logger through one bounded queue to a background writer
+    thread (stderr, plus LOG_FILE if set). Safe to call more than once.
+    """
+    global _listener, _handler
+    if _listener is not None:
+        return
+
+    formatter = logging.Formatter(LOG_FORMAT, datefmt=LOG_DATEFMT)
+    outputs: list[logging.Handler] = [logging.StreamHandler(sys.stderr)]
+    if LOG_FILE:
+        os.makedirs(os.path.dirname(LOG_FILE) or ".", exist_ok=True)
+        outputs.append(logging.handlers.RotatingFileHandler(
+            LOG_FILE, maxBytes=10 * 1024 * 1024, backupCount=3, encoding="utf-8"
+        ))
+    for h in outputs:
+        h.setFormatter(formatter)
+
+    _handler = LazyQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    root.addHandler(_handler)
+    root.setLevel(LOG_LEVEL)
+
+    for part in filter(None, (p.strip() for p in LOG_LEVELS.split(","))):
+        name, _, level = part.partition("=")
+        logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+    _listener = logging.handlers.QueueListener(_handler.queue, *outputs, respect_handler_level=True)
+    _listener.start()
+    # flush whatever is still queued on interpreter exit
+    atexit.register(_listener.stop)
+
+
+def dropped_records() -> int:
+    return _handler.dropped if _handler else 0
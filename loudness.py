@@ -0,0 +1,242 @@
+import os
+import re
+import math
+import time
+import shutil
+import asyncio
+import logging
+from collections import OrderedDict
+
+import metrics
+from storage import count_track_loudness, get_track_loudness, save_track_loudness
+
+log = logging.getLogger("bot.loudness")
+
+# integrated loudness every track is brought to (LUFS; YouTube's own reference)
+LOUDNESS_TARGET = float(os.getenv("LOUDNESS_TARGET", "-14"))
+# most a track is turned up or down (dB)
+LOUDNESS_MAX_GAIN = float(os.getenv("LOUDNESS_MAX_GAIN", "12"))
+# smaller corrections aren't worth losing Opus passthrough (a filter means re-encoding)
+LOUDNESS_MIN_GAIN = float(os.getenv("LOUDNESS_MIN_GAIN", "1"))
+# concurrent analyses; each is one niced, single-threaded ffmpeg
+LOUDNESS_WORKERS = int(os.getenv("LOUDNESS_WORKERS", "1"))
+LOUDNESS_BACKLOG = 200        # queued analyses beyond this are dropped (the track comes round again)
+UNMEASURED_MEMO = 4096        # misses remembered; the least recently asked about are looked up again
+LOUDNESS_MAX_SECONDS = 600    # of audio measured per track; past that the estimate doesn't move
+LOUDNESS_TIMEOUT = 300.0      # per ffmpeg run
+PEAK_CEILING = -1.0           # dBTP a track turned up may reach
+SILENCE_LUFS = -70.0          # ebur128's floor: nothing to measure
+
+FFMPEG = shutil.which("ffmpeg")
+_NICE = shutil.which("nice")
+
+_VIDEO_ID_RE = re.compile(r"(?:[?&]v=|youtu\.be/|/shorts/)([A-Za-z0-9_-]{11})")
+_SUMMARY_RE = re.compile(r"Summary:(.*)", re.S)
+_INTEGRATED_RE = re.compile(r"I:\s+(-?(?:[\d.]+|inf)) LUFS")
+_PEAK_RE = re.compile(r"Peak:\s+(-?(?:[\d.]+|inf)) dBFS")
+
+
+class AnalysisError(Exception):
+    pass
+
+
+def video_id(url: str | None) -> str | None:
+    m = _VIDEO_ID_RE.search(url or "")
+    return m.group(1) if m else None
+
+
+def parse_ebur128(output: str) -> tuple[float, float | None]:
+    """Integrated loudness (LUFS) and true peak (dBFS, if measured) from ffmpeg's ebur128 summary."""
+    m = _SUMMARY_RE.search(output)
+    summary = m.group(1) if m else ""
+    integrated = _INTEGRATED_RE.search(summary)
+    if not integrated:
+        raise AnalysisError("no ebur128 summary in ffmpeg output")
+    peak = _PEAK_RE.search(summary)
+    return float(integrated.group(1)), float(peak.group(1)) if peak else None
+
+
+async def measure(source: str) -> tuple[float, float | None]:
+    """Run ffmpeg's EBU R128 meter over (up to LOUDNESS_MAX_SECONDS of) `source`, at the lowest CPU priority."""
+    if FFMPEG is None:
+        raise AnalysisError("ffmpeg not found")
+    cmd = [_NICE, "-n", "19"] if _NICE else []
+    cmd += [FFMPEG, "-nostdin", "-hide_banner", "-nostats", "-threads", "1"]
+    if source.startswith("http"):
+        cmd += ["-reconnect", "1", "-reconnect_streamed", "1", "-reconnect_delay_max", "5"]
+    cmd += [
+        "-t", str(LOUDNESS_MAX_SECONDS), "-i", source, "-vn",
+        # per-frame readings go to the verbose level; only the summary is printed
+        "-af", "ebur128=peak=true:framelog=verbose", "-f", "null", "-",
+    ]
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+    )
+    try:
+        _, err = await asyncio.wait_for(proc.communicate(), timeout=LOUDNESS_TIMEOUT)
+    except BaseException:
+        proc.kill()
+        await proc.wait()
+        raise
+    output = err.decode("utf-8", "replace")
+    if proc.returncode != 0:
+        raise AnalysisError(f"ffmpeg exited {proc.returncode}: {output.strip()[-200:]}")
+    return parse_ebur128(output)
+
+
+def gain_db(lufs: float, peak: float | None) -> float:
+    """Fixed gain bringing `lufs` to LOUDNESS_TARGET without pushing the true peak past PEAK_CEILING."""
+    if lufs <= SILENCE_LUFS:
+        return 0.0
+    gain = LOUDNESS_TARGET - lufs
+    if peak is not None and math.isfinite(peak):
+        gain = min(gain, PEAK_CEILING - peak)
+    return max(-LOUDNESS_MAX_GAIN, min(LOUDNESS_MAX_GAIN, gain))
+
+
+class LoudnessAnalyzer:
+    """
+    Background measurement of tracks' integrated loudness, once per video
+    ID, stored for good. Playback only ever looks results up (gain_for);
+    anything not measured yet plays untouched and is submitted here, to be
+    picked up by a few low-priority workers while its stream URL still works.
+    """
+
+    def __init__(self, runner=measure, workers: int = LOUDNESS_WORKERS):
+        self.runner = runner
+        self.workers = workers
+        self.analysed = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.measured: int | None = None  # tracks stored, counted once (count_measured) then kept up
+        self._gains: dict[str, float] = {}  # video ID → gain (dB), as looked up or measured
+        self._unmeasured: OrderedDict[str, None] = OrderedDict()  # looked up, not in the table (yet)
+        self._pending: set[str] = set()
+        self._queue: asyncio.Queue | None = None
+        self._tasks: list[asyncio.Task] = []
+
+    @property
+    def enabled(self) -> bool:
+        return self.runner is not measure or FFMPEG is not None
+
+    async def count_measured(self):
+        if self.measured is None:
+            self.measured = await asyncio.to_thread(count_track_loudness)
+
+    async def lookup(self, vid: str) -> float | None:
+        if vid in self._gains:
+            return self._gains[vid]
+        if vid in self._unmeasured:
+            self._unmeasured.move_to_end(vid)
+            return None
+        row = await asyncio.to_thread(get_track_loudness, vid)
+        if row is None:
+            self._unmeasured[vid] = None
+            if len(self._unmeasured) > UNMEASURED_MEMO:
+                self._unmeasured.popitem(last=False)
+            return None
+        gain = self._gains[vid] = gain_db(row["lufs"], row["true_peak"])
+        return gain
+
+    async def gain_for(self, url: str | None) -> float | None:
+        """
+        Gain (dB) to play this track at, or None to play it untouched:
+        not measured yet, or already close enough to the target.
+        """
+        vid = video_id(url)
+        gain = await self.lookup(vid) if vid else None
+        if gain is None:
+            metrics.LOUDNESS_PLAYS.inc(result="unmeasured")
+            return None
+        if abs(gain) < LOUDNESS_MIN_GAIN:
+            metrics.LOUDNESS_PLAYS.inc(result="passthrough")
+            return None
+        metrics.LOUDNESS_PLAYS.inc(result="gain")
+        return gain
+
+    def submit(self, url: str | None, stream_url: str, usable_for: float) -> bool:
+        """
+        Queue a measurement of `stream_url` unless the track is known to be
+        measured, is queued, or is about to expire. Tracks measured in an
+        earlier run are weeded out by the worker, off the event loop.
+        """
+        vid = video_id(url)
+        if not vid or not self.enabled or usable_for <= 60 or vid in self._pending or vid in self._gains:
+            return False
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        if self._queue.qsize() >= LOUDNESS_BACKLOG:
+            metrics.LOUDNESS_ANALYSES.inc(result="dropped")
+            return False
+        self._pending.add(vid)
+        self._queue.put_nowait((vid, stream_url, time.time() + usable_for))
+        self._tasks = [t for t in self._tasks if not t.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.get_running_loop().create_task(self._work()))
+        return True
+
+    async def _work(self):
+        while True:
+            vid, source, expires_at = await self._queue.get()
+            try:
+                if time.time() > expires_at - 30:
+                    metrics.LOUDNESS_ANALYSES.inc(result="expired")
+                    continue
+                if await self.lookup(vid) is not None:
+                    continue
+                await self._analyse(vid, source)
+            finally:
+                self._pending.discard(vid)
+                self._queue.task_done()
+
+    async def _analyse(self, vid: str, source: str):
+        start = time.perf_counter()
+        try:
+            lufs, peak = await self.runner(source)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            metrics.LOUDNESS_ANALYSES.inc(result="failed")
+            log.warning("[loudness] analysis of %s failed: %s", vid, e)
+            return
+        finally:
+            self.busy_seconds += time.perf_counter() - start
+        took = time.perf_counter() - start
+        await asyncio.to_thread(save_track_loudness, vid, lufs, peak)
+        self._gains[vid] = gain_db(lufs, peak)
+        self._unmeasured.pop(vid, None)
+        self.analysed += 1
+        if self.measured is not None:
+            self.measured += 1
+        metrics.LOUDNESS_ANALYSES.inc(result="ok")
+        metrics.LOUDNESS_ANALYSIS_SECONDS.observe(took)
+        log.info("[loudness] %s: %.1f LUFS, peak %s dBFS → %+.1f dB (%.1fs)",
+                 vid, lufs, "?" if peak is None else f"{peak:.1f}", self._gains[vid], took)
+
+    async def drain(self):
+        """Wait until everything submitted so far has been analysed (or given up on)."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "measured": self.measured,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "analysed": self.analysed,
+            "failed": self.failed,
+            # tracks per second of worker time
+            "throughput": round(self.analysed / self.busy_seconds, 3) if self.busy_seconds else None,
+        }
+
+
+analyzer = LoudnessAnalyzer()
+metrics.LOUDNESS_BACKLOG.set_function(
+    lambda: {(): analyzer._queue.qsize() if analyzer._queue else 0}
+)
@@ -0,0 +1,74 @@
+from normalize import normalise_title
+
+# versions we don't want unless the Spotify title asks for them
+VARIANT_WORDS = frozenset({
+    "live", "cover", "remix", "karaoke", "instrumental", "nightcore",
+    "slowed", "sped", "reverb", "8d", "acoustic", "edit",
+})
+
+# full credit within this many seconds, none beyond DURATION_CUTOFF
+DURATION_GRACE = 2
+DURATION_CUTOFF = 20
+
+TOKEN_WEIGHT = 0.55
+DURATION_WEIGHT = 0.45
+VARIANT_PENALTY = 0.25
+TOPIC_BONUS = 0.05
+# the recording's own code in the upload's metadata: as good as an exact match
+ISRC_BONUS = 0.5
+
+
+def _tokens(text: str) -> set[str]:
+    return set(normalise_title(text).split())
+
+
+def duration_score(expected: float | None, actual: float | None) -> float:
+    """1.0 for a near-exact length, falling linearly to 0 at DURATION_CUTOFF seconds off."""
+    if not expected or not actual:
+        return 0.5  # unknown: neither reward nor punish
+    diff = abs(expected - actual)
+    if diff <= DURATION_GRACE:
+        return 1.0
+    return max(0.0, 1 - (diff - DURATION_GRACE) / (DURATION_CUTOFF - DURATION_GRACE))
+
+
+def carries_isrc(candidate: dict, isrc: str | None) -> bool:
+    """The upload names this ISRC: its own isrc field, or in its description ("ISRC: …")."""
+    if not isrc:
+        return False
+    isrc = isrc.upper()
+    if (candidate.get("isrc") or "").upper() == isrc:
+        return True
+    return isrc in (candidate.get("description") or "").upper().replace("-", "")
+
+
+def score_candidate(track: dict, candidate: dict) -> float:
+    """
+    Confidence (0..1) that a YouTube search result is the Spotify track:
+    title/artist token overlap plus duration closeness, with a penalty for
+    live/cover/remix style variants the Spotify title doesn't mention and a
+    strong bonus when the upload carries the track's ISRC.
+    """
+    wanted = _tokens(track.get("title") or "")
+    got = _tokens(f"{candidate.get('title') or ''} {candidate.get('channel') or ''}")
+    token_score = len(wanted & got) / len(wanted) if wanted else 0.0
+
+    score = (
+        TOKEN_WEIGHT * token_score
+        + DURATION_WEIGHT * duration_score(track.get("duration"), candidate.get("duration"))
+    )
+    if (got - wanted) & VARIANT_WORDS:
+        score -= VARIANT_PENALTY
+    # auto-generated "Artist - Topic" uploads are the studio release
+    if (candidate.get("channel") or "").endswith(" - Topic"):
+        score += TOPIC_BONUS
+    if carries_isrc(candidate, track.get("isrc")):
+        score += ISRC_BONUS
+    return round(min(1.0, max(0.0, score)), 3)
+
+
+def rank_matches(track: dict, candidates: list[dict]) -> list[tuple[dict, float]]:
+    """Candidates with their scores, best first (an ISRC match, then search order, breaks ties)."""
+    isrc = track.get("isrc")
+    scored = [(c, score_candidate(track, c)) for c in candidates]
+    return sorted(scored, key=lambda cs: (cs[1], carries_isrc(cs[0], isrc)), reverse=True)
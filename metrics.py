@@ -0,0 +1,290 @@
+import os
+import json
+import time
+import asyncio
+import logging
+from contextlib import contextmanager
+
+log = logging.getLogger("bot.metrics")
+
+# off unless a port is configured; every recording call returns immediately then
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0") or 0)
+ENABLED = METRICS_PORT > 0
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+_registry: list["_Metric"] = []
+
+
+def _key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+# ─── Metric Types ──────────────────────────────────────────────────────────────
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        _registry.append(self)
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str):
+        super().__init__(name, help_text)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        if not ENABLED:
+            return
+        key = _key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_key(labels), 0)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        lines += [f"{self.name}{_fmt_labels(k)} {v}" for k, v in self._values.items()]
+        return lines
+
+
+class Gauge(_Metric):
+    """
+    Set directly, or give it a callback returning {labels-tuple: value}
+    that is only evaluated when the endpoint is scraped.
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, help_text: str, collect=None):
+        super().__init__(name, help_text)
+        self._values: dict[tuple, float] = {}
+        self._collect = collect
+
+    def set(self, value: float, **labels):
+        if not ENABLED:
+            return
+        self._values[_key(labels)] = value
+
+    def set_function(self, collect):
+        self._collect = collect
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        values = dict(self._values)
+        if self._collect:
+            try:
+                values.update(self._collect())
+            except Exception as e:
+                log.error("[metrics] collecting %s failed: %s", self.name, e)
+        lines += [f"{self.name}{_fmt_labels(k)} {v}" for k, v in values.items()]
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help_text)
+        self.buckets = tuple(sorted(buckets))
+        # labels → [bucket counts..., +Inf count, sum]
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        if not ENABLED:
+            return
+        key = _key(labels)
+        row = self._values.get(key)
+        if row is None:
+            row = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                row[i] += 1
+        row[-2] += 1
+        row[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the with-block (awaits included)."""
+        if not ENABLED:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        for key, row in self._values.items():
+            for bound, count in zip(self.buckets, row):
+                lines.append(f"{self.name}_bucket{_fmt_labels(key, (('le', bound),))} {count}")
+            lines.append(f"{self.name}_bucket{_fmt_labels(key, (('le', '+Inf'),))} {row[-2]}")
+            lines.append(f"{self.name}_count{_fmt_labels(key)} {row[-2]}")
+            lines.append(f"{self.name}_sum{_fmt_labels(key)} {row[-1]}")
+        return lines
+
+
+# ─── Bot Metrics ───────────────────────────────────────────────────────────────
+EXTRACTION_SECONDS = Histogram(
+    "bot_extraction_seconds",
+    "yt-dlp extraction latency by caller (play, play_next, auto_feed, spotify, import)",
+)
+FFMPEG_START_SECONDS = Histogram(
+    "bot_ffmpeg_start_seconds",
+    "ffprobe + ffmpeg spawn time (FFmpegOpusAudio.from_probe)",
+)
+FAILOVER_SECONDS = Histogram(
+    "bot_failover_seconds",
+    "From a dead stream (refresh, probe or playback failure) to audio from an alternate",
+)
+FAILOVERS = Counter("bot_failover_total", "Switches to a track's alternate, by stage and result")
+PLAYBACK_STALLS = Counter(
+    "bot_playback_stalls_total",
+    "Hung pipelines caught by the playback watchdog, by recovery (restart, failover, skip)",
+)
+LOUDNESS_PLAYS = Counter(
+    "bot_loudness_plays_total",
+    "Tracks started by loudness gain: gain applied, passthrough (close enough), unmeasured",
+)
+LOUDNESS_ANALYSES = Counter(
+    "bot_loudness_analyses_total",
+    "Background loudness measurements by result (ok, failed, expired, dropped)",
+)
+LOUDNESS_ANALYSIS_SECONDS = Histogram(
+    "bot_loudness_analysis_seconds",
+    "ffmpeg time per successful loudness measurement",
+    buckets=(1, 2.5, 5, 10, 20, 30, 60, 120, 300),
+)
+LOUDNESS_BACKLOG = Gauge("bot_loudness_backlog", "Tracks waiting for a loudness measurement")
+SPECULATIONS = Counter(
+    "bot_play_speculation_total",
+    "Streams resolved and probed while a /play prompt was open, by outcome (used, failed, declined, expired)",
+)
+URL_REFRESHES = Counter("bot_url_refresh_total", "Stream URL refreshes in play_next")
+PLAYBACK_ERRORS = Counter("bot_playback_errors_total", "Errors reported to _after_play")
+FOLLOWUP_SECONDS = Histogram(
+    "bot_interaction_followup_seconds",
+    "Time from deferring an interaction to its follow-up, by command",
+)
+LOOP_LAG_SECONDS = Histogram(
+    "bot_event_loop_lag_seconds",
+    "How late the stall detector's heartbeat ran",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5),
+)
+LOOP_STALLS = Counter("bot_event_loop_stalls_total", "Event-loop stalls over the threshold, by call site")
+OUTBOX_EDITS = Counter(
+    "bot_outbox_edits_total",
+    "Status-message updates by outcome (sent, coalesced into a later one, dropped)",
+)
+EXTRACTIONS_ABANDONED = Counter(
+    "bot_extraction_abandoned_total",
+    "Extractions given up on (cancelled, timeout), by caller; their threads unwind on their own",
+)
+EXTRACTION_ZOMBIES = Gauge("bot_extraction_abandoned_running", "Abandoned extractions whose thread is still running")
+UPSTREAM_STATE = Gauge("bot_upstream_circuit_state", "Circuit breaker per upstream: 0 closed, 1 half-open, 2 open")
+UPSTREAM_REJECTED = Counter("bot_upstream_rejected_total", "Calls refused while an upstream's circuit was open")
+CACHE_REQUESTS = Counter("bot_cache_requests_total", "Shared cache lookups by namespace and hit/miss")
+QUEUE_DEPTH = Gauge("bot_queue_depth", "Queued songs per guild")
+VOICE_CONNECTIONS = Gauge("bot_voice_connections", "Connected voice clients")
+LOG_RECORDS_DROPPED = Gauge(
+    "bot_log_records_dropped", "Log records dropped since start because the writer queue was full"
+)
+
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines += metric.render()
+    return "\n".join(lines) + "\n"
+
+
+# ─── HTTP Endpoint ─────────────────────────────────────────────────────────────
+_health = None
+
+
+def set_health(collect):
+    """Register a callback returning a JSON-able dict for /health."""
+    global _health
+    _health = collect
+
+
+async def _metrics_route():
+    return "200 OK", "text/plain; version=0.0.4; charset=utf-8", render().encode()
+
+
+async def _health_route():
+    body = _health() if _health else {}
+    return "200 OK", "application/json", json.dumps(body).encode()
+
+
+DEFAULT_ROUTES = {"/metrics": _metrics_route, "/health": _health_route}
+
+
+def _handler(routes: dict):
+    async def _handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+            # drain headers; we don't need any of them
+            while (line := await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+                pass
+            parts = request_line.decode("latin-1").split()
+            path = parts[1] if len(parts) > 1 else "/"
+
+            route = routes.get(path.split("?")[0])
+            if route:
+                status, ctype, body = await route()
+            else:
+                status, body, ctype = "404 Not Found", b"not found\n", "text/plain"
+
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {ctype}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        except Exception as e:
+            log.error("[metrics] request failed: %s", e)
+        finally:
+            writer.close()
+    return _handle
+
+
+async def serve(host: str, port: int, routes: dict) -> asyncio.AbstractServer:
+    """
+    Minimal HTTP/1.1 GET server for a few fixed paths; each route is an
+    async callable returning (status, content type, body bytes).
+    """
+    return await asyncio.start_server(_handler(routes), host, port)
+
+
+_server: asyncio.AbstractServer | None = None
+
+
+async def start_server(host: str = METRICS_HOST, port: int = METRICS_PORT):
+    """Serve /metrics and /health on a local port (once); no-op while metrics are disabled."""
+    global _server
+    if not ENABLED or _server is not None:
+        return
+    _server = await serve(host, port, DEFAULT_ROUTES)
+    log.info("[metrics] Serving http://%s:%s/metrics", host, port)
@@ -0,0 +1,62 @@
+import re
+from functools import lru_cache
+
+# ─── Precompiled Patterns ──────────────────────────────────────────────────────
+# compiled once at import; these run inside the duplicate and discovery loops
+BRACKETS_RE = re.compile(r"\[.*?\]|\(.*?\)")
+NON_ALNUM_RE = re.compile(r"[^a-z0-9\s]")
+WHITESPACE_RE = re.compile(r"\s+")
+
+NOISE_WORDS = frozenset({"official", "video", "lyrics", "audio", "hd", "hq", "mv"})
+
+# bounded so a long-running bot doesn't grow the memo forever
+NORMALISE_CACHE_SIZE = 8192
+
+
+# ─── Title Normalization ───────────────────────────────────────────────────────
+@lru_cache(maxsize=NORMALISE_CACHE_SIZE)
+def normalise_title(title: str) -> str:
+    """
+    Lowercase, drop bracketed tags and punctuation, collapse whitespace.
+    Memoized: the same titles come round again and again in history/queue.
+    """
+    title = title.lower()
+    title = BRACKETS_RE.sub("", title)
+    title = NON_ALNUM_RE.sub("", title)
+    title = WHITESPACE_RE.sub(" ", title)
+    return title.strip()
+
+
+@lru_cache(maxsize=NORMALISE_CACHE_SIZE)
+def clean_feed_title(title: str) -> str:
+    """
+    Strip bracketed tags and noise words ("official", "lyrics", ...)
+    while keeping the original casing, for use in discovery queries.
+    """
+    title = BRACKETS_RE.sub("", title)
+    return " ".join(w for w in title.split() if w.lower() not in NOISE_WORDS)
+
+
+def track_key(song: dict) -> str:
+    """
+    Return the normalized title of a track dict, computing it at most once
+    and storing it on the track under "norm_title".
+    """
+    key = song.get("norm_title")
+    if key is None:
+        key = normalise_title(song.get("title") or "")
+        song["norm_title"] = key
+    return key
+
+
+# ─── Duplicate Detection ───────────────────────────────────────────────────────
+def is_duplicate(candidate: dict, history: list) -> bool:
+    cand_title = track_key(candidate)
+    cand_dur = candidate.get("duration")
+    for song in history:
+        if cand_title == track_key(song):
+            return True
+        hist_dur = song.get("duration")
+        if cand_dur and hist_dur and abs(cand_dur - hist_dur) <= 3:
+            return True
+    return False
@@ -0,0 +1,137 @@
+import os
+import time
+import asyncio
+import logging
+import contextvars
+
+import discord
+
+import metrics
+
+log = logging.getLogger("bot.outbox")
+
+# burst edits within this long collapse into one; stretched while Discord pushes back
+OUTBOX_WINDOW = float(os.getenv("OUTBOX_WINDOW", "1.0"))
+OUTBOX_MAX_WINDOW = float(os.getenv("OUTBOX_MAX_WINDOW", "8.0"))
+# a worker with nothing to send for this long exits (its messages are kept)
+OUTBOX_IDLE = 60.0
+
+
+class Outbox:
+    """
+    One channel's status messages (Now Playing, Auto-Queued, …), each under
+    a slot name. post() only records the latest content for a slot and
+    returns; a single worker per channel sends or edits at most once per
+    window, so a burst of posts to a slot becomes one REST call. Edits to
+    one channel share a Discord rate-limit bucket, hence one worker each.
+    """
+
+    def __init__(self, channel):
+        self.channel = channel
+        self.messages: dict[str, discord.Message] = {}
+        self.pending: dict[str, dict] = {}
+        self.window = OUTBOX_WINDOW
+        self.closed = False
+        self.sent = self.coalesced = self.dropped = 0
+        self._last_flush = 0.0
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def post(self, slot: str, **fields):
+        """Queue `fields` (embed=, view=, content=) for the slot's message. Never waits."""
+        if slot in self.pending:
+            self.coalesced += 1
+            metrics.OUTBOX_EDITS.inc(result="coalesced")
+        self.pending[slot] = fields
+        self._wake.set()
+        if self._task is None or self._task.done():
+            # own empty context: sends are not part of whichever trace posted first
+            self._task = asyncio.get_running_loop().create_task(
+                self._run(), name=f"outbox-{self.channel.id}", context=contextvars.Context()
+            )
+
+    def close(self):
+        """The channel is gone: drop what's pending and stop the worker."""
+        self.closed = True
+        if self.pending:
+            self.dropped += len(self.pending)
+            metrics.OUTBOX_EDITS.inc(len(self.pending), result="dropped")
+            self.pending.clear()
+        # wake the worker rather than cancel it: it may be mid-send
+        self._wake.set()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=OUTBOX_IDLE)
+            except asyncio.TimeoutError:
+                return
+            if self.closed:
+                return
+            self._wake.clear()
+
+            # debounce: anything posted until the window elapses rides along
+            delay = self._last_flush + self.window - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._last_flush = time.monotonic()
+
+            batch, self.pending = self.pending, {}
+            for slot, fields in batch.items():
+                await self._deliver(slot, fields)
+
+    async def _deliver(self, slot: str, fields: dict):
+        start = time.monotonic()
+        try:
+            message = self.messages.get(slot)
+            if message is not None:
+                try:
+                    await message.edit(**fields)
+                except discord.NotFound:
+                    message = None  # deleted under us; send a new one
+            if message is None:
+                self.messages[slot] = await self.channel.send(**fields)
+        except discord.HTTPException as e:
+            if e.status == 429 and slot not in self.pending:
+                # still the latest state: retry it after backing off
+                self.pending[slot] = fields
+                self._wake.set()
+            else:
+                self.dropped += 1
+                metrics.OUTBOX_EDITS.inc(result="dropped")
+            self.window = min(self.window * 2, OUTBOX_MAX_WINDOW)
+            log.warning("[outbox] %s update in #%s failed (%s); window now %.1fs",
+                        slot, getattr(self.channel, "name", "?"), e.status, self.window)
+            return
+        except Exception as e:
+            self.dropped += 1
+            metrics.OUTBOX_EDITS.inc(result="dropped")
+            log.error("[outbox] %s update failed: %s", slot, e)
+            return
+
+        self.sent += 1
+        metrics.OUTBOX_EDITS.inc(result="sent")
+        # discord.py sleeps through 429s inside the request; a slow call means
+        # the bucket is hot, so widen the window, and ease back once it's quick
+        elapsed = time.monotonic() - start
+        if elapsed > self.window:
+            self.window = min(self.window * 2, OUTBOX_MAX_WINDOW)
+        elif self.window > OUTBOX_WINDOW:
+            self.window = max(self.window / 2, OUTBOX_WINDOW)
+
+
+_outboxes: dict[int, Outbox] = {}
+
+
+def get_outbox(channel) -> Outbox:
+    box = _outboxes.get(channel.id)
+    if box is None:
+        box = _outboxes[channel.id] = Outbox(channel)
+    return box
+
+
+def discard_outbox(channel_id: int):
+    """Forget a deleted channel's outbox (and its tracked messages)."""
+    box = _outboxes.pop(channel_id, None)
+    if box is not None:
+        box.close()
@@ -0,0 +1,105 @@
+import os
+import sys
+import time
+import threading
+from collections import Counter
+
+from storage import DATA_DIR
+
+# sampling rate; each sample walks every thread's stack, so keep it modest
+PROFILE_HZ = int(os.getenv("PROFILE_HZ", "100"))
+PROFILE_MAX_SECONDS = int(os.getenv("PROFILE_MAX_SECONDS", "60"))
+PROFILE_MAX_DEPTH = 64
+PROFILE_DIR = os.path.join(DATA_DIR, "profiles")
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+class Profile:
+    """Result of one sampling run: collapsed stacks plus self/inclusive counts."""
+
+    def __init__(self, seconds: float, hz: int):
+        self.seconds = seconds
+        self.hz = hz
+        self.samples = 0
+        self.stacks: Counter = Counter()      # "thread;outer;…;inner" → samples
+        self.own: Counter = Counter()         # function → samples as the leaf
+        self.inclusive: Counter = Counter()   # function → samples anywhere on the stack
+        self.overhead = 0.0                   # seconds spent taking samples
+        self.path: str | None = None
+
+    def top(self, count: int = 15) -> str:
+        """Plain-text top-functions table (self and inclusive share of samples)."""
+        if not self.samples:
+            return "no samples"
+        lines = [f"{'self%':>6} {'incl%':>6}  function"]
+        for func, n in self.own.most_common(count):
+            lines.append(f"{n / self.samples * 100:>6.1f} {self.inclusive[func] / self.samples * 100:>6.1f}  {func}")
+        return "\n".join(lines)
+
+    def save(self, directory: str = PROFILE_DIR) -> str:
+        """Write the collapsed stacks (flamegraph.pl / speedscope input)."""
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"profile-{time.strftime('%Y%m%d-%H%M%S')}.folded")
+        with open(self.path, "w", encoding="utf-8") as f:
+            for stack, n in self.stacks.most_common():
+                f.write(f"{stack} {n}\n")
+        return self.path
+
+
+def _label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _sample(profile: Profile, skip: int):
+    names = {t.ident: t.name for t in threading.enumerate()}
+    for ident, frame in sys._current_frames().items():
+        if ident == skip:
+            continue
+        funcs = []
+        while frame is not None and len(funcs) < PROFILE_MAX_DEPTH:
+            funcs.append(_label(frame.f_code))
+            frame = frame.f_back
+        if not funcs:
+            continue
+        funcs.reverse()
+        thread = names.get(ident, f"thread-{ident}").replace(";", ":")
+        profile.stacks[";".join([thread, *funcs])] += 1
+        profile.own[funcs[-1]] += 1
+        for func in set(funcs):
+            profile.inclusive[func] += 1
+        profile.samples += 1
+
+
+_lock = threading.Lock()
+
+
+def run(seconds: float, hz: int = PROFILE_HZ) -> Profile:
+    """
+    Sample every thread's stack (event loop, executors, audio players) `hz`
+    times a second for `seconds`. Blocking; call via asyncio.to_thread.
+    Raises ProfilerBusy if another run is in progress.
+    """
+    if not _lock.acquire(blocking=False):
+        raise ProfilerBusy("a profile is already running")
+    try:
+        seconds = max(0.1, min(seconds, PROFILE_MAX_SECONDS))
+        profile = Profile(seconds, hz)
+        me = threading.get_ident()
+        interval = 1 / hz
+        deadline = time.monotonic() + seconds
+        while (now := time.monotonic()) < deadline:
+            _sample(profile, me)
+            spent = time.monotonic() - now
+            profile.overhead += spent
+            # never sample more than half the time, however slow a pass gets
+            time.sleep(max(interval - spent, spent))
+        return profile
+    finally:
+        _lock.release()
+
+
+def busy() -> bool:
+    return _lock.locked()
@@ -0,0 +1,181 @@
+import os
+import time
+import asyncio
+import logging
+
+from cache_backend import dumps, loads
+from storage import delete_guild_snapshot, get_meta, load_guild_snapshots, save_guild_snapshot, set_meta
+
+log = logging.getLogger("bot.snapshots")
+
+SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL", "10"))
+# older snapshots are stale enough that picking up where we left off would surprise people
+SNAPSHOT_MAX_AGE = float(os.getenv("SNAPSHOT_MAX_AGE", str(6 * 3600)))
+# history only feeds duplicate checks; the tail is all that matters
+SNAPSHOT_HISTORY = 50
+# bot_meta key written every interval: the last moment this process was known to be playing
+HEARTBEAT_KEY = "snapshot_heartbeat"
+
+
+# GuildState attributes a snapshot is made of; setting any of them marks the guild dirty
+TRACKED_FIELDS = frozenset({
+    "queue", "history", "loop_mode", "bitrate_mode", "autoqueue_enabled", "paused",
+    "voice_channel_id", "text_channel_id", "track_started_at", "paused_at",
+})
+
+
+class TrackedList(list):
+    """A list that calls `touch()` after every change, so queue edits mark their guild dirty."""
+
+    def __init__(self, items=(), touch=None):
+        super().__init__(items)
+        self._touch = touch
+
+
+def _mutator(name: str):
+    method = getattr(list, name)
+
+    def changed(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        if self._touch is not None:
+            self._touch()
+        return result
+
+    changed.__name__ = name
+    return changed
+
+
+for _name in ("append", "extend", "insert", "pop", "remove", "clear", "sort", "reverse",
+              "__setitem__", "__delitem__", "__iadd__", "__imul__"):
+    setattr(TrackedList, _name, _mutator(_name))
+
+
+def fingerprint(state, voice_client) -> tuple:
+    """Cheap stand-in for a guild's snapshot: equal fingerprints, equal snapshots."""
+    connected = voice_client is not None and voice_client.is_connected()
+    playing = connected and (voice_client.is_playing() or voice_client.is_paused())
+    return state.version, playing, voice_client.channel.id if connected else None
+
+
+def capture(state, voice_client) -> dict | None:
+    """What a guild needs to carry on after a restart, or None if there's nothing."""
+    connected = voice_client is not None and voice_client.is_connected()
+    playing = connected and (voice_client.is_playing() or voice_client.is_paused())
+    current = state.history[-1] if playing and state.history else None
+    if not (state.queue or current):
+        return None
+    return {
+        "queue": state.queue,
+        "history": state.history[-SNAPSHOT_HISTORY:],
+        "loop_mode": state.loop_mode,
+        "bitrate_mode": state.bitrate_mode,
+        "autoqueue_enabled": state.autoqueue_enabled,
+        "voice_channel_id": voice_client.channel.id if connected else None,
+        "text_channel_id": state.text_channel_id,
+        "current": current,
+        # the position is worked out on restore, from these and the last heartbeat
+        "track_started_at": state.track_started_at,
+        "paused_at": state.paused_at,
+        "paused": bool(state.paused),
+    }
+
+
+class SnapshotWriter:
+    """
+    Periodically writes the snapshots of the guilds that changed since the
+    last write (their version or voice state moved; nothing is serialized
+    to find that out), drops those of guilds that have gone idle, and
+    records a heartbeat so restore knows how far playback got. SQLite is
+    written from a worker thread.
+    """
+
+    def __init__(self, interval: float = SNAPSHOT_INTERVAL):
+        self.interval = interval
+        self._seen: dict[int, tuple] = {}
+        self._saved: set[int] = set()
+        self._task: asyncio.Task | None = None
+        self.writes = 0
+
+    def _dirty(self, guilds: dict[int, tuple]) -> tuple[dict[int, bytes | None], dict[int, tuple]]:
+        """
+        Serialized snapshot (None: delete it) of every guild that changed,
+        and the fingerprints to remember once they are written.
+        """
+        out, seen = {}, {}
+        for guild_id, (state, vc) in guilds.items():
+            key = fingerprint(state, vc)
+            if self._seen.get(guild_id) == key:
+                continue
+            seen[guild_id] = key
+            data = capture(state, vc)
+            if data is not None:
+                out[guild_id] = dumps(data)
+            elif guild_id in self._saved:
+                out[guild_id] = None
+        return out, seen
+
+    @staticmethod
+    def _flush(blobs: dict[int, bytes | None]):
+        for guild_id, blob in blobs.items():
+            if blob is None:
+                delete_guild_snapshot(guild_id)
+            else:
+                save_guild_snapshot(guild_id, blob)
+        set_meta(HEARTBEAT_KEY, str(time.time()))
+
+    async def write(self, guilds: dict[int, tuple]) -> int:
+        """`guilds` maps guild id → (GuildState, voice client or None). Returns rows written."""
+        blobs, seen = self._dirty(guilds)
+        await asyncio.to_thread(self._flush, blobs)
+        # only now: a failed write leaves these guilds dirty for the next tick
+        self._seen.update(seen)
+        for guild_id, blob in blobs.items():
+            if blob is None:
+                self._saved.discard(guild_id)
+            else:
+                self._saved.add(guild_id)
+        written = sum(1 for blob in blobs.values() if blob is not None)
+        self.writes += written
+        return written
+
+    def start(self, collect):
+        """Write `collect()` every interval from the running loop. Safe to call again."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(collect))
+
+    async def _run(self, collect):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.write(collect())
+            except Exception as e:
+                log.error("[snapshots] write failed: %s", e)
+
+
+def _position(data: dict, alive_at: float) -> float:
+    started = data.get("track_started_at")
+    if started is None:
+        return 0.0
+    # playing on until the last heartbeat, or until it was paused
+    return max(0.0, (data.get("paused_at") or alive_at) - started)
+
+
+def load() -> list[dict]:
+    """Recent snapshots, newest first, each with guild_id, age and position added."""
+    heartbeat = get_meta(HEARTBEAT_KEY)
+    out = []
+    for guild_id, blob, updated_at in load_guild_snapshots(SNAPSHOT_MAX_AGE):
+        try:
+            data = loads(blob)
+        except Exception as e:
+            log.warning("[snapshots] unreadable snapshot for guild %s: %s", guild_id, e)
+            continue
+        data["guild_id"] = guild_id
+        data["age"] = time.time() - updated_at
+        data["position"] = _position(data, max(updated_at, float(heartbeat or 0)))
+        out.append(data)
+    out.sort(key=lambda d: d["age"])
+    return out
+
+
+writer = SnapshotWriter()
@@ -0,0 +1,240 @@
+import os
+import time
+import base64
+import asyncio
+import logging
+from typing import AsyncIterator
+
+import aiohttp
+
+import health
+from storage import get_spotify_collection, save_spotify_collection
+
+log = logging.getLogger("bot.spotify")
+
+# overridable so the bot (or a bench script) can point at a local fake API
+SPOTIFY_API_BASE = os.getenv("SPOTIFY_API_BASE", "https://api.spotify.com/v1")
+SPOTIFY_TOKEN_URL = os.getenv("SPOTIFY_TOKEN_URL", "https://accounts.spotify.com/api/token")
+
+ALBUM_PAGE_SIZE = 50
+PLAYLIST_PAGE_SIZE = 100
+
+# albums don't change once released; re-list them only occasionally
+ALBUM_CACHE_TTL = 30 * 24 * 3600
+
+# only what we turn into tracks; keeps playlist pages small
+PLAYLIST_FIELDS = (
+    "next,items(track(id,name,duration_ms,external_ids(isrc),artists(name)))"
+)
+
+
+class SpotifyError(Exception):
+    pass
+
+
+def simplify_track(t: dict) -> dict:
+    """Reduce a Spotify track object to the fields the bot uses."""
+    artists = t.get("artists") or [{}]
+    return {
+        "id": t.get("id"),
+        "name": t.get("name") or "",
+        "artist": artists[0].get("name") or "",
+        "duration_ms": t.get("duration_ms"),
+        "isrc": (t.get("external_ids") or {}).get("isrc"),
+    }
+
+
+class SpotifyClient:
+    """
+    Non-blocking app-only Spotify Web API client.
+
+    One pooled keep-alive aiohttp session is shared by every request, and the
+    client-credentials token is cached until shortly before it expires.
+    """
+
+    def __init__(
+        self,
+        client_id: str | None,
+        client_secret: str | None,
+        api_base: str = SPOTIFY_API_BASE,
+        token_url: str = SPOTIFY_TOKEN_URL,
+        pool_size: int = 8,
+    ):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.api_base = api_base.rstrip("/")
+        self.token_url = token_url
+        self.pool_size = pool_size
+        self._session: aiohttp.ClientSession | None = None
+        self._token: str | None = None
+        self._token_expires_at = 0.0
+        self._token_lock = asyncio.Lock()
+
+    # ─── Session & Token ──────────────────────────────────────────────────────
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.pool_size,
+                keepalive_timeout=60,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=15),
+            )
+        return self._session
+
+    async def _get_token(self, force: bool = False) -> str:
+        # refresh a minute early so a token never expires mid-pagination
+        if not force and self._token and time.time() < self._token_expires_at - 60:
+            return self._token
+
+        async with self._token_lock:
+            if not force and self._token and time.time() < self._token_expires_at - 60:
+                return self._token
+            if not self.client_id or not self.client_secret:
+                raise SpotifyError("SPOTIPY_CLIENT_ID / SPOTIPY_CLIENT_SECRET not set")
+
+            basic = base64.b64encode(f"{self.client_id}:{self.client_secret}".encode()).decode()
+            async with self._get_session().post(
+                self.token_url,
+                data={"grant_type": "client_credentials"},
+                headers={"Authorization": f"Basic {basic}"},
+            ) as resp:
+                if resp.status != 200:
+                    if resp.status == 429 or resp.status >= 500:
+                        health.spotify.record(False)
+                    raise SpotifyError(f"token request failed: HTTP {resp.status}")
+                payload = await resp.json()
+
+            self._token = payload["access_token"]
+            self._token_expires_at = time.time() + payload.get("expires_in", 3600)
+            log.info("[spotify] Fetched new access token")
+            return self._token
+
+    async def _get(self, url: str, params: dict | None = None) -> dict:
+        """GET an API path (or absolute `next` URL), handling 401 and 429 once each."""
+        if not url.startswith("http"):
+            url = f"{self.api_base}{url}"
+
+        breaker = health.spotify
+        try:
+            breaker.check()
+        except health.UpstreamUnavailable as e:
+            raise SpotifyError(str(e)) from e
+
+        refreshed = False
+        try:
+            for attempt in range(4):
+                token = await self._get_token(force=refreshed)
+                async with self._get_session().get(
+                    url,
+                    params=params,
+                    headers={"Authorization": f"Bearer {token}"},
+                ) as resp:
+                    if resp.status == 200:
+                        breaker.record(True)
+                        return await resp.json()
+                    if resp.status == 401 and not refreshed:
+                        refreshed = True
+                        continue
+                    if resp.status == 429 or resp.status >= 500:
+                        breaker.record(False)
+                        if breaker.state == "open":
+                            raise SpotifyError(f"GET {url} failed: HTTP {resp.status}, backing off")
+                    if resp.status == 429:
+                        retry_after = float(resp.headers.get("Retry-After", 1))
+                        log.warning("[spotify] Rate limited, retrying in %ss", retry_after)
+                        await asyncio.sleep(retry_after)
+                        continue
+                    if resp.status < 500:
+                        breaker.record(True)  # the API answered; the request was wrong
+                    raise SpotifyError(f"GET {url} failed: HTTP {resp.status}")
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            breaker.record(False)
+            raise SpotifyError(f"GET {url} failed: {e or type(e).__name__}") from e
+        except SpotifyError:
+            # a refused token leaves no verdict of its own; don't hold the half-open probe
+            breaker.release()
+            raise
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        raise SpotifyError(f"GET {url} failed after retries")
+
+    async def close(self):
+        if self._session and not self._session.closed:
+            await self._session.close()
+
+    # ─── Endpoints ────────────────────────────────────────────────────────────
+    async def track(self, track_id: str) -> dict:
+        return simplify_track(await self._get(f"/tracks/{track_id}"))
+
+    async def iter_album_tracks(self, album_id: str) -> AsyncIterator[list[dict]]:
+        """Yield one list of simplified tracks per page of the album."""
+        data = await self._get(f"/albums/{album_id}/tracks", {"limit": ALBUM_PAGE_SIZE})
+        while True:
+            yield [simplify_track(t) for t in data.get("items", []) if t]
+            if not data.get("next"):
+                return
+            data = await self._get(data["next"])
+
+    async def iter_playlist_tracks(self, playlist_id: str) -> AsyncIterator[list[dict]]:
+        """Yield one list of simplified tracks per page of the playlist."""
+        data = await self._get(
+            f"/playlists/{playlist_id}/tracks",
+            {"limit": PLAYLIST_PAGE_SIZE, "fields": PLAYLIST_FIELDS},
+        )
+        while True:
+            # local files and removed tracks come back with track = null / id = null
+            yield [
+                simplify_track(i["track"])
+                for i in data.get("items", [])
+                if i.get("track") and i["track"].get("id")
+            ]
+            if not data.get("next"):
+                return
+            data = await self._get(data["next"])
+
+    async def playlist_snapshot_id(self, playlist_id: str) -> str | None:
+        """Cheap metadata check: the snapshot_id changes whenever the playlist does."""
+        data = await self._get(f"/playlists/{playlist_id}", {"fields": "snapshot_id"})
+        return data.get("snapshot_id")
+
+    # ─── Cached Listings ──────────────────────────────────────────────────────
+    async def iter_cached_tracks(self, kind: str, item_id: str) -> AsyncIterator[list[dict]]:
+        """
+        Like iter_playlist_tracks / iter_album_tracks, but serve the stored
+        track list in one page when it is still current: playlists are
+        checked against their snapshot_id, albums against ALBUM_CACHE_TTL.
+        A full refetch is stored for next time.
+        """
+        cached = await asyncio.to_thread(get_spotify_collection, kind, item_id)
+        snapshot_id = None
+
+        # API backing off: a possibly stale list beats no list
+        if cached and health.spotify.degraded:
+            log.info("[spotify] API degraded, serving stored %s %s as-is", kind, item_id)
+            yield cached["tracks"]
+            return
+
+        if kind == "playlist":
+            snapshot_id = await self.playlist_snapshot_id(item_id)
+            fresh = cached and snapshot_id and cached["snapshot_id"] == snapshot_id
+            pages = self.iter_playlist_tracks(item_id)
+        else:
+            fresh = cached and time.time() - cached["fetched_at"] < ALBUM_CACHE_TTL
+            pages = self.iter_album_tracks(item_id)
+
+        if fresh:
+            log.info("[spotify] Using cached %s %s (%d tracks)", kind, item_id, len(cached["tracks"]))
+            yield cached["tracks"]
+            return
+
+        tracks = []
+        async for page in pages:
+            tracks.extend(page)
+            yield page
+        # only reached when the caller consumed every page
+        await asyncio.to_thread(save_spotify_collection, kind, item_id, snapshot_id, tracks)
+        log.info("[spotify] Stored %s %s (%d tracks, snapshot %s)", kind, item_id, len(tracks), snapshot_id)
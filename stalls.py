@@ -0,0 +1,118 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import threading
+import traceback
+from collections import Counter
+
+import metrics
+
+log = logging.getLogger("bot.stalls")
+
+# a loop that doesn't get back to us within this long counts as stalled (0 = off)
+STALL_THRESHOLD_MS = float(os.getenv("STALL_THRESHOLD_MS", "250"))
+# how often the heartbeat runs on the loop and the watchdog looks at it
+STALL_INTERVAL = float(os.getenv("STALL_INTERVAL", "0.05"))
+# frames of the loop thread's stack included in the log line
+STALL_STACK_DEPTH = int(os.getenv("STALL_STACK_DEPTH", "12"))
+
+_THIS = os.path.abspath(__file__)
+ROOT = os.path.dirname(_THIS)
+
+
+def call_site(stack: traceback.StackSummary) -> str:
+    """
+    Innermost frame that is our own code (not the stdlib or a dependency),
+    i.e. the line in the bot that made the blocking call.
+    """
+    for frame in reversed(stack):
+        path = os.path.abspath(frame.filename)
+        if path.startswith(ROOT) and "site-packages" not in path and path != _THIS:
+            return f"{os.path.relpath(path, ROOT)}:{frame.lineno} in {frame.name}"
+    if stack:
+        frame = stack[-1]
+        return f"{os.path.basename(frame.filename)}:{frame.lineno} in {frame.name}"
+    return "unknown"
+
+
+class StallDetector:
+    """
+    A heartbeat coroutine stamps the time every STALL_INTERVAL; a watchdog
+    thread notices when the stamp gets older than the threshold and grabs
+    the loop thread's stack while it is still stuck. Once the loop gets back
+    to the heartbeat, the stall is logged with its real duration and
+    counted against the call site.
+    """
+
+    def __init__(self, threshold_ms: float = STALL_THRESHOLD_MS, interval: float = STALL_INTERVAL):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval
+        self.sites: Counter = Counter()
+        self.total = 0
+        self._beat = time.monotonic()
+        self._loop_thread: int | None = None
+        self._sample: tuple[str, traceback.StackSummary] | None = None
+        self._task: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start watching the running loop (call from the loop). Safe to call again."""
+        if self.threshold <= 0 or self.running:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._watch, name="stall-watchdog", daemon=True)
+            self._thread.start()
+        log.info("[stalls] Watching event loop (threshold %.0f ms)", self.threshold * 1000)
+
+    async def _heartbeat(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - self._beat - self.interval)
+            self._beat = now
+            metrics.LOOP_LAG_SECONDS.observe(lag)
+            if lag >= self.threshold:
+                self._record(lag)
+
+    def _watch(self):
+        # runs on its own thread; only reads the beat and samples the stack
+        while True:
+            time.sleep(self.interval)
+            if not self.running or self._sample is not None:
+                continue
+            if time.monotonic() - self._beat - self.interval < self.threshold:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)
+            del frame
+            self._sample = (call_site(stack), stack)
+
+    def _record(self, lag: float):
+        sample, self._sample = self._sample, None
+        # the watchdog can miss a stall that ends between two of its looks
+        site, stack = sample if sample else ("unknown", None)
+        self.sites[site] += 1
+        self.total += 1
+        metrics.LOOP_STALLS.inc(site=site)
+
+        detail = ""
+        if stack:
+            detail = "\n" + "".join(traceback.format_list(stack[-STALL_STACK_DEPTH:])).rstrip()
+        log.warning("[stalls] Event loop blocked for %.0f ms at %s%s", lag * 1000, site, detail)
+
+    def top(self, count: int = 5) -> list[tuple[str, int]]:
+        return self.sites.most_common(count)
+
+
+detector = StallDetector()
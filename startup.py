@@ -0,0 +1,94 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+import importlib
+
+from storage import get_meta, set_meta
+
+log = logging.getLogger("bot.startup")
+
+# set to 1 to push the command tree even if its hash hasn't changed
+FORCE_SYNC = os.getenv("FORCE_SYNC", "0") == "1"
+
+_t0 = time.perf_counter()
+_last = _t0
+_phases: list[tuple[str, float]] = []
+
+
+def mark(phase: str):
+    """Close the current startup phase under `phase` (import, login, connect, sync…)."""
+    global _last
+    now = time.perf_counter()
+    _phases.append((phase, now - _last))
+    _last = now
+
+
+def report() -> str:
+    parts = [f"{name} {secs * 1000:.0f} ms" for name, secs in _phases]
+    return f"{', '.join(parts)} — total {(_last - _t0) * 1000:.0f} ms"
+
+
+# ─── Lazy Imports ──────────────────────────────────────────────────────────────
+class LazyModule:
+    """
+    Stand-in for a module that is only imported on first attribute access,
+    so its import cost moves off the startup path. preload() pays it early
+    on a background thread instead of inside the first /play.
+    """
+
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def _load(self):
+        # import_module holds the per-module import lock, so racing threads are fine
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr: str):
+        return getattr(self._module or self._load(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._module else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def preload(*modules: LazyModule):
+    """Import lazy modules on a daemon thread while the bot logs in."""
+    def _load():
+        for module in modules:
+            start = time.perf_counter()
+            try:
+                module._load()
+            except Exception as e:
+                log.error("[startup] preloading %s failed: %s", module._name, e)
+                continue
+            log.info("[startup] Preloaded %s in %.0f ms", module._name, (time.perf_counter() - start) * 1000)
+
+    threading.Thread(target=_load, name="preload", daemon=True).start()
+
+
+# ─── Conditional Command Sync ──────────────────────────────────────────────────
+def tree_hash(tree) -> str:
+    """Stable hash of the global command tree's payload as Discord would receive it."""
+    payload = sorted((cmd.to_dict(tree) for cmd in tree.get_commands()), key=lambda c: c["name"])
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+async def sync_if_changed(tree, application_id: int) -> bool:
+    """
+    Push the command tree only when its definition differs from the last
+    successful sync for this application. Returns whether it synced.
+    """
+    key = f"command_tree_hash:{application_id}"
+    digest = tree_hash(tree)
+    if not FORCE_SYNC and await asyncio.to_thread(get_meta, key) == digest:
+        return False
+    await tree.sync()
+    await asyncio.to_thread(set_meta, key, digest)
+    return True
@@ -0,0 +1,168 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+# everything the bot persists lives in one SQLite file under BOT_DATA_DIR
+DATA_DIR = os.getenv("BOT_DATA_DIR", "data")
+DB_PATH = os.path.join(DATA_DIR, "bot.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS spotify_matches (
+    spotify_id  TEXT PRIMARY KEY,
+    video_id    TEXT NOT NULL,
+    confidence  REAL NOT NULL,
+    isrc        TEXT,
+    matched_at  REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS spotify_collections (
+    kind           TEXT NOT NULL,
+    collection_id  TEXT NOT NULL,
+    snapshot_id    TEXT,
+    tracks         TEXT NOT NULL,
+    fetched_at     REAL NOT NULL,
+    PRIMARY KEY (kind, collection_id)
+);
+
+CREATE TABLE IF NOT EXISTS cache_entries (
+    key         TEXT PRIMARY KEY,
+    value       BLOB NOT NULL,
+    expires_at  REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS guild_snapshots (
+    guild_id    INTEGER PRIMARY KEY,
+    data        BLOB NOT NULL,
+    updated_at  REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS track_loudness (
+    video_id     TEXT PRIMARY KEY,
+    lufs         REAL NOT NULL,
+    true_peak    REAL,
+    analysed_at  REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS bot_meta (
+    key         TEXT PRIMARY KEY,
+    value       TEXT NOT NULL,
+    updated_at  REAL NOT NULL
+);
+"""
+
+_db: sqlite3.Connection | None = None
+# callers run in worker threads; the first few may arrive together
+_db_lock = threading.Lock()
+
+
+def get_db() -> sqlite3.Connection:
+    """Open (once) and return the shared connection, creating tables as needed."""
+    global _db
+    if _db is None:
+        with _db_lock:
+            if _db is None:
+                os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
+                db = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
+                db.row_factory = sqlite3.Row
+                db.execute("PRAGMA journal_mode=WAL")
+                db.execute("PRAGMA synchronous=NORMAL")
+                db.executescript(SCHEMA)
+                _db = db
+    return _db
+
+
+# ─── Spotify → YouTube Matches ─────────────────────────────────────────────────
+def get_spotify_match(spotify_id: str) -> dict | None:
+    row = get_db().execute(
+        "SELECT video_id, confidence, isrc, matched_at FROM spotify_matches WHERE spotify_id = ?",
+        (spotify_id,),
+    ).fetchone()
+    return dict(row) if row else None
+
+
+def save_spotify_match(spotify_id: str, video_id: str, confidence: float, isrc: str | None = None):
+    get_db().execute(
+        "INSERT OR REPLACE INTO spotify_matches (spotify_id, video_id, confidence, isrc, matched_at) "
+        "VALUES (?, ?, ?, ?, ?)",
+        (spotify_id, video_id, confidence, isrc, time.time()),
+    )
+
+
+# ─── Spotify Playlist / Album Track Lists ──────────────────────────────────────
+def get_spotify_collection(kind: str, collection_id: str) -> dict | None:
+    row = get_db().execute(
+        "SELECT snapshot_id, tracks, fetched_at FROM spotify_collections "
+        "WHERE kind = ? AND collection_id = ?",
+        (kind, collection_id),
+    ).fetchone()
+    if not row:
+        return None
+    return {
+        "snapshot_id": row["snapshot_id"],
+        "tracks": json.loads(row["tracks"]),
+        "fetched_at": row["fetched_at"],
+    }
+
+
+def save_spotify_collection(kind: str, collection_id: str, snapshot_id: str | None, tracks: list[dict]):
+    get_db().execute(
+        "INSERT OR REPLACE INTO spotify_collections "
+        "(kind, collection_id, snapshot_id, tracks, fetched_at) VALUES (?, ?, ?, ?, ?)",
+        (kind, collection_id, snapshot_id, json.dumps(tracks, separators=(",", ":")), time.time()),
+    )
+
+
+# ─── Guild Snapshots (warm restart) ────────────────────────────────────────────
+def save_guild_snapshot(guild_id: int, data: bytes):
+    get_db().execute(
+        "INSERT OR REPLACE INTO guild_snapshots (guild_id, data, updated_at) VALUES (?, ?, ?)",
+        (guild_id, data, time.time()),
+    )
+
+
+def delete_guild_snapshot(guild_id: int):
+    get_db().execute("DELETE FROM guild_snapshots WHERE guild_id = ?", (guild_id,))
+
+
+def load_guild_snapshots(max_age: float) -> list[tuple[int, bytes, float]]:
+    return [
+        (row["guild_id"], row["data"], row["updated_at"])
+        for row in get_db().execute(
+            "SELECT guild_id, data, updated_at FROM guild_snapshots WHERE updated_at >= ?",
+            (time.time() - max_age,),
+        )
+    ]
+
+
+# ─── Track Loudness (measured once per video) ──────────────────────────────────
+def get_track_loudness(video_id: str) -> dict | None:
+    row = get_db().execute(
+        "SELECT lufs, true_peak, analysed_at FROM track_loudness WHERE video_id = ?", (video_id,)
+    ).fetchone()
+    return dict(row) if row else None
+
+
+def save_track_loudness(video_id: str, lufs: float, true_peak: float | None):
+    get_db().execute(
+        "INSERT OR REPLACE INTO track_loudness (video_id, lufs, true_peak, analysed_at) VALUES (?, ?, ?, ?)",
+        (video_id, lufs, true_peak, time.time()),
+    )
+
+
+def count_track_loudness() -> int:
+    return get_db().execute("SELECT COUNT(*) FROM track_loudness").fetchone()[0]
+
+
+# ─── Bot Metadata (small key/value facts kept across restarts) ─────────────────
+def get_meta(key: str) -> str | None:
+    row = get_db().execute("SELECT value FROM bot_meta WHERE key = ?", (key,)).fetchone()
+    return row["value"] if row else None
+
+
+def set_meta(key: str, value: str):
+    get_db().execute(
+        "INSERT OR REPLACE INTO bot_meta (key, value, updated_at) VALUES (?, ?, ?)",
+        (key, value, time.time()),
+    )
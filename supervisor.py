@@ -0,0 +1,276 @@
+"""
+Sharded deployment: runs K copies of bot.py, each owning a slice of the
+Discord shards (AutoShardedBot with SHARD_COUNT / SHARD_IDS), so guilds are
+spread over every core instead of one interpreter's GIL.
+
+    python supervisor.py --workers 4                 # shard count from Discord
+    python supervisor.py --workers 2 --shards 8 --metrics-port 9100
+
+Crashed workers are restarted with backoff. Each worker serves its own
+/metrics and /health on metrics-port+1+i; the supervisor serves both on
+metrics-port, merged, with a worker="i" label on every sample.
+"""
+import os
+import sys
+import json
+import time
+import shlex
+import signal
+import asyncio
+import argparse
+import logging
+
+import aiohttp
+from dotenv import load_dotenv
+
+import metrics
+from logsetup import setup_logging
+
+log = logging.getLogger("bot.supervisor")
+
+GATEWAY_URL = "https://discord.com/api/v10/gateway/bot"
+# a worker that stayed up this long is healthy again; its backoff resets
+STABLE_AFTER = 60.0
+MAX_BACKOFF = 60.0
+HEALTH_INTERVAL = 10.0
+
+
+def split_shards(shard_count: int, workers: int) -> list[list[int]]:
+    """Contiguous, near-even shard ranges: 10 shards / 3 workers → 0-3, 4-6, 7-9."""
+    base, extra = divmod(shard_count, workers)
+    out, start = [], 0
+    for i in range(workers):
+        size = base + (1 if i < extra else 0)
+        out.append(list(range(start, start + size)))
+        start += size
+    return [ids for ids in out if ids]
+
+
+async def recommended_shards(token: str) -> int | None:
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(GATEWAY_URL, headers={"Authorization": f"Bot {token}"}) as resp:
+                if resp.status != 200:
+                    log.warning("[supervisor] /gateway/bot returned %s", resp.status)
+                    return None
+                return (await resp.json()).get("shards")
+    except aiohttp.ClientError as e:
+        log.warning("[supervisor] /gateway/bot failed: %s", e)
+        return None
+
+
+class Worker:
+    def __init__(self, index: int, shard_ids: list[int], shard_count: int, port: int):
+        self.index = index
+        self.shard_ids = shard_ids
+        self.shard_count = shard_count
+        self.port = port
+        self.proc: asyncio.subprocess.Process | None = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.last_exit: int | None = None
+        self.health: dict | None = None
+
+    @property
+    def up(self) -> bool:
+        return self.proc is not None and self.proc.returncode is None
+
+    def env(self) -> dict:
+        return dict(
+            os.environ,
+            SHARD_COUNT=str(self.shard_count),
+            SHARD_IDS=",".join(map(str, self.shard_ids)),
+            WORKER_ID=str(self.index),
+            METRICS_PORT=str(self.port),
+        )
+
+    def summary(self) -> dict:
+        return {
+            "worker": self.index,
+            "pid": self.proc.pid if self.proc else None,
+            "up": self.up,
+            "shards": self.shard_ids,
+            "uptime": round(time.monotonic() - self.started_at, 1) if self.up else 0,
+            "restarts": self.restarts,
+            "last_exit": self.last_exit,
+            "health": self.health,
+        }
+
+
+class Supervisor:
+    def __init__(self, args):
+        self.args = args
+        self.workers: list[Worker] = []
+        self.stopping = asyncio.Event()
+        self.session: aiohttp.ClientSession | None = None
+
+    async def run(self):
+        args = self.args
+        shard_count = args.shards
+        if not shard_count and os.getenv("DISCORD_TOKEN"):
+            shard_count = await recommended_shards(os.getenv("DISCORD_TOKEN"))
+        shard_count = max(shard_count or args.workers, args.workers)
+
+        for i, ids in enumerate(split_shards(shard_count, args.workers)):
+            self.workers.append(Worker(i, ids, shard_count, args.metrics_port + 1 + i))
+        log.info("[supervisor] %d shards over %d workers: %s", shard_count, len(self.workers),
+                 "; ".join(f"{w.index}→{w.shard_ids}" for w in self.workers))
+
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self.stopping.set)
+
+        self.session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=5))
+        server = await metrics.serve(args.host, args.metrics_port, {
+            "/metrics": self._metrics_route,
+            "/health": self._health_route,
+        })
+        log.info("[supervisor] Serving http://%s:%s/metrics and /health", args.host, args.metrics_port)
+
+        tasks = [asyncio.create_task(self._poll_health())]
+        for w in self.workers:
+            tasks.append(asyncio.create_task(self._keep_running(w)))
+            # IDENTIFY is rate limited per bot; don't have every worker log in at once
+            if w is not self.workers[-1]:
+                try:
+                    await asyncio.wait_for(self.stopping.wait(), timeout=args.stagger)
+                except asyncio.TimeoutError:
+                    pass
+
+        await self.stopping.wait()
+        log.info("[supervisor] Stopping workers")
+        await asyncio.gather(*(self._stop(w) for w in self.workers))
+        for t in tasks:
+            t.cancel()
+        server.close()
+        await self.session.close()
+
+    # ─── Worker Lifecycle ──────────────────────────────────────────────────────
+    async def _keep_running(self, w: Worker):
+        backoff = 1.0
+        while not self.stopping.is_set():
+            w.started_at = time.monotonic()
+            w.proc = await asyncio.create_subprocess_exec(*self.args.worker_cmd, env=w.env())
+            log.info("[supervisor] worker %d started (pid %d, shards %s)", w.index, w.proc.pid, w.shard_ids)
+            w.last_exit = await w.proc.wait()
+            w.health = None
+            if self.stopping.is_set():
+                return
+
+            uptime = time.monotonic() - w.started_at
+            backoff = 1.0 if uptime >= STABLE_AFTER else min(backoff * 2, MAX_BACKOFF)
+            w.restarts += 1
+            log.warning("[supervisor] worker %d exited with %s after %.0fs; restarting in %.0fs",
+                        w.index, w.last_exit, uptime, backoff)
+            try:
+                await asyncio.wait_for(self.stopping.wait(), timeout=backoff)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _stop(self, w: Worker):
+        if not w.up:
+            return
+        w.proc.terminate()
+        try:
+            await asyncio.wait_for(w.proc.wait(), timeout=self.args.grace)
+        except asyncio.TimeoutError:
+            log.warning("[supervisor] worker %d ignored SIGTERM; killing", w.index)
+            w.proc.kill()
+            await w.proc.wait()
+
+    # ─── Health & Metrics Aggregation ──────────────────────────────────────────
+    async def _fetch(self, w: Worker, path: str) -> str | None:
+        if not w.up:
+            return None
+        try:
+            async with self.session.get(f"http://{self.args.host}:{w.port}{path}") as resp:
+                return await resp.text() if resp.status == 200 else None
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return None
+
+    async def _poll_health(self):
+        while True:
+            for w in self.workers:
+                body = await self._fetch(w, "/health")
+                w.health = json.loads(body) if body else None
+            await asyncio.sleep(HEALTH_INTERVAL)
+
+    async def _health_route(self):
+        workers = [w.summary() for w in self.workers]
+        ok = all(w["up"] for w in workers)
+        body = {"ok": ok, "workers": workers}
+        return ("200 OK" if ok else "503 Service Unavailable"), "application/json", json.dumps(body).encode()
+
+    async def _metrics_route(self):
+        bodies = await asyncio.gather(*(self._fetch(w, "/metrics") for w in self.workers))
+        text = merge_expositions({str(w.index): b for w, b in zip(self.workers, bodies) if b})
+        own = ["# HELP bot_supervisor_worker_up Whether the worker process is running",
+               "# TYPE bot_supervisor_worker_up gauge"]
+        own += [f'bot_supervisor_worker_up{{worker="{w.index}"}} {int(w.up)}' for w in self.workers]
+        own += ["# HELP bot_supervisor_restarts_total Worker restarts after an exit",
+                "# TYPE bot_supervisor_restarts_total counter"]
+        own += [f'bot_supervisor_restarts_total{{worker="{w.index}"}} {w.restarts}' for w in self.workers]
+        return "200 OK", "text/plain; version=0.0.4; charset=utf-8", (text + "\n".join(own) + "\n").encode()
+
+
+def _with_worker(sample: str, worker: str) -> str:
+    # label values may contain spaces; the value is always the last field
+    name, _, rest = sample.rpartition(" ")
+    label = f'worker="{worker}"'
+    if name.endswith("}"):
+        return f"{name[:-1]},{label}}} {rest}"
+    return f"{name}{{{label}}} {rest}"
+
+
+def merge_expositions(bodies: dict[str, str]) -> str:
+    """
+    Merge per-worker Prometheus text into one exposition, keeping each
+    metric family's samples together (as the format requires) and tagging
+    every sample with its worker.
+    """
+    headers: dict[str, list[str]] = {}
+    samples: dict[str, list[str]] = {}
+    for worker, body in bodies.items():
+        family = None
+        for line in body.splitlines():
+            if not line.strip():
+                continue
+            if line.startswith("#"):
+                parts = line.split(None, 3)
+                if len(parts) >= 3 and parts[1] in ("HELP", "TYPE"):
+                    family = parts[2]
+                    head = headers.setdefault(family, [])
+                    if len(head) < 2 and line not in head:
+                        head.append(line)
+                    samples.setdefault(family, [])
+                continue
+            if family is not None:
+                samples[family].append(_with_worker(line, worker))
+    lines = []
+    for family, head in headers.items():
+        lines += head
+        lines += samples[family]
+    return "\n".join(lines) + ("\n" if lines else "")
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Run bot.py as several shard workers")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shards", type=int, default=0,
+                        help="total shard count (default: Discord's recommendation, at least --workers)")
+    parser.add_argument("--host", default=metrics.METRICS_HOST)
+    parser.add_argument("--metrics-port", type=int, default=metrics.METRICS_PORT or 9100)
+    parser.add_argument("--stagger", type=float, default=5.0, help="seconds between worker starts")
+    parser.add_argument("--grace", type=float, default=10.0, help="seconds to wait after SIGTERM")
+    parser.add_argument("--worker-cmd", type=shlex.split,
+                        default=[sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "bot.py")],
+                        help="command for one worker (e.g. a fake gateway stand-in)")
+    args = parser.parse_args()
+
+    setup_logging()
+    asyncio.run(Supervisor(args).run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# the fake servers live with the benchmarks
+sys.path.insert(0, os.path.join(ROOT, "bench"))
+os.environ.setdefault("BOT_DATA_DIR", tempfile.mkdtemp(prefix="bot-tests-"))
+os.environ.setdefault("CACHE_URL", "memory://")
+
+import pytest  # noqa: E402
+
+import extraction  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def fresh_slots(monkeypatch):
+    # the slot semaphore binds to the first loop that uses it; each test runs its own
+    monkeypatch.setattr(extraction, "_slots", None)
@@ -0,0 +1,44 @@
+import pytest
+
+import bot
+
+
+class Voice:
+    def __init__(self, guild_id, playing=True):
+        self.guild = type("Guild", (), {"id": guild_id})()
+        self.playing = playing
+
+    def is_playing(self):
+        return self.playing
+
+
+@pytest.fixture
+def voice_clients(monkeypatch):
+    clients = []
+    monkeypatch.setattr(type(bot.bot), "voice_clients", property(lambda self: clients))
+    monkeypatch.setattr(bot, "NET_BUDGET_KBPS", 1000)
+    monkeypatch.setattr(bot, "AUTO_MIN_KBPS", 32)
+    return clients
+
+
+def test_a_guild_about_to_play_counts_itself(voice_clients):
+    voice_clients += [Voice(1), Voice(2), Voice(3, playing=False)]
+    # guild 3 is in play_next: two streams already, it makes the third
+    assert bot.auto_ceiling(512, 3) == 1000 // 3
+    # guild 1 is already one of the two
+    assert bot.auto_ceiling(512, 1) == 1000 // 2
+
+
+def test_share_alone_and_bounds(voice_clients):
+    assert bot.auto_ceiling(None, 1) == min(bot.BITRATE_MODES["default"], 1000)
+    assert bot.auto_ceiling(384, 1) == 384
+    voice_clients += [Voice(g) for g in range(2, 102)]
+    assert bot.auto_ceiling(384, 1) == 32
+
+
+def test_auto_mode_asks_for_its_own_guild(voice_clients):
+    voice_clients += [Voice(1), Voice(2)]
+    state = bot.GuildState(1)
+    state.bitrate_mode = "auto"
+    state.channel_kbps = 512
+    assert state.format_ceiling() == 500
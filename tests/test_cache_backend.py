@@ -0,0 +1,95 @@
+import asyncio
+
+import pytest
+
+import cache_backend
+from cache_backend import CacheUnavailable, RedisCache, RespError
+from fake_redis import FakeRedis
+
+
+def parse(data: bytes):
+    async def main():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await RedisCache._read(reader)
+    return asyncio.run(main())
+
+
+def test_resp_replies():
+    assert parse(b"+OK\r\n") == "OK"
+    assert parse(b":42\r\n") == 42
+    assert parse(b"$-1\r\n") is None
+    assert parse(b"$5\r\nhe\r\no\r\n") == b"he\r\no"
+    assert parse(b"$0\r\n\r\n") == b""
+    assert parse(b"*-1\r\n") is None
+    assert parse(b"*3\r\n:1\r\n$1\r\nx\r\n*1\r\n+y\r\n") == [1, b"x", ["y"]]
+    with pytest.raises(RespError, match="WRONGTYPE"):
+        parse(b"-WRONGTYPE Operation against a key\r\n")
+    with pytest.raises(RespError, match="unexpected"):
+        parse(b"?what\r\n")
+
+
+def test_commands_encode_as_the_server_reads_them():
+    async def main():
+        reader = asyncio.StreamReader()
+        reader.feed_data(RedisCache._encode("SET", "k", b"\x00\r\n", "PX", 1500))
+        reader.feed_eof()
+        return await FakeRedis._read_command(reader)
+    assert asyncio.run(main()) == [b"SET", b"k", b"\x00\r\n", b"PX", b"1500"]
+
+
+def test_round_trip_expiry_and_invalidate():
+    async def main():
+        server = await FakeRedis().start()
+        cache = RedisCache(server.url.replace("/0", "/3"))
+        try:
+            value = {"title": "a", "formats": [1, 2, 3]}
+            await cache.set("info", "q", value, 60)
+            await cache.set("info", "brief", value, 0.05)
+            assert await cache.get("info", "q") == value
+            await asyncio.sleep(0.1)
+            assert await cache.get("info", "brief") is None
+            await cache.invalidate("info", "q")
+            assert await cache.get("info", "q") is None
+            # SELECT went to the connection: the keys live in db 3
+            assert set(server.dbs) == {3}
+            assert len(cache._idle) <= RedisCache.POOL_SIZE
+        finally:
+            await cache.close()
+            await server.stop()
+    asyncio.run(main())
+
+
+def test_unreachable_server_is_a_quiet_miss():
+    async def main():
+        server = await FakeRedis().start()
+        url = server.url
+        await server.stop()
+        cache = RedisCache(url)
+        assert await cache.get("info", "q") is None
+        # marked down: later calls don't even try to connect
+        with pytest.raises(CacheUnavailable):
+            await cache.command("GET", "x")
+        await cache.set("info", "q", {"a": 1}, 60)
+        assert await cache.get("info", "q") is None
+    asyncio.run(main())
+
+
+def test_sqlite_layer_outlives_the_memory_one():
+    async def main():
+        cache = cache_backend.SQLiteCache()
+        await cache.set("search", "sqlite-q", [{"id": "x"}], 60)
+        # a restarted process: nothing in memory, still on disk
+        cache.memory = cache_backend.MemoryCache()
+        assert await cache.get("search", "sqlite-q") == [{"id": "x"}]
+        await cache.invalidate("search", "sqlite-q")
+        cache.memory = cache_backend.MemoryCache()
+        assert await cache.get("search", "sqlite-q") is None
+    asyncio.run(main())
+
+
+def test_open_cache_picks_the_backend():
+    assert isinstance(cache_backend.open_cache("redis://localhost:6379/1"), RedisCache)
+    assert isinstance(cache_backend.open_cache("sqlite://"), cache_backend.SQLiteCache)
+    assert isinstance(cache_backend.open_cache("bogus://"), cache_backend.MemoryCache)
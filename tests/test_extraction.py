@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+import pytest
+
+import health
+from extraction import CancelToken, ExtractionCancelled, run_extraction
+
+
+def nap(seconds, job):
+    time.sleep(seconds)
+
+
+def test_jobs_unhook_from_their_parent():
+    parent = CancelToken()
+
+    def fail(job):
+        raise ValueError("boom")
+
+    async def main():
+        for i in range(200):
+            assert await run_extraction(lambda n, job: n * 2, i, token=parent) == i * 2
+        with pytest.raises(ValueError):
+            await run_extraction(fail, token=parent)
+        with pytest.raises(ExtractionCancelled):
+            await run_extraction(nap, 0.2, token=parent, timeout=0.01)
+
+    asyncio.run(main())
+    assert not parent._children
+    assert not parent._waiters
+    assert not parent.cancelled
+
+
+def test_cancelled_child_leaves_parent():
+    parent = CancelToken()
+    child = parent.child()
+    child.cancel("declined")
+    assert not parent._children
+    assert not parent.cancelled
+
+
+def test_parent_cancel_reaches_children():
+    parent = CancelToken()
+    children = [parent.child() for _ in range(3)]
+    parent.cancel("stop")
+    assert all(c.cancelled and c.reason == "stop" for c in children)
+
+
+def test_waiting_for_a_slot_is_not_an_upstream_failure(monkeypatch):
+    monkeypatch.setattr(health, "BREAKER_MIN_CALLS", 1)
+    breaker = health.CircuitBreaker("test")
+
+    async def main():
+        monkeypatch.setattr("extraction._slots", asyncio.Semaphore(1))
+        busy = asyncio.ensure_future(run_extraction(nap, 0.3, breaker=breaker))
+        await asyncio.sleep(0.05)
+        with pytest.raises(ExtractionCancelled):
+            await run_extraction(nap, 0, timeout=0.05, breaker=breaker)
+        await busy
+
+    asyncio.run(main())
+    assert breaker.state == "closed"
+    assert [ok for _, ok in breaker._outcomes] == [True]
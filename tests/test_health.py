@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+import health
+from extraction import ExtractionCancelled
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(health.time, "monotonic", clock)
+    monkeypatch.setattr(health.random, "uniform", lambda a, b: 1.0)
+    monkeypatch.setattr(health, "BREAKER_MIN_CALLS", 4)
+    return clock
+
+
+def trip(breaker):
+    for _ in range(health.BREAKER_MIN_CALLS):
+        breaker.record(False)
+
+
+def test_failures_open_it_and_successes_keep_it_closed(clock):
+    breaker = health.CircuitBreaker("test")
+    for ok in (True, True, True, False, True, True, True, False):
+        breaker.record(ok)
+    assert breaker.state == "closed"
+    trip(breaker)
+    assert breaker.state == "open"
+    with pytest.raises(health.UpstreamUnavailable) as refused:
+        breaker.check()
+    assert refused.value.retry_in == pytest.approx(health.BREAKER_BACKOFF)
+
+
+def test_old_failures_leave_the_window(clock):
+    breaker = health.CircuitBreaker("test")
+    for _ in range(health.BREAKER_MIN_CALLS - 1):
+        breaker.record(False)
+    clock.now += health.BREAKER_WINDOW + 1
+    breaker.record(False)
+    assert breaker.state == "closed"
+
+
+def test_one_probe_then_closed_or_reopened_for_longer(clock):
+    breaker = health.CircuitBreaker("test")
+    trip(breaker)
+    clock.now += health.BREAKER_BACKOFF
+    breaker.check()
+    assert breaker.state == "half_open"
+    # only the one probe goes through
+    with pytest.raises(health.UpstreamUnavailable):
+        breaker.check()
+
+    breaker.record(False)
+    assert breaker.state == "open"
+    assert breaker.retry_in() == pytest.approx(2 * health.BREAKER_BACKOFF)
+
+    clock.now += 2 * health.BREAKER_BACKOFF
+    breaker.check()
+    breaker.record(True)
+    assert breaker.state == "closed"
+    assert breaker.trips == 0
+
+
+def test_a_lost_probe_frees_the_slot(clock):
+    breaker = health.CircuitBreaker("test")
+    trip(breaker)
+    clock.now += health.BREAKER_BACKOFF
+    breaker.check()
+    breaker.release()
+    breaker.check()  # the next call probes instead
+    clock.now += health.PROBE_TIMEOUT
+    breaker.check()  # and one that never reports back times out
+    assert breaker.state == "half_open"
+
+
+def test_stragglers_from_before_a_trip_are_ignored(clock):
+    breaker = health.CircuitBreaker("test")
+    trip(breaker)
+    until = breaker.retry_in()
+    breaker.record(True)
+    assert breaker.state == "open"
+    assert breaker.retry_in() == until
+
+
+def test_call_classifies_outcomes(clock):
+    breaker = health.CircuitBreaker("test")
+
+    async def raises(exc):
+        raise exc
+
+    async def main():
+        for exc in (ValueError("Private video"),) * 10:
+            with pytest.raises(ValueError):
+                await breaker.call(raises, exc)
+        assert breaker.state == "closed"
+        with pytest.raises(ExtractionCancelled):
+            await breaker.call(raises, ExtractionCancelled("stop"))
+        # half the window failing trips it
+        for _ in range(10):
+            with pytest.raises(RuntimeError):
+                await breaker.call(raises, RuntimeError("HTTP Error 429: Too Many Requests"))
+        assert breaker.state == "open"
+
+    asyncio.run(main())
+
+
+def test_classify():
+    assert health.classify(ExtractionCancelled("timeout")) is True
+    assert health.classify(ExtractionCancelled("stop")) is None
+    assert health.classify(health.UpstreamUnavailable("x", 1)) is None
+    assert health.classify(TimeoutError()) is True
+    assert health.classify(RuntimeError("Sign in to confirm you're not a bot")) is True
+    assert health.classify(RuntimeError("Video unavailable")) is False
@@ -0,0 +1,19 @@
+import logging
+import queue
+
+from logsetup import LazyQueueHandler
+
+
+def test_args_are_merged_before_the_record_is_queued():
+    q = queue.Queue(maxsize=1)
+    handler = LazyQueueHandler(q)
+    song = {"title": "a"}
+    record = logging.LogRecord("bot", logging.INFO, __file__, 1, "playing %s", (song,), None)
+    handler.handle(record)
+    song["title"] = "b"
+    queued = q.get_nowait()
+    assert queued.getMessage() == "playing {'title': 'a'}"
+
+    handler.handle(record)
+    handler.handle(record)
+    assert handler.dropped == 1
@@ -0,0 +1,49 @@
+import asyncio
+
+import loudness
+import metrics
+
+URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+
+def test_misses_are_remembered_until_measured(monkeypatch):
+    reads = []
+
+    def get_track_loudness(vid):
+        reads.append(vid)
+        return None
+
+    async def runner(source):
+        return -24.0, -20.0
+
+    monkeypatch.setattr(loudness, "get_track_loudness", get_track_loudness)
+    monkeypatch.setattr(loudness, "save_track_loudness", lambda *row: None)
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    analyzer = loudness.LoudnessAnalyzer(runner=runner)
+    unmeasured = metrics.LOUDNESS_PLAYS.value(result="unmeasured")
+
+    async def main():
+        for _ in range(5):
+            assert await analyzer.gain_for(URL) is None
+        assert analyzer.submit(URL, "http://stream", usable_for=600)
+        await analyzer.drain()
+        analyzer.stop()
+        return await analyzer.gain_for(URL)
+
+    assert asyncio.run(main()) == 10.0
+    assert reads == ["dQw4w9WgXcQ"]
+    assert metrics.LOUDNESS_PLAYS.value(result="unmeasured") - unmeasured == 5
+    assert analyzer.analysed == 1
+
+
+def test_remembered_misses_are_bounded(monkeypatch):
+    monkeypatch.setattr(loudness, "get_track_loudness", lambda vid: None)
+    monkeypatch.setattr(loudness, "UNMEASURED_MEMO", 3)
+    analyzer = loudness.LoudnessAnalyzer()
+
+    async def main():
+        for vid in ("a", "b", "c", "a", "d"):
+            await analyzer.lookup(vid)
+
+    asyncio.run(main())
+    assert list(analyzer._unmeasured) == ["c", "a", "d"]
@@ -0,0 +1,25 @@
+from matching import carries_isrc, rank_matches, score_candidate
+
+TRACK = {"title": "Blinding Lights The Weeknd", "duration": 200, "isrc": "USUG11904206"}
+
+
+def test_isrc_outranks_a_closer_title():
+    exact = {"id": "a", "title": "The Weeknd - Blinding Lights", "duration": 201, "channel": "TheWeekndVEVO"}
+    labelled = {
+        "id": "b", "title": "Blinding Lights", "duration": 204, "channel": "Republic",
+        "description": "Provided to YouTube by Republic Records\n\nISRC: US-UG1-19-04206",
+    }
+    ranked = rank_matches(TRACK, [exact, labelled])
+    assert [c["id"] for c, _ in ranked] == ["b", "a"]
+    assert ranked[0][1] >= 0.9
+
+
+def test_isrc_sources():
+    assert carries_isrc({"isrc": "usug11904206"}, "USUG11904206")
+    assert not carries_isrc({"description": "ISRC: GBAYE0000351"}, "USUG11904206")
+    assert not carries_isrc({"description": "USUG11904206"}, None)
+
+
+def test_without_isrc_scoring_is_unchanged():
+    plain = {"title": "The Weeknd - Blinding Lights", "duration": 200, "channel": "The Weeknd - Topic"}
+    assert score_candidate({**TRACK, "isrc": None}, plain) == score_candidate(TRACK, plain)
@@ -0,0 +1,86 @@
+import asyncio
+import time
+
+import bot
+import snapshots
+import storage
+
+
+class FakeVoice:
+    def __init__(self, channel_id=7, playing=True):
+        self.channel = type("Channel", (), {"id": channel_id})()
+        self.playing = playing
+
+    def is_connected(self):
+        return True
+
+    def is_playing(self):
+        return self.playing
+
+    def is_paused(self):
+        return False
+
+
+def test_only_changed_guilds_are_written(monkeypatch):
+    saved = []
+    monkeypatch.setattr(snapshots, "save_guild_snapshot", lambda gid, blob: saved.append(gid))
+    writer = snapshots.SnapshotWriter()
+    states = {gid: bot.GuildState() for gid in (1, 2, 3)}
+    for state in states.values():
+        state.queue.append({"title": "a", "url": "u"})
+    guilds = {gid: (state, FakeVoice()) for gid, state in states.items()}
+
+    async def main():
+        assert await writer.write(guilds) == 3
+        assert await writer.write(guilds) == 0
+        states[2].queue.pop(0)
+        states[2].history.append({"title": "b", "url": "v"})
+        assert await writer.write(guilds) == 1
+        states[3].loop_mode = "all"
+        assert await writer.write(guilds) == 1
+        guilds[1][1].playing = False
+        states[1].queue.clear()
+        await writer.write(guilds)
+
+    asyncio.run(main())
+    assert saved == [1, 2, 3, 2, 3]
+
+
+def test_position_comes_from_the_heartbeat():
+    writer = snapshots.SnapshotWriter()
+    state = bot.GuildState()
+    state.history.append({"title": "a", "url": "u"})
+    state.track_started_at = time.time() - 30
+    asyncio.run(writer.write({42: (state, FakeVoice())}))
+    storage.set_meta(snapshots.HEARTBEAT_KEY, str(time.time() + 60))
+
+    snap = next(s for s in snapshots.load() if s["guild_id"] == 42)
+    assert 89 <= snap["position"] <= 91
+    assert snap["current"]["title"] == "a"
+    storage.delete_guild_snapshot(42)
+
+
+def test_a_failed_write_is_retried(monkeypatch):
+    saved = []
+
+    def save(gid, blob):
+        if not saved:
+            saved.append(None)
+            raise OSError("disk full")
+        saved.append(gid)
+
+    monkeypatch.setattr(snapshots, "save_guild_snapshot", save)
+    writer = snapshots.SnapshotWriter()
+    state = bot.GuildState()
+    state.queue.append({"title": "a", "url": "u"})
+    guilds = {7: (state, FakeVoice())}
+
+    async def main():
+        try:
+            await writer.write(guilds)
+        except OSError:
+            pass
+        assert await writer.write(guilds) == 1
+
+    asyncio.run(main())
+    assert saved == [None, 7]
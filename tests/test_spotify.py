@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+import health
+import spotify
+from fake_spotify import FakeSpotify
+
+
+@pytest.fixture(autouse=True)
+def fresh_breaker(monkeypatch):
+    monkeypatch.setattr(health, "spotify", health.CircuitBreaker("spotify"))
+
+
+def with_api(test):
+    """Run `test(api, client)` against a fresh fake API."""
+    async def main():
+        api = FakeSpotify()
+        base = await api.start()
+        client = spotify.SpotifyClient("id", "secret", api_base=f"{base}/v1", token_url=f"{base}/api/token")
+        try:
+            await test(api, client)
+        finally:
+            await client.close()
+            await api.stop()
+    asyncio.run(main())
+
+
+def test_expired_token_is_refreshed_once():
+    async def test(api, client):
+        await client.track("tr1")
+        api.revoked.add(client._token)
+        assert (await client.track("tr2"))["name"] == "Fake Song 2"
+        assert api.tokens_issued == 2
+        # a fresh token that is refused too is an error, not a loop
+        api.revoked |= {client._token, f"fake-token-{api.tokens_issued + 1}"}
+        with pytest.raises(spotify.SpotifyError, match="HTTP 401"):
+            await client.track("tr3")
+        assert api.tokens_issued == 3
+        assert api.requests["track"] == 5
+    with_api(test)
+
+
+def test_rate_limit_waits_and_retries():
+    async def test(api, client):
+        api.faults["track"] = [429, 429]
+        assert (await client.track("tr7"))["id"] == "trt000007"
+        assert api.requests["track"] == 3
+        assert health.spotify.state == "closed"
+    with_api(test)
+
+
+def test_persistent_rate_limit_opens_the_breaker(monkeypatch):
+    monkeypatch.setattr(health, "BREAKER_MIN_CALLS", 2)
+
+    async def test(api, client):
+        api.faults["track"] = [429] * 10
+        with pytest.raises(spotify.SpotifyError, match="backing off"):
+            await client.track("tr1")
+        assert health.spotify.state == "open"
+        # refused without a request while it's open
+        with pytest.raises(spotify.SpotifyError):
+            await client.track("tr1")
+        assert api.requests["track"] == 2
+    with_api(test)
+
+
+def test_playlist_is_refetched_only_when_its_snapshot_changes():
+    async def listing(client, playlist_id):
+        return [t["id"] async for page in client.iter_cached_tracks("playlist", playlist_id) for t in page]
+
+    async def test(api, client):
+        playlist_id = "snapcheck250"
+        first = await listing(client, playlist_id)
+        assert len(first) == 250
+        assert api.requests == {"token": 1, "playlist": 1, "playlist_tracks": 3}
+
+        assert await listing(client, playlist_id) == first
+        assert api.requests["playlist"] == 2
+        assert api.requests["playlist_tracks"] == 3
+
+        api.snapshot_versions[playlist_id] = 1
+        assert await listing(client, playlist_id) == first
+        assert api.requests["playlist_tracks"] == 6
+    with_api(test)
+
+
+def test_network_errors_surface_as_spotify_errors():
+    async def main():
+        api = FakeSpotify()
+        base = await api.start()
+        await api.stop()
+        client = spotify.SpotifyClient("id", "secret", api_base=f"{base}/v1", token_url=f"{base}/api/token")
+        try:
+            with pytest.raises(spotify.SpotifyError):
+                await client.track("tr1")
+        finally:
+            await client.close()
+    asyncio.run(main())
+
+
+def test_a_failed_token_request_settles_the_probe(monkeypatch):
+    monkeypatch.setattr(health, "BREAKER_MIN_CALLS", 1)
+    monkeypatch.setattr(health, "BREAKER_BACKOFF", 0.0)
+
+    async def test(api, client):
+        health.spotify.record(False)
+        assert health.spotify.state == "open"
+        # the probe's token request is refused outright: no verdict, the next call probes
+        api.faults["token"] = [400]
+        with pytest.raises(spotify.SpotifyError, match="token request failed"):
+            await client.track("tr1")
+        assert health.spotify.state == "half_open"
+        assert health.spotify.retry_in() == 0
+        # the accounts service failing counts against the API
+        api.faults["token"] = [503]
+        with pytest.raises(spotify.SpotifyError, match="token request failed"):
+            await client.track("tr1")
+        assert health.spotify.state == "open"
+        assert (await client.track("tr4"))["id"] == "trt000004"
+        assert health.spotify.state == "closed"
+    with_api(test)
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import types
+
+import supervisor
+
+WORKER_0 = """\
+# HELP bot_queue_depth Songs queued per guild
+# TYPE bot_queue_depth gauge
+bot_queue_depth{guild="1"} 3
+bot_queue_depth{guild="2"} 0
+# HELP bot_plays_total Tracks started
+# TYPE bot_plays_total counter
+bot_plays_total 7
+"""
+
+WORKER_1 = """\
+# HELP bot_plays_total Tracks started
+# TYPE bot_plays_total counter
+bot_plays_total 2
+# HELP bot_queue_depth Songs queued per guild
+# TYPE bot_queue_depth gauge
+bot_queue_depth{guild="9",note="a b"} 1
+"""
+
+
+def test_families_stay_together_with_a_worker_label():
+    merged = supervisor.merge_expositions({"0": WORKER_0, "1": WORKER_1})
+    assert merged.splitlines() == [
+        "# HELP bot_queue_depth Songs queued per guild",
+        "# TYPE bot_queue_depth gauge",
+        'bot_queue_depth{guild="1",worker="0"} 3',
+        'bot_queue_depth{guild="2",worker="0"} 0',
+        'bot_queue_depth{guild="9",note="a b",worker="1"} 1',
+        "# HELP bot_plays_total Tracks started",
+        "# TYPE bot_plays_total counter",
+        'bot_plays_total{worker="0"} 7',
+        'bot_plays_total{worker="1"} 2',
+    ]
+
+
+def test_nothing_to_merge():
+    assert supervisor.merge_expositions({}) == ""
+    assert supervisor.merge_expositions({"0": "\n"}) == ""
+
+
+def make_supervisor(healths: dict[int, dict | None], down: set[int] = frozenset()):
+    sup = supervisor.Supervisor(types.SimpleNamespace(host="127.0.0.1"))
+    for i in healths:
+        w = supervisor.Worker(i, [i], len(healths), 9101 + i)
+        w.proc = types.SimpleNamespace(pid=100 + i, returncode=3 if i in down else None)
+        sup.workers.append(w)
+
+    async def fetch(w, path):
+        if not w.up:
+            return None
+        if path == "/metrics":
+            return WORKER_0
+        body = healths[w.index]
+        return json.dumps(body) if body is not None else None
+    sup._fetch = fetch
+    return sup
+
+
+def health_of(sup) -> tuple[str, dict]:
+    async def main():
+        poll = asyncio.create_task(sup._poll_health())
+        while any(w.health is None and w.up for w in sup.workers):
+            await asyncio.sleep(0)
+        poll.cancel()
+        status, _, body = await sup._health_route()
+        return status, json.loads(body)
+    return asyncio.run(main())
+
+
+def test_health_merges_every_worker():
+    sup = make_supervisor({0: {"ready": True, "guilds": 4}, 1: {"ready": False, "guilds": 2}})
+    status, body = health_of(sup)
+    assert status == "200 OK"
+    assert body["ok"] is True
+    assert [w["shards"] for w in body["workers"]] == [[0], [1]]
+    assert [w["health"]["guilds"] for w in body["workers"]] == [4, 2]
+
+
+def test_a_dead_worker_fails_the_check():
+    sup = make_supervisor({0: {"ready": True}, 1: {"ready": True}}, down={1})
+    status, body = health_of(sup)
+    assert status.startswith("503")
+    assert body["ok"] is False
+    assert body["workers"][1] == {**body["workers"][1], "up": False, "health": None, "uptime": 0}
+
+
+def test_metrics_route_adds_its_own_families():
+    sup = make_supervisor({0: {}, 1: {}}, down={1})
+    status, _, body = asyncio.run(sup._metrics_route())
+    text = body.decode()
+    assert 'bot_supervisor_worker_up{worker="1"} 0' in text
+    assert 'bot_plays_total{worker="0"} 7' in text
+    assert 'worker="1"} 7' not in text
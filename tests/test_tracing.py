@@ -0,0 +1,24 @@
+import asyncio
+
+import pytest
+
+import tracing
+
+
+def test_a_cancelled_trace_is_finished_and_kept():
+    async def slow():
+        with tracing.span("work"):
+            await asyncio.sleep(10)
+
+    async def main():
+        task = asyncio.create_task(tracing.run_traced("speculate", 4242, slow()))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(main())
+    [root] = tracing.recent(4242, 5)
+    assert root.end is not None
+    assert "CancelledError" in root.attrs["error"]
+    assert root.children[0].end is not None
@@ -0,0 +1,219 @@
+import os
+import json
+import time
+import queue
+import logging
+import threading
+import contextvars
+import urllib.request
+from collections import defaultdict, deque
+from contextlib import contextmanager
+
+log = logging.getLogger("bot.tracing")
+
+# where finished traces go besides the in-memory history:
+#   jsonl:<path>                  one JSON trace per line
+#   otlp:<url>                    OTLP/HTTP JSON, e.g. otlp:http://127.0.0.1:4318/v1/traces
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "")
+# finished traces kept per guild for /trace
+TRACE_HISTORY = int(os.getenv("TRACE_HISTORY", "20"))
+
+_current: contextvars.ContextVar["Span | None"] = contextvars.ContextVar("current_span", default=None)
+_history: dict[int, deque] = defaultdict(lambda: deque(maxlen=TRACE_HISTORY))
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent", "start", "end", "attrs", "children", "guild_id")
+
+    def __init__(self, name: str, parent: "Span | None" = None, guild_id: int | None = None, **attrs):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else os.urandom(16).hex()
+        self.span_id = os.urandom(8).hex()
+        self.guild_id = parent.guild_id if parent else guild_id
+        self.start = time.time_ns()
+        self.end: int | None = None
+        self.attrs = attrs
+        self.children: list[Span] = []
+        if parent:
+            parent.children.append(self)
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end if self.end is not None else time.time_ns()
+        return (end - self.start) / 1e6
+
+    def walk(self):
+        yield self
+        for child in self.children:
+            yield from child.walk()
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent else None,
+            "name": self.name,
+            "start_ns": self.start,
+            "end_ns": self.end,
+            "duration_ms": round(self.duration_ms, 3),
+            "attrs": self.attrs,
+        }
+
+
+# ─── Span API ──────────────────────────────────────────────────────────────────
+def start_trace(name: str, guild_id: int | None, **attrs) -> tuple[Span, contextvars.Token]:
+    """Open a root span and make it current; pair with finish_trace()."""
+    root = Span(name, guild_id=guild_id, **attrs)
+    return root, _current.set(root)
+
+
+def finish_trace(root: Span, token: contextvars.Token | None = None, error: BaseException | None = None):
+    if root.end is not None:
+        return
+    root.end = time.time_ns()
+    if error is not None:
+        root.attrs["error"] = repr(error)
+    if token is not None:
+        try:
+            _current.reset(token)
+        except ValueError:
+            pass  # finished from another context (e.g. a completion event)
+    if root.guild_id is not None:
+        _history[root.guild_id].append(root)
+    _exporter.submit(root)
+
+
+@contextmanager
+def trace(name: str, guild_id: int | None, **attrs):
+    """Root span for one interaction (or background job) as a with-block."""
+    root, token = start_trace(name, guild_id, **attrs)
+    error = None
+    try:
+        yield root
+    except BaseException as e:
+        error = e  # cancellation included: the root still lands in /trace
+        raise
+    finally:
+        finish_trace(root, token, error=error)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Child span of whatever is current; a no-op outside any trace."""
+    parent = _current.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, parent, **attrs)
+    token = _current.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.attrs["error"] = repr(e)
+        raise
+    finally:
+        child.end = time.time_ns()
+        _current.reset(token)
+
+
+async def run_traced(name: str, guild_id: int | None, coro):
+    """Await `coro` inside its own root span (for work not started by a command)."""
+    with trace(name, guild_id):
+        return await coro
+
+
+def recent(guild_id: int, count: int) -> list[Span]:
+    return list(_history.get(guild_id, ()))[-count:]
+
+
+def format_breakdown(root: Span) -> str:
+    """Indented per-stage timing of one trace, for the /trace command."""
+    lines = []
+
+    def _walk(s: Span, depth: int):
+        offset = (s.start - root.start) / 1e6
+        err = " ⚠" if "error" in s.attrs else ""
+        lines.append(f"{'  ' * depth}{s.name} — {s.duration_ms:.0f} ms (+{offset:.0f}){err}")
+        for c in s.children:
+            _walk(c, depth + 1)
+
+    _walk(root, 0)
+    return "\n".join(lines)
+
+
+# ─── Export ────────────────────────────────────────────────────────────────────
+def _otlp_payload(root: Span) -> dict:
+    def attr(k, v):
+        if isinstance(v, bool):
+            return {"key": k, "value": {"boolValue": v}}
+        if isinstance(v, int):
+            return {"key": k, "value": {"intValue": str(v)}}
+        if isinstance(v, float):
+            return {"key": k, "value": {"doubleValue": v}}
+        return {"key": k, "value": {"stringValue": str(v)}}
+
+    spans = []
+    for s in root.walk():
+        attrs = dict(s.attrs)
+        if s.guild_id is not None:
+            attrs["guild_id"] = s.guild_id
+        spans.append({
+            "traceId": s.trace_id,
+            "spanId": s.span_id,
+            "parentSpanId": s.parent.span_id if s.parent else "",
+            "name": s.name,
+            "kind": 1,
+            "startTimeUnixNano": str(s.start),
+            "endTimeUnixNano": str(s.end or s.start),
+            "attributes": [attr(k, v) for k, v in attrs.items()],
+        })
+    return {"resourceSpans": [{
+        "resource": {"attributes": [attr("service.name", "slepprstreamdbot")]},
+        "scopeSpans": [{"scope": {"name": "bot.tracing"}, "spans": spans}],
+    }]}
+
+
+class _Exporter:
+    """Writes finished traces from a background thread, never on the event loop."""
+
+    def __init__(self, target: str):
+        self.kind, _, self.dest = target.partition(":")
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.thread: threading.Thread | None = None
+        if self.kind not in ("", "jsonl", "otlp"):
+            log.error("[tracing] Unknown TRACE_EXPORT '%s', export disabled", target)
+            self.kind = ""
+
+    def submit(self, root: Span):
+        if not self.kind:
+            return
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+            self.thread.start()
+        self.queue.put(root)
+
+    def _run(self):
+        while True:
+            root = self.queue.get()
+            try:
+                if self.kind == "jsonl":
+                    os.makedirs(os.path.dirname(self.dest) or ".", exist_ok=True)
+                    with open(self.dest, "a", encoding="utf-8") as f:
+                        f.write(json.dumps({
+                            "guild_id": root.guild_id,
+                            "spans": [s.to_dict() for s in root.walk()],
+                        }) + "\n")
+                else:
+                    req = urllib.request.Request(
+                        self.dest,
+                        data=json.dumps(_otlp_payload(root)).encode(),
+                        headers={"Content-Type": "application/json"},
+                        method="POST",
+                    )
+                    urllib.request.urlopen(req, timeout=5).close()
+            except Exception as e:
+                log.error("[tracing] export failed: %s", e)
+
+
+_exporter = _Exporter(TRACE_EXPORT)
@@ -0,0 +1,116 @@
+import os
+import time
+import asyncio
+import logging
+
+import discord
+
+log = logging.getLogger("bot.watchdog")
+
+# this long without a frame while "playing" means the pipeline is hung
+PLAYBACK_STALL_SECONDS = float(os.getenv("PLAYBACK_STALL_SECONDS", "10"))
+WATCHDOG_INTERVAL = float(os.getenv("WATCHDOG_INTERVAL", "1"))
+FRAME_SECONDS = 0.02  # one Opus frame, as discord.py reads them
+
+
+class FrameCounter(discord.AudioSource):
+    """
+    Wraps the source handed to vc.play() and counts the frames the player
+    pulls from it, so a silent pipeline shows up as a counter that stopped.
+    """
+
+    def __init__(self, source: discord.AudioSource, start_at: float = 0.0):
+        self.source = source
+        self.start_at = start_at
+        self.frames = 0
+        self.last_frame_at = time.monotonic()
+        self.ended = False
+        # ran out on its own (ffmpeg exited), as opposed to being stopped
+        self.exhausted = False
+
+    def read(self) -> bytes:
+        data = self.source.read()
+        if data:
+            self.frames += 1
+            self.last_frame_at = time.monotonic()
+        else:
+            self.ended = True
+            self.exhausted = True
+        return data
+
+    @property
+    def dead(self) -> bool:
+        """
+        ffmpeg gave up before its first frame (a 403, an expired URL). The
+        player reports that as a normal end, not an error.
+        """
+        return self.exhausted and self.frames == 0
+
+    def is_opus(self) -> bool:
+        return self.source.is_opus()
+
+    def cleanup(self):
+        self.ended = True
+        self.source.cleanup()
+
+    @property
+    def position(self) -> float:
+        """Seconds into the track actually delivered (not wall time, which runs on during a stall)."""
+        return self.start_at + self.frames * FRAME_SECONDS
+
+    def silent_for(self) -> float:
+        return time.monotonic() - self.last_frame_at
+
+    def touch(self):
+        """Paused or reconnecting: silence here is expected, so restart the clock."""
+        self.last_frame_at = time.monotonic()
+
+
+class PlaybackWatchdog:
+    """
+    One per guild. Checks the current FrameCounter every WATCHDOG_INTERVAL
+    and awaits `on_stall(counter, silent_for)` once when it has gone silent
+    for `threshold` while the voice client says it is playing.
+    """
+
+    def __init__(self, threshold: float = PLAYBACK_STALL_SECONDS, interval: float = WATCHDOG_INTERVAL):
+        self.threshold = threshold
+        self.interval = interval
+        self.counter: FrameCounter | None = None
+        self._vc = None
+        self._on_stall = None
+        self._task: asyncio.Task | None = None
+
+    def watch(self, vc, counter: FrameCounter, on_stall):
+        self._vc = vc
+        self.counter = counter
+        self._on_stall = on_stall
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        self.counter = None
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        while (counter := self.counter) is not None:
+            await asyncio.sleep(self.interval)
+            if counter is not self.counter or counter.ended:
+                if counter.ended and counter is self.counter:
+                    self.counter = None
+                continue
+            vc = self._vc
+            if not vc.is_connected() or not vc.is_playing():
+                counter.touch()  # paused, reconnecting or being stopped
+                continue
+            silent = counter.silent_for()
+            if silent < self.threshold:
+                continue
+            # once per stall: whatever on_stall does ends this source
+            self.counter = None
+            try:
+                await self._on_stall(counter, silent)
+            except Exception as e:
+                log.error("[watchdog] stall handler failed: %s", e)